@@ -47,7 +47,7 @@ def migrate_add_work_types_table():
     
     conn.close()
     print("\n✅ Migration completed successfully!")
-    print("\nNote: Old progress entries will use fallback parsing from descriptions.")
+    print("\nNote: Run 'python backfill_work_types.py' to convert old progress entries.")
     print("New progress entries will store data directly in work_types table for better performance.")
 
 if __name__ == '__main__':
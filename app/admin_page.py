@@ -2,6 +2,11 @@ import streamlit as st
 from database import (add_site, get_sites, get_all_statistics, get_site_statistics, 
                       update_site_status, get_all_users, get_progress_by_site,
                       get_floor_wise_progress, get_work_type_breakdown)
+from ai_analysis import get_analysis_flight_stats, get_tier_stats
+from image_store import get_image_cache_stats
+from model_registry import get_registry_stats
+from upload_staging import get_staging_stats
+from session_memory import get_session_memory_stats, PENDING_EVICT_SECONDS
 import datetime
 import plotly.graph_objects as go
 import plotly.express as px
@@ -111,7 +116,8 @@ def show():
     st.markdown("---")
     
     # Tabs for different admin functions
-    tab1, tab2, tab3 = st.tabs(["📍 Site Management", "➕ Add New Site", "👥 User Management"])
+    tab1, tab2, tab3, tab4 = st.tabs(["📍 Site Management", "➕ Add New Site", "👥 User Management",
+                                      "⚙️ System"])
     
     with tab1:
         st.header("Construction Sites")
@@ -273,3 +279,87 @@ def show():
                 st.write(f"**{username}**")
             with col2:
                 st.write(f"`{role.title()}`")
+    
+    with tab4:
+        st.header("System")
+        st.caption("Counters of this app process since it started")
+        
+        st.markdown("### AI Analysis Requests")
+        flight_stats = get_analysis_flight_stats()
+        requests = flight_stats['calls'] + flight_stats['coalesced']
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Requests", requests)
+        with col2:
+            st.metric("Model Calls", flight_stats['calls'])
+        with col3:
+            st.metric("Coalesced", flight_stats['coalesced'],
+                      help="Identical requests that shared a call already in progress")
+        with col4:
+            st.metric("In Flight", flight_stats['in_flight'])
+        if flight_stats['coalesced']:
+            st.caption(f"{flight_stats['coalesced'] / requests:.0%} of requests were served by a shared call; "
+                       f"up to {flight_stats['max_waiters']} extra request(s) waited on one call.")
+        
+        st.markdown("### Analysis Tiers")
+        tier_rows = []
+        for tier, tier_stats in get_tier_stats().items():
+            tier_rows.append({
+                'Tier': tier.title(),
+                'Requests': tier_stats['requests'],
+                'Resolved': tier_stats['resolved'],
+                'Hit Rate': f"{tier_stats['hit_rate']:.0%}" if tier_stats['hit_rate'] is not None else "-",
+                'Mean Latency (s)': (f"{tier_stats['mean_seconds']:.2f}"
+                                     if tier_stats['mean_seconds'] is not None else "-")
+            })
+        st.dataframe(pd.DataFrame(tier_rows), hide_index=True, use_container_width=True)
+        st.caption("Local photo checks run first; the quick triage call resolves clear submissions "
+                   "and the rest get the full analysis.")
+        
+        registry_stats = get_registry_stats()
+        if registry_stats['warmup_seconds'] is not None:
+            st.caption(f"Model clients: {registry_stats['models']} shared, reused {registry_stats['reused']} time(s); "
+                       f"warmup took {registry_stats['warmup_seconds']:.1f}s"
+                       + (f" ({registry_stats['warmup_error']})" if registry_stats['warmup_error'] else ""))
+        
+        st.markdown("### Photo Cache")
+        cached_images, cached_bytes, budget_bytes = get_image_cache_stats()
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Cached Photos", cached_images)
+        with col2:
+            st.metric("Cache Memory", f"{cached_bytes / 1024 / 1024:.1f} MB",
+                      help=f"Budget: {budget_bytes / 1024 / 1024:.0f} MB")
+        
+        st.markdown("### Staged Uploads")
+        staging_stats = get_staging_stats()
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Pending Submissions", staging_stats['stagings'],
+                      help="Photos waiting on disk for the engineer to confirm the AI analysis")
+        with col2:
+            st.metric("Staged Photos on Disk", f"{staging_stats['bytes'] / 1024 / 1024:.1f} MB")
+        
+        st.markdown("### Session Memory")
+        memory_stats = get_session_memory_stats()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Active Sessions", memory_stats['sessions'])
+        with col2:
+            st.metric("Session State Memory", f"{memory_stats['bytes'] / 1024 / 1024:.2f} MB",
+                      help="Approximate size of all sessions' state, measured at each session's latest run")
+        with col3:
+            st.metric("Pending Reviews in Memory", memory_stats['pending_in_memory'])
+        with col4:
+            st.metric("Pending Reviews on Disk", memory_stats['pending_on_disk'],
+                      help=f"Reviews idle for more than {PENDING_EVICT_SECONDS // 60} minutes are moved "
+                           "to disk until the engineer returns")
+        if memory_stats['session_list']:
+            st.dataframe(pd.DataFrame([{
+                'User': session['user'],
+                'Memory (KB)': round(session['bytes'] / 1024, 1),
+                'Largest Key': session['largest_key'] or "-",
+                'Pending Review': {'memory': "In memory", 'disk': "On disk"}.get(session['pending'], "-"),
+                'Idle (min)': round(session['idle_seconds'] / 60, 1)
+            } for session in memory_stats['session_list']]), hide_index=True, use_container_width=True)
+        st.caption(f"{memory_stats['evicted']} review(s) moved to disk, {memory_stats['restored']} restored.")
@@ -0,0 +1,562 @@
+"""
+AI analysis pipeline for progress updates
+Sends the verification prompt (see prompt_builder) to Gemini, requests
+structured JSON output and turns it into a Markdown report plus structured findings that
+are stored at save time, so reports never re-parse free text
+"""
+
+import asyncio
+import copy
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+from io import BytesIO
+
+import PIL.Image
+import google.generativeai as genai
+
+from database import get_image_analyses, save_image_analysis
+from image_quality import assess_images
+from image_store import hash_image
+from model_registry import DEFAULT_MODEL, get_model, get_cached_content_model, start_warmup, warmup
+from prompt_builder import (AGGREGATION_PREAMBLE, ANALYSIS_SYSTEM_INSTRUCTION, SYSTEM_INSTRUCTION_TOKENS,
+                            build_analysis_prompt, build_image_notes_prompt, build_triage_prompt,
+                            estimate_image_tokens, estimate_tokens)
+from single_flight import SingleFlight
+
+# Gemini model used for progress verification (GEMINI_MODEL in .env)
+ANALYSIS_MODEL = DEFAULT_MODEL
+
+ANALYSIS_GENERATION_CONFIG = {"response_mime_type": "application/json"}
+
+# Store the verification system instruction with the provider's context
+# caching; with 0 a prebuilt model carrying the instruction is reused instead
+ANALYSIS_CONTEXT_CACHE = os.environ.get('ANALYSIS_CONTEXT_CACHE', '1') == '1'
+
+# Lifetime of a provider context cache; a new one is created before it expires
+CONTEXT_CACHE_TTL_SECONDS = 3600
+
+# Verification status values requested from the model, mapped to the
+# status stored in progress.ai_verification_status
+VERIFICATION_STATUS_MAP = {
+    "VERIFIED": "Verified",
+    "PARTIALLY VERIFIED": "Partially Verified",
+    "NOT VERIFIED": "Not Verified",
+    "INSUFFICIENT DATA": "Needs Review"
+}
+
+VERIFICATION_STATUS_ICONS = {
+    "VERIFIED": "✅",
+    "PARTIALLY VERIFIED": "⚠️",
+    "NOT VERIFIED": "❌",
+    "INSUFFICIENT DATA": "ℹ️"
+}
+
+def empty_findings():
+    """Findings structure for analyses without structured output"""
+    return {
+        'sections': [],
+        'recommendations': [],
+        'issues': [],
+        'safety_findings': []
+    }
+
+def _status_from_text(response_text):
+    """Derive the verification status from free text (non-JSON responses only)"""
+    if "✅ VERIFIED" in response_text or "VERIFIED: Work matches" in response_text:
+        return "Verified"
+    elif "⚠️ PARTIALLY VERIFIED" in response_text:
+        return "Partially Verified"
+    elif "❌ NOT VERIFIED" in response_text:
+        return "Not Verified"
+    return "Needs Review"
+
+def _string_list(value):
+    """Keep only non-empty strings from a JSON array"""
+    if not isinstance(value, list):
+        return []
+    return [str(item).strip() for item in value if str(item).strip()]
+
+def render_analysis_markdown(analysis):
+    """Render the structured analysis as the Markdown report shown to users"""
+    raw_status = str(analysis.get('verification_status', '')).upper().strip()
+    icon = VERIFICATION_STATUS_ICONS.get(raw_status, "ℹ️")
+    
+    report = f"**1. VERIFICATION STATUS**\n{icon} {raw_status or 'INSUFFICIENT DATA'}\n"
+    
+    for idx, section in enumerate(analysis.get('sections') or [], 2):
+        if not isinstance(section, dict):
+            continue
+        title = str(section.get('title', '')).strip().upper()
+        content = str(section.get('content', '')).strip()
+        report += f"\n**{idx}. {title}**\n{content}\n"
+    
+    completion = analysis.get('overall_completion')
+    if isinstance(completion, (int, float)):
+        report += f"\n**Overall Site Completion:** {int(completion)}%\n"
+    
+    return report
+
+def parse_analysis_response(response_text):
+    """
+    Parse the model's JSON response into (ai_report, status, findings).
+    Falls back to the raw text and substring status checks when the
+    response is not valid JSON.
+    """
+    try:
+        analysis = json.loads(response_text)
+        if not isinstance(analysis, dict):
+            raise ValueError("Analysis is not a JSON object")
+    except ValueError:
+        return response_text, _status_from_text(response_text), empty_findings()
+    
+    return analysis_result(analysis)
+
+def analysis_result(analysis):
+    """Turn a structured analysis dict into (ai_report, status, findings)"""
+    raw_status = str(analysis.get('verification_status', '')).upper().strip()
+    status = VERIFICATION_STATUS_MAP.get(raw_status, "Needs Review")
+    
+    findings = {
+        'sections': [
+            (str(section.get('title', '')).strip(), str(section.get('content', '')).strip())
+            for section in analysis.get('sections') or []
+            if isinstance(section, dict)
+        ],
+        'recommendations': _string_list(analysis.get('recommendations')),
+        'issues': _string_list(analysis.get('issues')),
+        'safety_findings': _string_list(analysis.get('safety_findings'))
+    }
+    
+    return render_analysis_markdown(analysis), status, findings
+
+def extract_legacy_recommendations(ai_report):
+    """
+    Extract recommendation lines from a free-text AI report written before
+    structured output. Only used to backfill old progress entries.
+    """
+    report_upper = ai_report.upper()
+    rec_start = report_upper.find("RECOMMENDATIONS")
+    if rec_start < 0:
+        return []
+    
+    remaining = ai_report[rec_start:]
+    
+    # Find the next major section (or end of report)
+    next_sections = ["PROGRESS ASSESSMENT", "DATA QUALITY", "**8.", "**9.", "\n\n**"]
+    rec_end = len(remaining)
+    
+    for section in next_sections:
+        pos = remaining.find(section)
+        if pos > 0 and pos < rec_end:
+            rec_end = pos
+    
+    # Drop the header line and list markers
+    rec_lines = remaining[:rec_end].strip().split('\n')
+    clean_lines = [line.strip() for line in rec_lines[1:] if line.strip() and not line.strip().startswith('**7.')]
+    return [line.lstrip('-*• ').strip() for line in clean_lines if line.lstrip('-*• ').strip()]
+
+def record_usage(usage, response):
+    """Copy the token counts of a Gemini response into a usage dict"""
+    metadata = getattr(response, 'usage_metadata', None)
+    usage['prompt_tokens'] = getattr(metadata, 'prompt_token_count', 0) or 0
+    usage['output_tokens'] = getattr(metadata, 'candidates_token_count', 0) or 0
+    # Prompt tokens served from a context cache (billed at the reduced cached rate)
+    usage['cached_tokens'] = getattr(metadata, 'cached_content_token_count', 0) or 0
+
+# model name -> (model, 'provider' or 'local', renew after timestamp)
+_analysis_models = {}
+_analysis_models_lock = threading.Lock()
+
+def get_analysis_model(model_name=ANALYSIS_MODEL):
+    """
+    Get (model, cache source) for verification calls, with the static
+    ANALYSIS_SYSTEM_INSTRUCTION as system instruction.
+    
+    Where the provider supports it the instruction is stored as cached
+    content, so each call only sends the request and photos ('provider').
+    If caching is disabled or the cache cannot be created (model without
+    caching support, instruction below the minimum cache size) a model
+    built once with the system instruction is reused ('local'). Either is
+    rebuilt after CONTEXT_CACHE_TTL_SECONDS.
+    """
+    now = time.time()
+    with _analysis_models_lock:
+        entry = _analysis_models.get(model_name)
+        if entry is not None and entry[2] > now:
+            return entry[0], entry[1]
+        
+        model, source = None, 'local'
+        if ANALYSIS_CONTEXT_CACHE:
+            try:
+                cached_content = genai.caching.CachedContent.create(
+                    model=model_name,
+                    display_name='progress-verification-instructions',
+                    system_instruction=ANALYSIS_SYSTEM_INSTRUCTION,
+                    ttl=datetime.timedelta(seconds=CONTEXT_CACHE_TTL_SECONDS)
+                )
+                model = get_cached_content_model(cached_content, ANALYSIS_GENERATION_CONFIG)
+                source = 'provider'
+            except Exception:
+                model = None
+        
+        if model is None:
+            model = get_model(model_name, ANALYSIS_GENERATION_CONFIG, ANALYSIS_SYSTEM_INSTRUCTION)
+        
+        # Renew a minute early so calls never reference an expired cache
+        _analysis_models[model_name] = (model, source, now + CONTEXT_CACHE_TTL_SECONDS - 60)
+        return model, source
+
+def warmup_analysis():
+    """Build the analysis models, open the API connection and create the context cache"""
+    warmup([(ANALYSIS_MODEL, ANALYSIS_GENERATION_CONFIG, ANALYSIS_SYSTEM_INSTRUCTION),
+            (ANALYSIS_MODEL, ANALYSIS_GENERATION_CONFIG, None),
+            (TRIAGE_MODEL, TRIAGE_GENERATION_CONFIG, None)])
+    get_analysis_model(ANALYSIS_MODEL)
+
+def start_analysis_warmup():
+    """Warm up the analysis models in the background, once per process"""
+    start_warmup(warmup_analysis)
+
+def get_gemini_analysis(description, image_data_list, category, floor_data, model_name=ANALYSIS_MODEL,
+                        usage=None):
+    """
+    Send all collected data to Gemini AI for comprehensive analysis
+    
+    The model is asked for structured JSON. Returns (ai_report, status,
+    findings) where ai_report is the Markdown report rendered from the
+    JSON and findings holds the recommendations, issues, safety findings
+    and sections to be stored alongside the progress entry. If a usage
+    dict is given, the call's prompt and output token counts are stored in
+    it, along with the tokens served from the context cache, the cache
+    source (see get_analysis_model), the estimated prompt tokens and the
+    floor table detail level the prompt builder used.
+    """
+    try:
+        model, cache_source = get_analysis_model(model_name)
+        
+        # Convert images
+        images = []
+        for img_data in image_data_list:
+            image = PIL.Image.open(BytesIO(img_data))
+            images.append(image)
+        
+        prompt_stats = {}
+        prompt = build_analysis_prompt(description, category, floor_data, len(images), stats=prompt_stats)
+        
+        # Generate content
+        content = [prompt] + images
+        response = model.generate_content(content)
+        if usage is not None:
+            record_usage(usage, response)
+            usage.update(prompt_stats)
+            usage['context_cache'] = cache_source
+        
+        return parse_analysis_response(response.text)
+        
+    except Exception as e:
+        return f"Error generating AI analysis: {str(e)}", "Error", empty_findings()
+
+# ===========================
+# MAP-REDUCE ANALYSIS
+# ===========================
+
+# Concurrent per-photo calls and the time allowed for each
+MAP_CONCURRENCY = 4
+MAP_TIMEOUT_SECONDS = 90
+
+def analysis_context_hash(description, category, floor_data, model_name):
+    """Hash identifying the text context of a submission, so per-photo results can be reused on retry"""
+    context = json.dumps([description, category, floor_data, model_name], sort_keys=True, default=str)
+    return hashlib.sha256(context.encode('utf-8')).hexdigest()
+
+def _merge_usage(usage, call_usage):
+    """Add the token counts of call_usage to usage; other entries are copied"""
+    for key, value in call_usage.items():
+        if key in ('prompt_tokens', 'output_tokens', 'cached_tokens', 'estimated_prompt_tokens'):
+            usage[key] = usage.get(key, 0) + value
+        else:
+            usage[key] = value
+
+def _add_usage(usage, response):
+    call_usage = {}
+    record_usage(call_usage, response)
+    _merge_usage(usage, call_usage)
+
+async def _analyze_images(model, prompt, image_data_list, usage):
+    """Map step: one call per photo, at most MAP_CONCURRENCY at a time; returns result text or exception per photo"""
+    semaphore = asyncio.Semaphore(MAP_CONCURRENCY)
+    
+    async def analyze_image(image_data):
+        async with semaphore:
+            image = PIL.Image.open(BytesIO(image_data))
+            response = await asyncio.wait_for(model.generate_content_async([prompt, image]),
+                                              MAP_TIMEOUT_SECONDS)
+            _add_usage(usage, response)
+            return response.text
+    
+    return await asyncio.gather(*(analyze_image(image_data) for image_data in image_data_list),
+                                return_exceptions=True)
+
+def get_gemini_analysis_map_reduce(description, image_data_list, category, floor_data,
+                                   model_name=ANALYSIS_MODEL, usage=None):
+    """
+    Map-reduce variant of get_gemini_analysis: each photo is described by
+    its own concurrent call, then one text-only call aggregates the notes
+    into the full verification report. Per-photo results are saved as they
+    arrive, so retrying after a failure only re-runs the photos that failed,
+    and the report is still produced when some photos could not be analyzed.
+    Returns (ai_report, status, findings) like get_gemini_analysis.
+    """
+    if usage is None:
+        usage = {}
+    
+    try:
+        model = get_model(model_name, ANALYSIS_GENERATION_CONFIG)
+        
+        context_hash = analysis_context_hash(description, category, floor_data, model_name)
+        image_hashes = [hash_image(image_data) for image_data in image_data_list]
+        saved_results = get_image_analyses(context_hash, image_hashes)
+        
+        # Map: analyze only photos without a saved result (each distinct photo once)
+        pending = {}
+        for image_hash, image_data in zip(image_hashes, image_data_list):
+            if image_hash not in saved_results:
+                pending.setdefault(image_hash, image_data)
+        pending = list(pending.items())
+        if pending:
+            prompt = build_image_notes_prompt(category, floor_data)
+            usage['estimated_prompt_tokens'] = len(pending) * (estimate_tokens(prompt) + estimate_image_tokens(1))
+            results = asyncio.run(_analyze_images(model, prompt, [data for _, data in pending], usage))
+            for (image_hash, _), result in zip(pending, results):
+                if isinstance(result, BaseException):
+                    continue
+                save_image_analysis(context_hash, image_hash, model_name, result)
+                saved_results[image_hash] = result
+        
+        notes = [f"Photo {position}: {saved_results[image_hash]}"
+                 for position, image_hash in enumerate(image_hashes, 1) if image_hash in saved_results]
+        if not notes:
+            return "Error generating AI analysis: no photo could be analyzed", "Error", empty_findings()
+        
+        missing = len(image_hashes) - len(notes)
+        missing_note = (f"\n{missing} of {len(image_hashes)} photo(s) could not be analyzed; "
+                        "account for the missing evidence.") if missing else ""
+        
+        # Reduce: one text-only call over the notes
+        prompt = AGGREGATION_PREAMBLE.format(missing_note=missing_note, notes="\n".join(notes))
+        prompt_stats = {}
+        prompt += build_analysis_prompt(description, category, floor_data, len(image_data_list),
+                                        stats=prompt_stats)
+        analysis_model, usage['context_cache'] = get_analysis_model(model_name)
+        response = analysis_model.generate_content(prompt)
+        _add_usage(usage, response)
+        # The aggregation call attaches no photos
+        usage['estimated_prompt_tokens'] = (usage.get('estimated_prompt_tokens', 0)
+                                            + SYSTEM_INSTRUCTION_TOKENS + estimate_tokens(prompt))
+        usage['floor_detail'] = prompt_stats['floor_detail']
+        
+        return parse_analysis_response(response.text)
+        
+    except Exception as e:
+        return f"Error generating AI analysis: {str(e)}", "Error", empty_findings()
+
+# ===========================
+# TIERED ANALYSIS
+# ===========================
+
+# Run a quick triage call before the full report (set to 0 to always run the full analysis)
+ANALYSIS_TRIAGE = os.environ.get('ANALYSIS_TRIAGE', '1') == '1'
+
+# Model for the triage call
+TRIAGE_MODEL = os.environ.get('TRIAGE_MODEL', ANALYSIS_MODEL)
+
+# Minimum triage confidence for skipping the full report
+TRIAGE_MIN_CONFIDENCE = 0.85
+
+# Triage only submissions with at most this many floors per photo
+TRIAGE_MAX_FLOORS_PER_IMAGE = 3
+
+# Longest side of the photos sent to triage; up to 384 px a photo is billed as one tile
+TRIAGE_IMAGE_SIZE = 384
+
+TRIAGE_GENERATION_CONFIG = {"response_mime_type": "application/json", "max_output_tokens": 200}
+
+ANALYSIS_TIERS = ('local', 'triage', 'full')
+
+_tier_stats = {tier: {'requests': 0, 'resolved': 0, 'seconds': 0.0} for tier in ANALYSIS_TIERS}
+_tier_stats_lock = threading.Lock()
+
+def _record_tier(usage, tier, resolved, seconds):
+    with _tier_stats_lock:
+        stats = _tier_stats[tier]
+        stats['requests'] += 1
+        stats['resolved'] += int(resolved)
+        stats['seconds'] += seconds
+    usage.setdefault('tier_seconds', {})[tier] = seconds
+    if resolved:
+        usage['tier'] = tier
+
+def get_tier_stats():
+    """Per tier: requests reaching it, requests it resolved, hit rate and mean latency in seconds"""
+    with _tier_stats_lock:
+        stats = {tier: dict(values) for tier, values in _tier_stats.items()}
+    for values in stats.values():
+        values['hit_rate'] = values['resolved'] / values['requests'] if values['requests'] else None
+        values['mean_seconds'] = values['seconds'] / values['requests'] if values['requests'] else None
+    return stats
+
+def _unusable_photos_result(assessments):
+    """Report for a submission whose photos all failed the local quality checks"""
+    issues = [f"Image {position}: {', '.join(assessment['problems'])}"
+              for position, assessment in enumerate(assessments, 1)]
+    return analysis_result({
+        'verification_status': "INSUFFICIENT DATA",
+        'sections': [{
+            'title': "Photo Quality Check",
+            'content': "None of the photos is usable as evidence, so no AI analysis was run.\n\n"
+                       + "\n".join(f"- {issue}" for issue in issues)
+        }],
+        'recommendations': ["Retake the photos in good light, hold the camera steady and use full resolution"],
+        'issues': issues,
+        'safety_findings': []
+    })
+
+def _triage(description, image_data_list, category, floor_data, usage):
+    """Triage call; returns the decision dict, or None when the call or its response failed"""
+    try:
+        model = get_model(TRIAGE_MODEL, TRIAGE_GENERATION_CONFIG)
+        images = []
+        for image_data in image_data_list:
+            image = PIL.Image.open(BytesIO(image_data))
+            image.thumbnail((TRIAGE_IMAGE_SIZE, TRIAGE_IMAGE_SIZE))
+            images.append(image)
+        
+        prompt = build_triage_prompt(description, category, floor_data)
+        response = model.generate_content([prompt] + images)
+        _add_usage(usage, response)
+        usage['estimated_prompt_tokens'] = (usage.get('estimated_prompt_tokens', 0) + estimate_tokens(prompt)
+                                            + estimate_image_tokens(len(images)))
+        
+        decision = json.loads(response.text)
+        return decision if isinstance(decision, dict) else None
+    except Exception:
+        return None
+
+def get_gemini_analysis_tiered(description, image_data_list, category, floor_data, model_name=ANALYSIS_MODEL,
+                               usage=None, map_reduce=False):
+    """
+    Two-tier analysis in front of get_gemini_analysis (or the map-reduce
+    variant when map_reduce is set):
+    
+    1. local: photo quality checks; when no photo is usable the submission
+       is reported as insufficient without any AI call
+    2. triage: a short, low-resolution call that accepts the submission
+       when the photos clearly match the claimed work, returning a brief
+       report; skipped when some photos are unusable or there are many
+       floors per photo
+    3. full: the complete verification report
+    
+    Returns (ai_report, status, findings) like get_gemini_analysis. The
+    usage dict gets the summed token counts of all calls, 'tier' (the tier
+    that produced the result) and 'tier_seconds'.
+    """
+    if usage is None:
+        usage = {}
+    
+    start = time.perf_counter()
+    assessments = assess_images(image_data_list)
+    all_unusable = not any(assessment['usable'] for assessment in assessments)
+    _record_tier(usage, 'local', all_unusable, time.perf_counter() - start)
+    if all_unusable:
+        return _unusable_photos_result(assessments)
+    
+    triage_eligible = (all(assessment['usable'] for assessment in assessments)
+                       and len(floor_data) <= TRIAGE_MAX_FLOORS_PER_IMAGE * len(image_data_list))
+    if ANALYSIS_TRIAGE and triage_eligible:
+        start = time.perf_counter()
+        decision = _triage(description, image_data_list, category, floor_data, usage)
+        try:
+            accepted = (decision is not None and decision.get('decision') == "CONSISTENT"
+                        and float(decision.get('confidence', 0)) >= TRIAGE_MIN_CONFIDENCE)
+        except (TypeError, ValueError):
+            accepted = False
+        _record_tier(usage, 'triage', accepted, time.perf_counter() - start)
+        if accepted:
+            return analysis_result({
+                'verification_status': "VERIFIED",
+                'sections': [{
+                    'title': "Quick Verification",
+                    'content': f"{str(decision.get('summary', '')).strip()}\n\nThe photos clearly match the "
+                               "reported progress, so the detailed inspection report was not generated."
+                }],
+                'recommendations': [],
+                'issues': [],
+                'safety_findings': [],
+                'overall_completion': decision.get('overall_completion')
+            })
+    
+    analyze = get_gemini_analysis_map_reduce if map_reduce else get_gemini_analysis
+    start = time.perf_counter()
+    call_usage = {}
+    result = analyze(description, image_data_list, category, floor_data, model_name=model_name, usage=call_usage)
+    _merge_usage(usage, call_usage)
+    _record_tier(usage, 'full', result[1] != "Error", time.perf_counter() - start)
+    return result
+
+# ===========================
+# SHARED IN-FLIGHT ANALYSES
+# ===========================
+
+# Identical analyses requested at the same time (double clicks, two tabs,
+# two engineers submitting the same photos) share one model call
+_analysis_flights = SingleFlight()
+
+def analysis_content_hash(description, image_data_list, category, floor_data, model_name, map_reduce=False,
+                          tiered=False):
+    """Hash of everything that determines an analysis result"""
+    content = hashlib.sha256(analysis_context_hash(description, category, floor_data, model_name).encode('utf-8'))
+    content.update(b'map-reduce' if map_reduce else b'single')
+    content.update(b'tiered' if tiered else b'')
+    for image_data in image_data_list:
+        content.update(hash_image(image_data).encode('ascii'))
+    return content.hexdigest()
+
+def get_gemini_analysis_shared(description, image_data_list, category, floor_data, model_name=ANALYSIS_MODEL,
+                               usage=None, map_reduce=False, tiered=False):
+    """
+    get_gemini_analysis (or the map-reduce variant, or the tiered pipeline
+    in front of either) through the single-flight layer: a request
+    identical to one already in flight waits for it and gets a copy of its
+    result. The usage dict receives the token counts of the shared call and
+    'coalesced', True when no call of its own was made.
+    """
+    key = analysis_content_hash(description, image_data_list, category, floor_data, model_name, map_reduce,
+                                tiered)
+    
+    def run():
+        call_usage = {}
+        if tiered:
+            result = get_gemini_analysis_tiered(description, image_data_list, category, floor_data,
+                                                model_name=model_name, usage=call_usage, map_reduce=map_reduce)
+        else:
+            analyze = get_gemini_analysis_map_reduce if map_reduce else get_gemini_analysis
+            result = analyze(description, image_data_list, category, floor_data,
+                             model_name=model_name, usage=call_usage)
+        return result, call_usage
+    
+    (result, call_usage), coalesced = _analysis_flights.do(key, run)
+    if coalesced:
+        # Each session gets its own findings to keep in its session state
+        result = copy.deepcopy(result)
+    if usage is not None:
+        usage.update(call_usage)
+        usage['coalesced'] = coalesced
+    return result
+
+def get_analysis_flight_stats():
+    """Single-flight counters of the analysis requests served by this process"""
+    return _analysis_flights.stats()
@@ -0,0 +1,203 @@
+"""
+Streaming data export
+Writes progress and work type data straight from database cursors to
+temporary files chunk by chunk, so large sites are never held in memory
+"""
+
+import csv
+import gzip
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+
+# Rows fetched from the cursor per write
+EXPORT_CHUNK_SIZE = 1000
+
+# Exportable datasets: (CSV header, query selecting the same columns)
+EXPORT_DATASETS = {
+    'progress': (
+        ["ID", "Date", "Engineer", "Category", "Description", "Progress %",
+         "Verification Status", "AI Report"],
+        """SELECT p.id, p.date, u.username, p.category, p.description, p.progress_percentage,
+                  p.ai_verification_status, p.ai_report
+           FROM progress p
+           JOIN users u ON p.user_id = u.id
+           WHERE p.site_id = ?"""
+    ),
+    'work_types': (
+        ["ID", "Progress ID", "Date", "Floor", "Work Type", "Status", "Progress %"],
+        """SELECT id, progress_id, date, floor_name, work_name, status, progress_percentage
+           FROM work_types
+           WHERE site_id = ?"""
+    )
+}
+
+def _date_range_clause(column, start_date, end_date):
+    """Build the SQL condition and parameters for an optional inclusive date range"""
+    clause = ""
+    params = []
+    if start_date:
+        clause += f" AND {column} >= ?"
+        params.append(str(start_date))
+    if end_date:
+        # Dates are stored as 'YYYY-MM-DD HH:MM:SS', so include the whole end day
+        clause += f" AND {column} <= ?"
+        params.append(f"{end_date} 23:59:59")
+    return clause, params
+
+def export_csv(site_id, dataset, start_date=None, end_date=None, compress=False,
+               chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Export a dataset ('progress' or 'work_types') for a site to a temporary
+    CSV file, optionally gzip-compressed, reading the cursor in chunks.
+    
+    Returns (file path, number of rows written). The caller owns the file
+    and should delete it once served.
+    """
+    header, query = EXPORT_DATASETS[dataset]
+    date_column = 'p.date' if dataset == 'progress' else 'date'
+    clause, params = _date_range_clause(date_column, start_date, end_date)
+    query += clause + f" ORDER BY {date_column} ASC"
+    
+    suffix = '.csv.gz' if compress else '.csv'
+    fd, path = tempfile.mkstemp(prefix=f"construction_{dataset}_", suffix=suffix)
+    os.close(fd)
+    
+    conn = sqlite3.connect('construction.db')
+    c = conn.cursor()
+    rows_written = 0
+    
+    try:
+        if compress:
+            output = gzip.open(path, 'wt', newline='', encoding='utf-8')
+        else:
+            output = open(path, 'w', newline='', encoding='utf-8')
+        
+        with output:
+            writer = csv.writer(output)
+            writer.writerow(header)
+            
+            c.execute(query, [site_id] + params)
+            while True:
+                rows = c.fetchmany(chunk_size)
+                if not rows:
+                    break
+                writer.writerows(rows)
+                rows_written += len(rows)
+    except Exception:
+        os.remove(path)
+        raise
+    finally:
+        conn.close()
+    
+    return path, rows_written
+
+# ===========================
+# PARQUET SNAPSHOTS
+# ===========================
+
+# Rows per Parquet write; each chunk becomes one file per (site, month) partition
+PARQUET_CHUNK_SIZE = 50000
+
+# Columnar datasets keyed by name: (columns, query selecting rows after a watermark id)
+PARQUET_DATASETS = {
+    'progress': (
+        ['id', 'site_id', 'month', 'user_id', 'date', 'category',
+         'ai_verification_status', 'progress_percentage'],
+        """SELECT id, site_id, strftime('%Y-%m', date), user_id, date, category,
+                  ai_verification_status, progress_percentage
+           FROM progress
+           WHERE id > ?
+           ORDER BY id ASC"""
+    ),
+    'work_types': (
+        ['id', 'site_id', 'month', 'progress_id', 'date', 'floor_name', 'work_name',
+         'status', 'progress_percentage'],
+        """SELECT id, site_id, strftime('%Y-%m', date), progress_id, date, floor_name, work_name,
+                  status, progress_percentage
+           FROM work_types
+           WHERE id > ?
+           ORDER BY id ASC"""
+    )
+}
+
+def get_export_watermark(conn, name):
+    """Get the last exported row id for an export, 0 if never exported"""
+    c = conn.cursor()
+    c.execute("SELECT last_id FROM export_watermarks WHERE name = ?", (name,))
+    row = c.fetchone()
+    return row[0] if row else 0
+
+def set_export_watermark(conn, name, last_id, exported_at):
+    """Record the last exported row id for an export"""
+    c = conn.cursor()
+    c.execute("""INSERT INTO export_watermarks (name, last_id, exported_at) VALUES (?, ?, ?)
+                 ON CONFLICT(name) DO UPDATE SET last_id = excluded.last_id,
+                                                 exported_at = excluded.exported_at""",
+              (name, last_id, exported_at))
+    conn.commit()
+
+def export_parquet(output_dir, dataset, chunk_size=PARQUET_CHUNK_SIZE):
+    """
+    Append rows added since the last export of a dataset to a Parquet
+    dataset under output_dir/<dataset>, partitioned by site_id and month.
+    
+    Rows are read from the cursor in chunks and the watermark is advanced
+    after every chunk, so an interrupted export resumes where it stopped.
+    Returns the number of rows written.
+    """
+    # pyarrow is only needed for offline exports, not to run the app
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    columns, query = PARQUET_DATASETS[dataset]
+    watermark_name = f"parquet:{dataset}"
+    dataset_dir = os.path.join(output_dir, dataset)
+    
+    conn = sqlite3.connect('construction.db')
+    read_cursor = conn.cursor()
+    rows_written = 0
+    
+    try:
+        last_id = get_export_watermark(conn, watermark_name)
+        read_cursor.execute(query, (last_id,))
+        
+        while True:
+            rows = read_cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            
+            table = pa.Table.from_pydict(
+                {name: [row[i] for row in rows] for i, name in enumerate(columns)}
+            )
+            
+            # Unique file names per chunk so appends never overwrite earlier files
+            pq.write_to_dataset(
+                table,
+                root_path=dataset_dir,
+                partition_cols=['site_id', 'month'],
+                basename_template=f"part-{rows[0][0]}-{rows[-1][0]}-{{i}}.parquet",
+                existing_data_behavior='overwrite_or_ignore'
+            )
+            
+            rows_written += len(rows)
+            set_export_watermark(conn, watermark_name, rows[-1][0],
+                                 datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    finally:
+        conn.close()
+    
+    return rows_written
+
+def reset_parquet_export(output_dir, dataset):
+    """Delete a dataset's Parquet files and watermark so the next export starts from scratch"""
+    import shutil
+    
+    dataset_dir = os.path.join(output_dir, dataset)
+    if os.path.isdir(dataset_dir):
+        shutil.rmtree(dataset_dir)
+    
+    conn = sqlite3.connect('construction.db')
+    conn.execute("DELETE FROM export_watermarks WHERE name = ?", (f"parquet:{dataset}",))
+    conn.commit()
+    conn.close()
@@ -1,10 +1,45 @@
+import json
+import os
 import sqlite3
+import threading
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from utils import downsample_lttb
+from image_store import store_images
+
+# How long a writer waits for another writer's transaction before failing
+DB_BUSY_TIMEOUT_SECONDS = 30
+
+# Route progress submissions through one background writer thread
+# (set DB_SINGLE_WRITER=1) instead of letting each session write directly
+DB_SINGLE_WRITER = os.environ.get('DB_SINGLE_WRITER', '0') == '1'
+
+# Maximum number of points returned for the progress timeline chart
+TIMELINE_MAX_POINTS = 200
+
+# Keys of the analysis findings dict mapped to ai_findings.kind
+AI_FINDING_KINDS = {
+    'recommendations': 'recommendation',
+    'issues': 'issue',
+    'safety_findings': 'safety'
+}
+
+# Timeline bucket sizes, finest first: (name, strftime format, days per bucket)
+TIMELINE_BUCKETS = [
+    ('day', '%Y-%m-%d', 1),
+    ('week', '%Y-%W', 7),
+    ('month', '%Y-%m', 30)
+]
 
 def init_db():
     conn = sqlite3.connect('construction.db')
     c = conn.cursor()
 
+    # Write-ahead logging lets readers continue while an engineer's submission is written;
+    # the journal mode is stored in the database file
+    c.execute("PRAGMA journal_mode=WAL")
+
     # User table
     c.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -64,6 +99,91 @@ def init_db():
         )
     ''')
 
+    # Images table - each distinct photo stored once, keyed by content hash
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS images (
+            hash TEXT PRIMARY KEY,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            phash TEXT,
+            ref_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    c.execute("PRAGMA table_info(images)")
+    if 'phash' not in [col[1] for col in c.fetchall()]:
+        c.execute("ALTER TABLE images ADD COLUMN phash TEXT")
+
+    # Progress images table - ordered photo references of each progress entry
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS progress_images (
+            progress_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            image_hash TEXT NOT NULL,
+            PRIMARY KEY (progress_id, position),
+            FOREIGN KEY (progress_id) REFERENCES progress (id),
+            FOREIGN KEY (image_hash) REFERENCES images (hash)
+        )
+    ''')
+
+    # AI findings table - structured output of the AI analysis per progress entry
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS ai_findings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            progress_id INTEGER NOT NULL,
+            site_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            title TEXT,
+            text TEXT NOT NULL,
+            FOREIGN KEY (progress_id) REFERENCES progress (id),
+            FOREIGN KEY (site_id) REFERENCES sites (id)
+        )
+    ''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_ai_findings_progress_id ON ai_findings(progress_id, kind)")
+
+    # Verification versions table - re-verifications of progress entries, kept alongside
+    # the original analysis in progress.ai_report / ai_verification_status
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS verification_versions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            progress_id INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            run_name TEXT NOT NULL,
+            model TEXT NOT NULL,
+            ai_report TEXT NOT NULL,
+            ai_verification_status TEXT NOT NULL,
+            findings TEXT,
+            prompt_tokens INTEGER,
+            output_tokens INTEGER,
+            created_at TEXT NOT NULL,
+            UNIQUE (progress_id, version),
+            UNIQUE (progress_id, run_name),
+            FOREIGN KEY (progress_id) REFERENCES progress (id)
+        )
+    ''')
+
+    # Image analyses table - per-photo results of map-reduce analyses, kept so a
+    # retried analysis only re-runs the photos that failed
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS image_analyses (
+            context_hash TEXT NOT NULL,
+            image_hash TEXT NOT NULL,
+            model TEXT NOT NULL,
+            result TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (context_hash, image_hash)
+        )
+    ''')
+
+    # Export watermarks table - last exported row id per incremental export
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS export_watermarks (
+            name TEXT PRIMARY KEY,
+            last_id INTEGER NOT NULL,
+            exported_at TEXT NOT NULL
+        )
+    ''')
+
     conn.commit()
     conn.close()
 
@@ -136,23 +256,195 @@ def update_site_status(site_id, status):
 def add_progress(site_id, user_id, date, category, description, image, ai_report, ai_verification_status, progress_percentage=0, work_types_data=None, floor_name=None):
     conn = sqlite3.connect('construction.db')
     c = conn.cursor()
-    c.execute("""INSERT INTO progress (site_id, user_id, date, category, description, image, ai_report, 
-                 ai_verification_status, progress_percentage) 
-                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-              (site_id, user_id, date, category, description, image, ai_report, ai_verification_status, progress_percentage))
     
-    # Get the progress_id of the inserted row
-    progress_id = c.lastrowid
+    try:
+        c.execute("""INSERT INTO progress (site_id, user_id, date, category, description, image, ai_report, 
+                     ai_verification_status, progress_percentage) 
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                  (site_id, user_id, date, category, description, image, ai_report, ai_verification_status, progress_percentage))
+        
+        # Get the progress_id of the inserted row
+        progress_id = c.lastrowid
+        
+        # Insert work types data if provided
+        if work_types_data and floor_name:
+            insert_work_types(c, progress_id, site_id, date,
+                              [(floor_name, work_name, details['status'], details['progress'])
+                               for work_name, details in work_types_data.items()])
+        
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def work_type_rows(floor_entries):
+    """Flatten the floor entries of a submission into (floor_name, work_name, status, progress) rows"""
+    return [(floor_entry['floor_name'], work_name, details['status'], details['progress'])
+            for floor_entry in floor_entries
+            for work_name, details in floor_entry['work_types'].items()]
+
+def validate_work_type_row(floor_name, work_name, status, progress):
+    """
+    Check one (floor_name, work_name, status, progress) work type row and
+    return it normalized. Raises ValueError describing the first problem.
+    """
+    for field, value in (('floor_name', floor_name), ('work_name', work_name), ('status', status)):
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f"{field} must be a non-empty string, got {value!r}")
+    try:
+        progress = int(progress)
+    except (TypeError, ValueError):
+        raise ValueError(f"progress must be an integer, got {progress!r}")
+    if not 0 <= progress <= 100:
+        raise ValueError(f"progress must be between 0 and 100, got {progress}")
+    return floor_name.strip(), work_name.strip(), status.strip(), progress
+
+def insert_work_types(c, progress_id, site_id, date, rows):
+    """
+    Validate and insert the work type rows of a progress entry in one
+    executemany batch, using the caller's cursor so they are saved in the
+    same transaction as the entry. rows are (floor_name, work_name, status,
+    progress) tuples. Raises ValueError naming the first invalid row before
+    anything is written. Returns the ids of the inserted rows in input order.
+    """
+    params = []
+    for index, row in enumerate(rows):
+        try:
+            floor_name, work_name, status, progress = validate_work_type_row(*row)
+        except ValueError as e:
+            raise ValueError(f"Work type row {index}: {e}")
+        params.append((progress_id, site_id, floor_name, work_name, status, progress, date))
     
-    # Insert work types data if provided
-    if work_types_data and floor_name:
-        for work_name, details in work_types_data.items():
-            c.execute("""INSERT INTO work_types (progress_id, site_id, floor_name, work_name, status, progress_percentage, date)
-                         VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                      (progress_id, site_id, floor_name, work_name, details['status'], details['progress'], date))
+    if not params:
+        return []
     
-    conn.commit()
+    c.executemany("""INSERT INTO work_types (progress_id, site_id, floor_name, work_name, 
+                     status, progress_percentage, date)
+                     VALUES (?, ?, ?, ?, ?, ?, ?)""", params)
+    
+    # The transaction holds the write lock, so the batch received consecutive ids
+    c.execute("SELECT last_insert_rowid()")
+    last_id = c.fetchone()[0]
+    return list(range(last_id - len(params) + 1, last_id + 1))
+
+def get_write_connection():
+    """
+    Open a connection for a write transaction. The connection is in
+    autocommit mode so callers start transactions explicitly with
+    BEGIN IMMEDIATE, taking the write lock up front instead of failing with
+    "database is locked" when a read transaction is upgraded mid-way.
+    """
+    conn = sqlite3.connect('construction.db', timeout=DB_BUSY_TIMEOUT_SECONDS, isolation_level=None)
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_SECONDS * 1000}")
+    # Safe with WAL: a power loss can only drop the latest commits, never corrupt the file
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+def _add_progress_multi_floor(site_id, user_id, date, category, description, images, ai_report,
+                              ai_verification_status, progress_percentage, floor_entries, ai_findings):
+    conn = get_write_connection()
+    c = conn.cursor()
+    
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        
+        # Insert main progress record
+        c.execute("""INSERT INTO progress (site_id, user_id, date, category, description, image, 
+                     ai_report, ai_verification_status, progress_percentage) 
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                  (site_id, user_id, date, category, description, b'', ai_report, 
+                   ai_verification_status, progress_percentage))
+        
+        progress_id = c.lastrowid
+        
+        # Store each distinct photo once
+        store_images(c, progress_id, images)
+        
+        # Insert work types for all floors in one batch
+        insert_work_types(c, progress_id, site_id, date, work_type_rows(floor_entries))
+        
+        # Store structured AI findings so reports can query them directly
+        if ai_findings:
+            add_ai_findings(c, progress_id, site_id, ai_findings)
+        
+        c.execute("COMMIT")
+        return progress_id
+    except Exception:
+        if conn.in_transaction:
+            c.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+# Background writer thread for single-writer mode, started on first use
+_writer = None
+_writer_lock = threading.Lock()
+
+def _get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db-writer')
+        return _writer
+
+def add_progress_multi_floor(site_id, user_id, date, category, description, images, ai_report,
+                             ai_verification_status, progress_percentage, floor_entries, ai_findings=None,
+                             single_writer=None):
+    """
+    Save a multi-floor progress submission (entry, photos, work types and AI
+    findings) in one write transaction. Images are kept in the deduplicated
+    image store; progress.image stays empty for new entries.
+    
+    With single_writer (default: DB_SINGLE_WRITER) the write runs on a
+    single background writer thread and the caller waits for it, so
+    concurrent submissions are queued instead of contending for the lock.
+    Returns the new progress id.
+    """
+    if single_writer is None:
+        single_writer = DB_SINGLE_WRITER
+    
+    args = (site_id, user_id, date, category, description, images, ai_report,
+            ai_verification_status, progress_percentage, floor_entries, ai_findings)
+    if not single_writer:
+        return _add_progress_multi_floor(*args)
+    
+    return _get_writer().submit(_add_progress_multi_floor, *args).result()
+
+def add_ai_findings(c, progress_id, site_id, findings):
+    """
+    Insert structured AI findings for a progress entry using the caller's
+    cursor, so they are saved in the same transaction as the entry
+    """
+    rows = [(progress_id, site_id, 'section', position, title, text)
+            for position, (title, text) in enumerate(findings.get('sections', []))]
+    for key, kind in AI_FINDING_KINDS.items():
+        rows.extend((progress_id, site_id, kind, position, None, text)
+                    for position, text in enumerate(findings.get(key, [])))
+    
+    c.executemany("""INSERT INTO ai_findings (progress_id, site_id, kind, position, title, text)
+                     VALUES (?, ?, ?, ?, ?, ?)""", rows)
+
+def get_ai_findings(progress_ids, kind):
+    """Get findings of one kind for the given progress entries as {progress_id: [text, ...]}"""
+    if not progress_ids:
+        return {}
+    
+    conn = sqlite3.connect('construction.db')
+    c = conn.cursor()
+    placeholders = ','.join('?' * len(progress_ids))
+    c.execute(f"""SELECT progress_id, text 
+                  FROM ai_findings 
+                  WHERE kind = ? AND progress_id IN ({placeholders})
+                  ORDER BY progress_id, position""", [kind] + list(progress_ids))
+    results = c.fetchall()
     conn.close()
+    
+    findings = {}
+    for progress_id, text in results:
+        findings.setdefault(progress_id, []).append(text)
+    return findings
 
 def get_progress_by_site(site_id):
     conn = sqlite3.connect('construction.db')
@@ -214,6 +506,17 @@ def get_all_statistics():
         'active_sites': active_sites
     }
 
+def get_site_revision(site_id):
+    """Get a revision token that changes whenever a site's progress or work type data changes"""
+    conn = sqlite3.connect('construction.db')
+    c = conn.cursor()
+    c.execute("""SELECT COUNT(*), IFNULL(MAX(id), 0) FROM progress WHERE site_id = ?""", (site_id,))
+    progress_rev = c.fetchone()
+    c.execute("""SELECT COUNT(*), IFNULL(MAX(id), 0) FROM work_types WHERE site_id = ?""", (site_id,))
+    work_types_rev = c.fetchone()
+    conn.close()
+    return progress_rev + work_types_rev
+
 def get_progress_timeline(site_id):
     """Get progress percentage over time for timeline chart"""
     conn = sqlite3.connect('construction.db')
@@ -226,6 +529,40 @@ def get_progress_timeline(site_id):
     conn.close()
     return timeline
 
+def get_progress_timeline_bucketed(site_id, max_points=TIMELINE_MAX_POINTS):
+    """
+    Get a bounded progress timeline for charting.
+    
+    Rows are bucketed in SQL by day, week or month (the finest bucket that
+    fits the site's date range into max_points), keeping the peak progress
+    of each bucket, then downsampled with LTTB if still above max_points.
+    Returns (bucket name, [(date, progress_percentage, updates), ...]).
+    """
+    conn = sqlite3.connect('construction.db')
+    c = conn.cursor()
+    
+    c.execute("""SELECT julianday(MAX(date)) - julianday(MIN(date)) 
+                 FROM progress 
+                 WHERE site_id = ?""", (site_id,))
+    span_days = c.fetchone()[0] or 0
+    
+    bucket, bucket_format = TIMELINE_BUCKETS[-1][:2]
+    for name, fmt, days in TIMELINE_BUCKETS:
+        if span_days / days <= max_points:
+            bucket, bucket_format = name, fmt
+            break
+    
+    c.execute("""SELECT julianday(MIN(date)), MIN(date), MAX(progress_percentage), COUNT(*) 
+                 FROM progress 
+                 WHERE site_id = ? 
+                 GROUP BY strftime(?, date)
+                 ORDER BY MIN(date) ASC""", (site_id, bucket_format))
+    points = c.fetchall()
+    conn.close()
+    
+    points = downsample_lttb(points, max_points)
+    return bucket, [(date, progress, updates) for _, date, progress, updates in points]
+
 def get_category_breakdown(site_id):
     """Get count of updates by category"""
     conn = sqlite3.connect('construction.db')
@@ -265,93 +602,25 @@ def get_monthly_progress(site_id):
     return monthly
 
 def get_floor_wise_progress(site_id):
-    """Get progress updates grouped by floor from work_types table"""
+    """
+    Get progress updates grouped by floor from work_types table.
+    Legacy entries that only carried floor data in their description are
+    converted to work_types rows once by backfill_work_types.py.
+    """
     conn = sqlite3.connect('construction.db')
     c = conn.cursor()
     
-    # Try to get data from work_types table first (new structured data)
+    # Floors ordered by their most recent update, newest first
     c.execute("""
-        SELECT floor_name, work_name, progress_percentage 
+        SELECT floor_name, COUNT(*), AVG(progress_percentage), COUNT(DISTINCT work_name)
         FROM work_types 
         WHERE site_id = ?
-        ORDER BY date DESC
+        GROUP BY floor_name
+        ORDER BY MAX(date) DESC
     """, (site_id,))
-    work_results = c.fetchall()
-    
-    floor_stats = {}
-    
-    if work_results:
-        # Use structured data from work_types table
-        for floor_name, work_name, progress in work_results:
-            if floor_name not in floor_stats:
-                floor_stats[floor_name] = {
-                    'count': 0,
-                    'total_progress': 0,
-                    'work_types': []
-                }
-            
-            floor_stats[floor_name]['count'] += 1
-            floor_stats[floor_name]['total_progress'] += progress
-            if work_name not in floor_stats[floor_name]['work_types']:
-                floor_stats[floor_name]['work_types'].append(work_name)
-    else:
-        # Fallback to parsing descriptions for old data
-        c.execute("""SELECT description FROM progress WHERE site_id = ?""", (site_id,))
-        results = c.fetchall()
-        
-        for (description,) in results:
-            if "--- FLOOR-WISE DETAILS ---" in description:
-                parts = description.split("--- FLOOR-WISE DETAILS ---")
-                if len(parts) > 1:
-                    floor_section = parts[1]
-                    
-                    # Extract floor
-                    floor_name = "Unknown"
-                    if "Floor: " in floor_section:
-                        floor_line = [line for line in floor_section.split('\n') if "Floor: " in line]
-                        if floor_line:
-                            floor_name = floor_line[0].replace("Floor: ", "").strip()
-                    
-                    # Extract floor progress
-                    floor_progress = 0
-                    if "Floor Progress: " in floor_section:
-                        prog_line = [line for line in floor_section.split('\n') if "Floor Progress: " in line]
-                        if prog_line:
-                            prog_str = prog_line[0].replace("Floor Progress: ", "").strip().replace("%", "")
-                            try:
-                                floor_progress = int(prog_str)
-                            except:
-                                floor_progress = 0
-                    
-                    # Aggregate stats
-                    if floor_name not in floor_stats:
-                        floor_stats[floor_name] = {
-                            'count': 0,
-                            'total_progress': 0,
-                            'work_types': []
-                        }
-                    
-                    floor_stats[floor_name]['count'] += 1
-                    floor_stats[floor_name]['total_progress'] += floor_progress
-                    
-                    # Extract work types
-                    if "Work Types Being Carried Out:" in floor_section:
-                        work_section = floor_section.split("Work Types Being Carried Out:")[1]
-                        work_lines = [line.strip() for line in work_section.split('\n') if line.strip().startswith('-')]
-                        for line in work_lines:
-                            work_name = line.split(':')[0].replace('-', '').strip()
-                            if work_name and work_name not in floor_stats[floor_name]['work_types']:
-                                floor_stats[floor_name]['work_types'].append(work_name)
-    
+    result = c.fetchall()
     conn.close()
     
-    # Calculate averages and format
-    result = []
-    for floor, stats in floor_stats.items():
-        avg_progress = stats['total_progress'] / stats['count'] if stats['count'] > 0 else 0
-        work_types_count = len(stats['work_types'])
-        result.append((floor, stats['count'], avg_progress, work_types_count))
-    
     return result
 
 def get_work_type_breakdown(site_id):
@@ -442,6 +711,150 @@ def get_floor_wise_work_type_breakdown(site_id):
     
     return floor_work_data
 
+def get_work_type_history(site_id):
+    """Get every work type entry for a site as flat rows"""
+    conn = sqlite3.connect('construction.db')
+    c = conn.cursor()
+    c.execute("""
+        SELECT floor_name, work_name, status, progress_percentage, date
+        FROM work_types 
+        WHERE site_id = ?
+    """, (site_id,))
+    results = c.fetchall()
+    conn.close()
+    return results
+
+def get_progress_floor_entries(progress_id):
+    """
+    Rebuild the floor entries of a saved progress entry from its work types,
+    in the shape collected by the upload form (floor_name, work_phase,
+    floor_progress, work_types)
+    """
+    conn = sqlite3.connect('construction.db')
+    c = conn.cursor()
+    c.execute("""SELECT floor_name, work_name, status, progress_percentage
+                 FROM work_types
+                 WHERE progress_id = ?
+                 ORDER BY id""", (progress_id,))
+    rows = c.fetchall()
+    conn.close()
+    
+    floors = {}
+    for floor_name, work_name, status, progress in rows:
+        floors.setdefault(floor_name, {})[work_name] = {'status': status, 'progress': progress}
+    
+    floor_entries = []
+    for floor_name, work_types in floors.items():
+        statuses = {details['status'] for details in work_types.values()}
+        if statuses == {"Completed"}:
+            work_phase = "Completed"
+        elif statuses == {"Not Started"}:
+            work_phase = "Not Started"
+        else:
+            work_phase = "In Progress"
+        floor_entries.append({
+            'floor_name': floor_name,
+            'work_phase': work_phase,
+            'floor_progress': round(sum(d['progress'] for d in work_types.values()) / len(work_types)),
+            'work_types': work_types
+        })
+    return floor_entries
+
+def get_reverification_candidates(run_name, site_id=None, start_date=None, end_date=None, limit=None):
+    """
+    Get (id, site_id, date, category, description, ai_verification_status) of
+    progress entries not yet re-verified in a run, oldest first
+    """
+    query = """SELECT p.id, p.site_id, p.date, p.category, p.description, p.ai_verification_status
+               FROM progress p
+               WHERE NOT EXISTS (SELECT 1 FROM verification_versions v
+                                 WHERE v.progress_id = p.id AND v.run_name = ?)"""
+    params = [run_name]
+    if site_id is not None:
+        query += " AND p.site_id = ?"
+        params.append(site_id)
+    if start_date:
+        query += " AND p.date >= ?"
+        params.append(str(start_date))
+    if end_date:
+        query += " AND p.date <= ?"
+        params.append(f"{end_date} 23:59:59")
+    query += " ORDER BY p.date ASC, p.id ASC"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    
+    conn = sqlite3.connect('construction.db')
+    c = conn.cursor()
+    c.execute(query, params)
+    results = c.fetchall()
+    conn.close()
+    return results
+
+def add_verification_version(progress_id, run_name, model, ai_report, ai_verification_status,
+                             findings=None, prompt_tokens=None, output_tokens=None, created_at=None):
+    """Store a re-verification of a progress entry as its next version; returns the version number"""
+    conn = get_write_connection()
+    c = conn.cursor()
+    
+    try:
+        c.execute("BEGIN IMMEDIATE")
+        c.execute("SELECT IFNULL(MAX(version), 0) + 1 FROM verification_versions WHERE progress_id = ?",
+                  (progress_id,))
+        version = c.fetchone()[0]
+        c.execute("""INSERT INTO verification_versions (progress_id, version, run_name, model, ai_report,
+                     ai_verification_status, findings, prompt_tokens, output_tokens, created_at)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                  (progress_id, version, run_name, model, ai_report, ai_verification_status,
+                   json.dumps(findings) if findings is not None else None,
+                   prompt_tokens, output_tokens,
+                   created_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        c.execute("COMMIT")
+        return version
+    except Exception:
+        if conn.in_transaction:
+            c.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def get_verification_versions(progress_id):
+    """Get (version, run_name, model, ai_verification_status, ai_report, created_at) re-verifications of an entry"""
+    conn = sqlite3.connect('construction.db')
+    c = conn.cursor()
+    c.execute("""SELECT version, run_name, model, ai_verification_status, ai_report, created_at
+                 FROM verification_versions
+                 WHERE progress_id = ?
+                 ORDER BY version""", (progress_id,))
+    results = c.fetchall()
+    conn.close()
+    return results
+
+def get_image_analyses(context_hash, image_hashes):
+    """Get saved per-photo analysis results for a submission context as {image_hash: result}"""
+    if not image_hashes:
+        return {}
+    
+    conn = sqlite3.connect('construction.db')
+    c = conn.cursor()
+    placeholders = ','.join('?' * len(image_hashes))
+    c.execute(f"""SELECT image_hash, result FROM image_analyses
+                  WHERE context_hash = ? AND image_hash IN ({placeholders})""",
+              [context_hash] + list(image_hashes))
+    results = dict(c.fetchall())
+    conn.close()
+    return results
+
+def save_image_analysis(context_hash, image_hash, model, result):
+    """Save the analysis result of one photo of a submission context"""
+    conn = get_write_connection()
+    conn.execute("""INSERT INTO image_analyses (context_hash, image_hash, model, result, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(context_hash, image_hash) DO UPDATE SET result = excluded.result,
+                                                                        created_at = excluded.created_at""",
+                 (context_hash, image_hash, model, result, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    conn.close()
+
 def get_work_type_floor_matrix(site_id):
     """Get matrix of work types vs floors with progress percentages"""
     conn = sqlite3.connect('construction.db')
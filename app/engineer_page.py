@@ -5,7 +5,6 @@ Supports multi-floor data entry, work type tracking, and AI-powered verification
 
 import streamlit as st
 import datetime
-import pickle
 import re
 import csv
 from io import BytesIO, StringIO
@@ -30,6 +29,8 @@ from database import (
     get_floor_wise_progress, 
     get_work_type_breakdown
 )
+from image_container import pack_images
+from image_store import decode_legacy_images
 
 load_dotenv()
 genai.configure(api_key=os.environ.get("GOOGLE_API_KEY", ""))
@@ -468,7 +469,7 @@ def render_upload_form(site_id, site_details):
         
         # Collect image data
         image_data_list = [file.getvalue() for file in uploaded_files]
-        combined_image_data = pickle.dumps(image_data_list)
+        combined_image_data = pack_images(image_data_list)
         
         # Generate enhanced description with floor data
         enhanced_description = f"{description}\n\n"
@@ -742,13 +743,9 @@ def render_progress_entry_details(entry, site_details):
     
     entry_id, date, username, category, description, image, ai_report, verification_status, progress_pct = entry
     
-    # Try to load images
-    try:
-        image_list = pickle.loads(image)
-        num_images = len(image_list)
-    except:
-        image_list = [image]
-        num_images = 1
+    # Load images (image container, legacy pickled list or single image)
+    image_list = decode_legacy_images(image)
+    num_images = len(image_list)
     
     # Layout
     col1, col2 = st.columns([1, 1])
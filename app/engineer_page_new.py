@@ -5,25 +5,24 @@ Supports multi-floor data entry, work type tracking, and AI-powered verification
 
 import streamlit as st
 from datetime import datetime
-import pickle
 import re
 import csv
-from io import BytesIO, StringIO
+from io import StringIO
 from fpdf import FPDF
-import PIL.Image
 import google.generativeai as genai
 import os
 from dotenv import load_dotenv
 import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
+import numpy as np
 
 from database import (
     get_sites, 
     get_site_by_id, 
     add_progress, 
     get_progress_by_site,
-    get_progress_timeline, 
+    get_progress_timeline_bucketed, 
     get_category_breakdown, 
     get_verification_breakdown,
     get_monthly_progress, 
@@ -31,11 +30,24 @@ from database import (
     get_work_type_breakdown,
     get_floor_wise_work_type_breakdown,
     get_work_type_floor_matrix,
-    get_floor_completion_stats
+    get_floor_completion_stats,
+    get_site_revision,
+    get_work_type_history,
+    add_progress_multi_floor,
+    get_ai_findings,
+    get_verification_versions
 )
+from ai_analysis import get_gemini_analysis_shared, start_analysis_warmup
+from image_quality import assess_images
+from image_store import load_progress_images
+from photo_index import find_similar_photos
+from upload_staging import stage_uploads, staging_exists, load_staged_images, remove_staging
+from figure_cache import get_cached_figure, get_cached_frame
+from data_export import export_csv
 
 load_dotenv()
 genai.configure(api_key=st.secrets.GOOGLE_API_KEY)
+start_analysis_warmup()
 
 # ===========================
 # CONFIGURATION & CONSTANTS
@@ -83,6 +95,29 @@ WORK_STATUS_OPTIONS = [
     "Completed"
 ]
 
+EXPORT_DATASET_LABELS = {
+    "Progress Updates": "progress",
+    "Work Types": "work_types"
+}
+
+ANALYSIS_TIER_LABELS = {
+    'local': "local photo checks (no AI call)",
+    'triage': "the quick AI check",
+    'full': "the full AI analysis"
+}
+
+ENGINEER_VIEWS = [
+    "📤 Upload Progress",
+    "📊 Progress History",
+    "📈 Analytics"
+]
+
+FLOOR_ANALYSIS_VIEWS = [
+    "📊 Progress Heatmap",
+    "📈 Floor Comparison",
+    "📋 Detailed Table"
+]
+
 # ===========================
 # UTILITY FUNCTIONS
 # ===========================
@@ -122,160 +157,24 @@ def initialize_session_state():
         st.session_state.pending_analysis = None
     if 'current_floor_data' not in st.session_state:
         st.session_state.current_floor_data = {}
+    if 'engineer_active_view' not in st.session_state:
+        st.session_state.engineer_active_view = ENGINEER_VIEWS[0]
 
-# ===========================
-# AI ANALYSIS FUNCTIONS
-# ===========================
-
-def get_gemini_analysis(description, image_data_list, category, floor_data):
+def render_view_selector(views, key):
     """
-    Send all collected data to Gemini AI for comprehensive analysis
+    Render a tab-like view selector and return the selected view.
+    
+    Unlike st.tabs, which executes every tab body on each rerun, only the
+    returned view is rendered by the caller. The selection is kept in
+    st.session_state[key] so it survives reruns.
     """
-    try:
-        model = genai.GenerativeModel('models/gemini-2.5-flash-lite')
-        
-        # Convert images
-        images = []
-        for img_data in image_data_list:
-            image = PIL.Image.open(BytesIO(img_data))
-            images.append(image)
-        
-        # Build comprehensive prompt with all floor data
-        floor_summary = "\n\n**FLOOR-WISE PROGRESS DETAILS:**\n"
-        total_work_types = 0
-        total_floors = len(floor_data)
-        
-        for idx, floor_info in enumerate(floor_data, 1):
-            floor_summary += f"\n**Floor {idx}/{total_floors}: {floor_info['floor_name']}**\n"
-            floor_summary += f"  📊 Work Phase: {floor_info['work_phase']}\n"
-            floor_summary += f"  📈 Overall Floor Progress: {floor_info['floor_progress']}%\n"
-            floor_summary += f"  🔧 Work Types Tracked: {len(floor_info['work_types'])}\n"
-            floor_summary += "  📋 Detailed Work Breakdown:\n"
-            
-            for work_type, details in floor_info['work_types'].items():
-                total_work_types += 1
-                floor_summary += f"    • {work_type}:\n"
-                floor_summary += f"      - Status: {details['status']}\n"
-                floor_summary += f"      - Progress: {details['progress']}%\n"
-        
-        # Add statistical summary
-        floor_summary += f"\n**📊 SUMMARY STATISTICS:**\n"
-        floor_summary += f"  - Total Floors: {total_floors}\n"
-        floor_summary += f"  - Total Work Types Tracked: {total_work_types}\n"
-        avg_floor_progress = sum(f['floor_progress'] for f in floor_data) / total_floors if total_floors > 0 else 0
-        floor_summary += f"  - Average Floor Progress: {avg_floor_progress:.1f}%\n"
-        
-        prompt = f"""You are a certified construction site inspector conducting a professional analysis with deep floor-wise tracking.
-
-**PROJECT CONTEXT:**
-- Work Category: {category}
-- Number of Images Submitted: {len(images)}
-- Total Floors Tracked: {total_floors}
-- Total Work Types: {total_work_types}
-- Engineer's Overall Description: {description}
-
-{floor_summary}
-
-**ANALYSIS INSTRUCTIONS:**
-Examine all {len(images)} image(s) and cross-reference with the comprehensive floor-wise progress data provided above.
-
-**CRITICAL FOCUS AREAS:**
-1. **Floor Identification**: Try to identify which floor(s) each image represents based on visual cues
-2. **Work Type Verification**: Verify if the claimed work types are visible in the images
-3. **Progress Accuracy**: Assess if the claimed progress percentages align with visual evidence
-4. **Cross-Floor Consistency**: Check if progress is consistent across floors
-5. **Phase Alignment**: Verify if work phases (Not Started/In Progress/Completed) match visual reality
-
-**REQUIRED REPORT STRUCTURE:**
-
-**1. VERIFICATION STATUS**
-Select ONE based on comprehensive visual evidence:
-- ✅ VERIFIED: Visual evidence fully confirms reported work across all floors
-- ⚠️ PARTIALLY VERIFIED: Some aspects confirmed, but discrepancies noted on specific floors
-- ❌ NOT VERIFIED: Visual evidence contradicts description or floor data
-- ℹ️ INSUFFICIENT DATA: Image quality/coverage inadequate for {total_floors} floors
-
-**2. VISUAL EVIDENCE ANALYSIS**
-- Document what is clearly visible in each image
-- Identify which floor(s) each image likely represents (if determinable)
-- List materials, equipment, and completed work visible
-- Note image quality and coverage adequacy for {total_floors} floors
-- Compare visual findings with engineer's floor-wise breakdown
-
-**3. TECHNICAL QUALITY ASSESSMENT**
-- **Workmanship Rating:** [Excellent/Good/Adequate/Poor/Cannot Assess]
-- **Justification:** Specific observations from images
-- **Materials & Specifications:** Visible materials and their condition
-- **Defects/Issues:** Any visible problems or quality concerns
-- **Industry Standards Compliance:** Compliance with standards for {category}
-- **Floor-wise Quality Variations:** Note any quality differences between floors
-
-**4. SAFETY & COMPLIANCE**
-- **PPE Status:** Visible safety gear and compliance
-- **Site Safety Measures:** Barriers, signage, fall protection systems
-- **Hazard Identification:** List all visible hazards
-- **Housekeeping:** Site cleanliness and organization by floor
-- **Access Safety:** Scaffolding, ladders, and floor access safety
-
-**5. DETAILED FLOOR-WISE VERIFICATION**
-For EACH floor mentioned in the data, provide:
-- **Visual Evidence Match**: Does any image show this floor? (Yes/No/Uncertain)
-- **Progress Verification**: Does claimed {floor_info['floor_progress']}% seem accurate?
-- **Work Type Confirmation**: Which claimed work types are actually visible?
-- **Phase Accuracy**: Is the work phase ({floor_info['work_phase']}) correct based on images?
-- **Discrepancies**: Any differences between claimed and observed status?
-- **Recommendations**: Specific actions needed for this floor
-
-**6. WORK TYPE ANALYSIS**
-For each work type category:
-- Verify presence and progress across floors
-- Identify any work types not visible in images but claimed
-- Note quality and completion status where visible
-- Highlight any concerning work types
-
-**7. RECOMMENDATIONS**
-- **Immediate Actions Required**: By floor and work type
-- **Quality Improvements**: Specific recommendations
-- **Additional Documentation Needed**: Missing photos or data
-- **Follow-up Inspections**: Which floors/work types need re-inspection
-- **Priority Items**: Most critical issues to address
-
-**8. PROGRESS ASSESSMENT**
-- **Overall Site Completion:** [0-100]%
-- **Floor-by-Floor Assessment**: Brief status of each floor
-- **Most Advanced Floor**: Which floor is furthest along?
-- **Most Delayed Floor**: Which floor needs attention?
-- **Work Remaining**: Detailed breakdown of pending work
-- **Timeline Assessment**: Is overall progress on track?
-- **Critical Path Items**: Work types blocking other progress
-
-**9. DATA QUALITY & COMPLETENESS**
-- **Image Coverage**: Are {len(images)} images sufficient for {total_floors} floors?
-- **Missing Documentation**: What additional photos are needed?
-- **Data Consistency**: Is the floor-wise data internally consistent?
-- **Confidence Level**: High/Medium/Low confidence in this assessment
-
-Provide objective, evidence-based analysis using precise construction terminology. Be specific about which floors and work types you can/cannot verify from the images."""
-
-        # Generate content
-        content = [prompt] + images
-        response = model.generate_content(content)
-        
-        # Extract verification status
-        response_text = response.text
-        if "✅ VERIFIED" in response_text or "VERIFIED: Work matches" in response_text:
-            status = "Verified"
-        elif "⚠️ PARTIALLY VERIFIED" in response_text:
-            status = "Partially Verified"
-        elif "❌ NOT VERIFIED" in response_text:
-            status = "Not Verified"
-        else:
-            status = "Needs Review"
-        
-        return response_text, status
-        
-    except Exception as e:
-        return f"Error generating AI analysis: {str(e)}", "Error"
+    return st.radio(
+        "View",
+        views,
+        key=key,
+        horizontal=True,
+        label_visibility="collapsed"
+    )
 
 # ===========================
 # FLOOR DATA COLLECTION UI
@@ -482,12 +381,54 @@ def render_upload_form(site_id, site_details):
         help="Upload clear photos from all floors showing the work completed"
     )
     
+    reused_photos = []
+    unusable_photos = []
     if uploaded_files:
         st.success(f"✅ **{len(uploaded_files)} image(s) uploaded**")
+        
+        # Local quality gate: unusable photos are kept with the entry but not sent to the AI
+        photo_data = [file.getvalue() for file in uploaded_files]
+        assessments = assess_images(photo_data)
+        unusable_photos = [idx for idx, assessment in enumerate(assessments) if not assessment['usable']]
+        
         cols = st.columns(min(len(uploaded_files), 4))
         for idx, file in enumerate(uploaded_files):
             with cols[idx % 4]:
-                st.image(file, caption=f"Image {idx+1}", use_container_width=True)
+                caption = f"Image {idx+1}"
+                if not assessments[idx]['usable']:
+                    caption += f" ⚠️ {', '.join(assessments[idx]['problems'])}"
+                st.image(file, caption=caption, use_container_width=True)
+        
+        if unusable_photos:
+            if len(unusable_photos) == len(uploaded_files):
+                st.error("❌ **None of the photos is usable for AI verification.** "
+                         "Retake them in good light, hold the camera steady and use full resolution.")
+            else:
+                st.warning(f"⚠️ **{len(unusable_photos)} photo(s) failed the quality check** and will not be "
+                           "sent for AI analysis: "
+                           + "; ".join(f"Image {idx + 1} ({', '.join(assessments[idx]['problems'])})"
+                                       for idx in unusable_photos))
+        
+        # Flag photos already submitted for this site before paying for an AI call
+        reused_photos = find_similar_photos(site_id, photo_data)
+        if reused_photos:
+            st.warning(f"⚠️ **{len(reused_photos)} photo(s) match photos already submitted for this site**")
+            for match in reused_photos:
+                similarity = "identical" if match['distance'] == 0 else "near-duplicate"
+                st.write(f"- Image {match['image_index'] + 1}: {similarity} of image {match['position'] + 1} "
+                         f"from the update on {match['date'][:10]} (entry #{match['progress_id']})")
+            st.checkbox(
+                "I confirm these photos show the current state of work",
+                key="confirm_reused_photos"
+            )
+        
+        if len(uploaded_files) > 1:
+            st.checkbox(
+                "Analyze each photo separately",
+                key="analyze_per_photo",
+                help="Runs one AI call per photo, then combines the results. Slower to start but better "
+                     "for many photos; photos already analyzed are reused if you retry after an error."
+            )
     
     st.markdown("---")
     
@@ -516,9 +457,16 @@ def render_upload_form(site_id, site_details):
             st.error("⚠️ Please upload at least one progress photo")
             return
         
-        # Collect image data
-        image_data_list = [file.getvalue() for file in uploaded_files]
-        combined_image_data = pickle.dumps(image_data_list)
+        if reused_photos and not st.session_state.get('confirm_reused_photos'):
+            st.error("⚠️ Please replace the reused photos or confirm they show the current state of work")
+            return
+        
+        if len(unusable_photos) == len(uploaded_files):
+            st.error("⚠️ Please upload at least one photo that passes the quality check")
+            return
+        
+        analysis_images = [image_data for idx, image_data in enumerate(photo_data)
+                           if idx not in unusable_photos]
         
         # Generate enhanced description with floor data
         enhanced_description = f"{description}\n\n"
@@ -534,26 +482,34 @@ def render_upload_form(site_id, site_details):
             enhanced_description += "\n"
         
         # AI Analysis
-        with st.spinner(f"🤖 Analyzing {len(uploaded_files)} image(s) and {len(st.session_state.floor_entries)} floor(s)..."):
-            ai_report, verification_status = get_gemini_analysis(
+        with st.spinner(f"🤖 Analyzing {len(analysis_images)} image(s) and {len(st.session_state.floor_entries)} floor(s)..."):
+            usage = {}
+            ai_report, verification_status, ai_findings = get_gemini_analysis_shared(
                 description,
-                image_data_list,
+                analysis_images,
                 category,
-                st.session_state.floor_entries
+                st.session_state.floor_entries,
+                usage=usage,
+                map_reduce=len(analysis_images) > 1 and st.session_state.get('analyze_per_photo', False),
+                tiered=True
             )
         
-        # Store in session for review
+        # Store in session for review; the photos wait on disk, not in session state
         st.session_state.pending_analysis = {
             'site_id': site_id,
             'category': category,
             'description': description,
             'enhanced_description': enhanced_description,
-            'combined_image_data': combined_image_data,
+            'staging': stage_uploads(uploaded_files),
             'ai_report': ai_report,
             'verification_status': verification_status,
+            'ai_findings': ai_findings,
             'overall_progress': overall_progress,
             'floor_entries': st.session_state.floor_entries.copy(),
-            'num_images': len(uploaded_files)
+            'num_images': len(uploaded_files),
+            'reused_photos': reused_photos,
+            'unusable_photos': unusable_photos,
+            'usage': usage
         }
         
         st.rerun()
@@ -573,6 +529,13 @@ def render_analysis_review():
     st.markdown("---")
     st.header("🤖 AI Analysis Results")
     
+    if not staging_exists(pending['staging']):
+        st.error("⚠️ The uploaded photos for this submission have expired. Please upload them again.")
+        st.session_state.pending_analysis = None
+        if st.button("📤 Upload Again"):
+            st.rerun()
+        return
+    
     # Verification status badge
     status = pending['verification_status']
     if status == "Verified":
@@ -587,6 +550,43 @@ def render_analysis_review():
     # Display AI Report
     with st.expander("📋 View Complete AI Analysis Report", expanded=True):
         st.markdown(pending['ai_report'])
+        usage = pending.get('usage')
+        if usage and 'prompt_tokens' in usage:
+            floor_detail = usage.get('floor_detail')
+            st.caption(f"Prompt: {usage['prompt_tokens']:,} tokens "
+                       f"(estimated {usage.get('estimated_prompt_tokens', 0):,}"
+                       + (f", floor data sent as {floor_detail} table" if floor_detail else "")
+                       + f") · Output: {usage['output_tokens']:,} tokens"
+                       + (f" · Saved by context cache: {usage['cached_tokens']:,} prompt tokens"
+                          f" ({usage.get('context_cache', 'provider')} cache)"
+                          if usage.get('cached_tokens') else "")
+                       + (" · Shared with an identical request already in progress, no extra tokens used"
+                          if usage.get('coalesced') else ""))
+        if usage and usage.get('tier') in ANALYSIS_TIER_LABELS:
+            st.caption(f"Result from {ANALYSIS_TIER_LABELS[usage['tier']]} in "
+                       f"{sum(usage.get('tier_seconds', {}).values()):.1f}s")
+        
+        if usage and usage.get('tier') == 'triage':
+            if st.button("🔍 Run Full Analysis", key="run_full_analysis",
+                         help="The quick check found the photos consistent with the claimed work. "
+                              "Run the detailed inspection report anyway."):
+                full_usage = {}
+                with st.spinner("🤖 Running the full analysis..."):
+                    ai_report, verification_status, ai_findings = get_gemini_analysis_shared(
+                        pending['description'],
+                        load_staged_images(pending['staging'], exclude=pending.get('unusable_photos', [])),
+                        pending['category'],
+                        pending['floor_entries'],
+                        usage=full_usage
+                    )
+                full_usage['tier'] = 'full'
+                pending.update({
+                    'ai_report': ai_report,
+                    'verification_status': verification_status,
+                    'ai_findings': ai_findings,
+                    'usage': full_usage
+                })
+                st.rerun()
     
     # Review submission details
     with st.expander("📝 Review Submission Details"):
@@ -596,6 +596,10 @@ def render_analysis_review():
             st.markdown(f"**Category:** {pending['category']}")
             st.markdown(f"**Overall Progress:** {pending['overall_progress']}%")
             st.markdown(f"**Images Submitted:** {pending['num_images']}")
+            if pending.get('reused_photos'):
+                st.markdown(f"**Reused Photos (confirmed):** {len(pending['reused_photos'])}")
+            if pending.get('unusable_photos'):
+                st.markdown(f"**Photos Not Analyzed (quality check):** {len(pending['unusable_photos'])}")
         
         with col2:
             st.markdown(f"**Floors Covered:** {len(pending['floor_entries'])}")
@@ -617,11 +621,13 @@ def render_analysis_review():
     
     with col2:
         if st.button("🔄 Modify & Re-analyze", use_container_width=True):
+            remove_staging(pending['staging'])
             st.session_state.pending_analysis = None
             st.rerun()
     
     with col3:
         if st.button("❌ Cancel Submission", use_container_width=True):
+            remove_staging(pending['staging'])
             st.session_state.pending_analysis = None
             st.session_state.floor_entries = []
             st.rerun()
@@ -654,16 +660,18 @@ def save_to_database(pending):
             date=date,
             category=pending['category'],
             description=pending['description'],
-            image=pending['combined_image_data'],
+            images=load_staged_images(pending['staging']),
             ai_report=pending['ai_report'],
             ai_verification_status=pending['verification_status'],
             progress_percentage=pending['overall_progress'],
-            floor_entries=pending['floor_entries']
+            floor_entries=pending['floor_entries'],
+            ai_findings=pending['ai_findings']
         )
         
         st.success("✅ Progress update saved successfully!")
         
-        # Clear session state
+        # Clear session state and the staged photos
+        remove_staging(pending['staging'])
         st.session_state.pending_analysis = None
         st.session_state.floor_entries = []
         
@@ -675,44 +683,6 @@ def save_to_database(pending):
     except Exception as e:
         st.error(f"❌ Error saving to database: {str(e)}")
 
-def add_progress_multi_floor(site_id, user_id, date, category, description, image, ai_report, 
-                              ai_verification_status, progress_percentage, floor_entries):
-    """
-    Enhanced version of add_progress that handles multiple floors
-    """
-    import sqlite3
-    
-    conn = sqlite3.connect('construction.db')
-    c = conn.cursor()
-    
-    try:
-        # Insert main progress record
-        c.execute("""INSERT INTO progress (site_id, user_id, date, category, description, image, 
-                     ai_report, ai_verification_status, progress_percentage) 
-                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                  (site_id, user_id, date, category, description, image, ai_report, 
-                   ai_verification_status, progress_percentage))
-        
-        progress_id = c.lastrowid
-        
-        # Insert work types for each floor
-        for floor_entry in floor_entries:
-            floor_name = floor_entry['floor_name']
-            for work_name, details in floor_entry['work_types'].items():
-                c.execute("""INSERT INTO work_types (progress_id, site_id, floor_name, work_name, 
-                             status, progress_percentage, date)
-                             VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                          (progress_id, site_id, floor_name, work_name, 
-                           details['status'], details['progress'], date))
-        
-        conn.commit()
-        
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        conn.close()
-
 # ===========================
 # PROGRESS HISTORY TAB
 # ===========================
@@ -791,13 +761,9 @@ def render_progress_entry_details(entry, site_details):
     
     entry_id, date, username, category, description, image, ai_report, verification_status, progress_pct = entry
     
-    # Try to load images
-    try:
-        image_list = pickle.loads(image)
-        num_images = len(image_list)
-    except:
-        image_list = [image]
-        num_images = 1
+    # Load images from the image store (or the legacy image column)
+    image_list = load_progress_images(entry_id, image)
+    num_images = len(image_list)
     
     # Layout
     col1, col2 = st.columns([1, 1])
@@ -806,7 +772,8 @@ def render_progress_entry_details(entry, site_details):
         # Display images
         st.markdown(f"**📸 Progress Photos ({num_images}):**")
         for idx, img_data in enumerate(image_list):
-            st.image(BytesIO(img_data), caption=f"Image {idx+1}", use_container_width=True)
+            # Pass the cached bytes object itself rather than a copy
+            st.image(img_data.obj, caption=f"Image {idx+1}", use_container_width=True)
     
     with col2:
         # Metadata
@@ -836,6 +803,16 @@ def render_progress_entry_details(entry, site_details):
     st.markdown("**🤖 AI Analysis Report:**")
     st.markdown(ai_report)
     
+    # Re-verifications stored alongside the original analysis
+    versions = get_verification_versions(entry_id)
+    if versions:
+        st.markdown(f"**🔁 Re-verifications ({len(versions)}):**")
+        for version, run_name, model, version_status, version_report, created_at in versions:
+            st.markdown(f"- **v{version}** ({created_at[:10]}, {model}): {version_status}")
+        latest_version = versions[-1]
+        if st.checkbox(f"Show v{latest_version[0]} report", key=f"reverify_{entry_id}"):
+            st.markdown(latest_version[4])
+    
     st.markdown("---")
     
     # Download PDF
@@ -915,6 +892,335 @@ def generate_pdf_report(entry, site_details, num_images):
         mime="application/pdf"
     )
 
+# ===========================
+# ANALYTICS FIGURE BUILDERS
+# ===========================
+
+VERIFICATION_COLORS = {
+    'Verified': '#28a745',
+    'Partially Verified': '#ffc107',
+    'Not Verified': '#dc3545',
+    'Needs Review': '#6c757d'
+}
+
+def build_timeline_figure(site_id):
+    """Build the progress timeline line chart from the bucketed, downsampled timeline"""
+    bucket, timeline_data = get_progress_timeline_bucketed(site_id)
+    
+    if not timeline_data:
+        return None
+    
+    df = pd.DataFrame(timeline_data, columns=['Date', 'Progress %', 'Updates'])
+    
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=df['Date'],
+        y=df['Progress %'],
+        customdata=df['Updates'],
+        mode='lines+markers',
+        name='Progress',
+        line=dict(color='#0066cc', width=3),
+        marker=dict(size=8),
+        hovertemplate='%{x}<br>Peak Progress: %{y}%<br>Updates: %{customdata}<extra></extra>'
+    ))
+    
+    fig.update_layout(
+        xaxis_title=f"Date (per {bucket})",
+        yaxis_title="Progress %",
+        height=400,
+        yaxis=dict(range=[0, 100])
+    )
+    
+    return fig
+
+def build_category_figure(site_id):
+    """Build the work category pie chart"""
+    category_data = get_category_breakdown(site_id)
+    
+    if not category_data:
+        return None
+    
+    df = pd.DataFrame(category_data, columns=['Category', 'Count'])
+    return px.pie(df, values='Count', names='Category', title='Work Categories')
+
+def build_verification_figure(site_id):
+    """Build the verification status bar chart"""
+    verification_data = get_verification_breakdown(site_id)
+    
+    if not verification_data:
+        return None
+    
+    df = pd.DataFrame(verification_data, columns=['Status', 'Count'])
+    color_list = [VERIFICATION_COLORS.get(s, '#6c757d') for s in df['Status']]
+    
+    fig = go.Figure(data=[go.Bar(
+        x=df['Status'],
+        y=df['Count'],
+        marker_color=color_list
+    )])
+    
+    fig.update_layout(title='Verification Status', height=400)
+    return fig
+
+def build_floor_progress_figure(df):
+    """Build the average progress by floor bar chart"""
+    fig = go.Figure(data=[go.Bar(
+        x=df['Floor'],
+        y=df['Avg Progress'],
+        marker_color='#17a2b8',
+        text=df['Avg Progress'].round(1),
+        textposition='auto'
+    )])
+    fig.update_layout(
+        title='Average Progress by Floor',
+        yaxis=dict(range=[0, 100]),
+        height=400
+    )
+    return fig
+
+def build_floor_updates_figure(df):
+    """Build the updates by floor bar chart"""
+    fig = go.Figure(data=[go.Bar(
+        x=df['Floor'],
+        y=df['Updates'],
+        marker_color='#6f42c1',
+        text=df['Updates'],
+        textposition='auto'
+    )])
+    fig.update_layout(
+        title='Updates by Floor',
+        height=400
+    )
+    return fig
+
+def build_work_type_status_figure(df):
+    """Build the stacked work type status distribution chart"""
+    fig = go.Figure()
+    
+    fig.add_trace(go.Bar(name='Completed', x=df['Work Type'], y=df['Completed'], marker_color='#28a745'))
+    fig.add_trace(go.Bar(name='In Progress', x=df['Work Type'], y=df['In Progress'], marker_color='#ffc107'))
+    
+    not_started = df['Total'] - df['Completed'] - df['In Progress']
+    fig.add_trace(go.Bar(name='Not Started', x=df['Work Type'], y=not_started, marker_color='#6c757d'))
+    
+    fig.update_layout(
+        title='Work Type Status Distribution',
+        barmode='stack',
+        height=400,
+        xaxis_tickangle=-45
+    )
+    
+    return fig
+
+def build_heatmap_figure(site_id, selected_floors):
+    """Build the work type vs floor progress heatmap"""
+    matrix_data = get_work_type_floor_matrix(site_id)
+    
+    # Filter matrix data based on selected floors
+    filtered_matrix = [item for item in matrix_data if item['Floor'] in selected_floors]
+    
+    if not filtered_matrix:
+        return None
+    
+    # Convert to pivot table format
+    df_matrix = pd.DataFrame(filtered_matrix)
+    pivot_table = df_matrix.pivot(index='Work Type', columns='Floor', values='Progress')
+    
+    # Reorder columns based on selected_floors order
+    available_cols = [col for col in selected_floors if col in pivot_table.columns]
+    pivot_table = pivot_table[available_cols]
+    
+    fig = go.Figure(data=go.Heatmap(
+        z=pivot_table.values,
+        x=pivot_table.columns,
+        y=pivot_table.index,
+        colorscale=[
+            [0, '#dc3545'],      # Red for 0%
+            [0.25, '#ffc107'],   # Yellow for 25%
+            [0.5, '#17a2b8'],    # Cyan for 50%
+            [0.75, '#20c997'],   # Teal for 75%
+            [1, '#28a745']       # Green for 100%
+        ],
+        text=pivot_table.values,
+        texttemplate='%{text:.0f}%',
+        textfont={"size": 10},
+        colorbar=dict(title="Progress %"),
+        hoverongaps=False,
+        hovertemplate='<b>%{y}</b><br>Floor: %{x}<br>Progress: %{z:.1f}%<extra></extra>'
+    ))
+    
+    fig.update_layout(
+        title=f'Work Type Progress Heatmap ({len(selected_floors)} Floor(s))',
+        xaxis_title='Floor',
+        yaxis_title='Work Type',
+        height=max(400, len(pivot_table.index) * 30),
+        xaxis={'side': 'top'},
+    )
+    
+    return fig
+
+def build_floor_comparison_figure(filtered_floor_data, selected_floors, selected_work_types):
+    """Build the grouped work type comparison chart across floors"""
+    floors = [f for f in selected_floors if f in filtered_floor_data]
+    
+    fig = go.Figure()
+    
+    for work_type in selected_work_types:
+        progress_values = []
+        for floor in floors:
+            if work_type in filtered_floor_data[floor]:
+                avg_progress = filtered_floor_data[floor][work_type]['total_progress'] / filtered_floor_data[floor][work_type]['count']
+                progress_values.append(avg_progress)
+            else:
+                progress_values.append(0)
+        
+        fig.add_trace(go.Bar(
+            name=work_type,
+            x=floors,
+            y=progress_values,
+            text=[f"{v:.0f}%" for v in progress_values],
+            textposition='auto',
+            hovertemplate='<b>%{fullData.name}</b><br>Floor: %{x}<br>Progress: %{y:.1f}%<extra></extra>'
+        ))
+    
+    fig.update_layout(
+        title=f'Work Type Progress Comparison ({len(selected_floors)} Floor(s))',
+        xaxis_title='Floor',
+        yaxis_title='Average Progress %',
+        barmode='group',
+        height=500,
+        yaxis=dict(range=[0, 100]),
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=-0.3,
+            xanchor="center",
+            x=0.5
+        )
+    )
+    
+    return fig
+
+def build_floor_completion_figure(site_id, selected_floors):
+    """Build the stacked work type completion chart per floor"""
+    floor_stats = get_floor_completion_stats(site_id)
+    
+    # Filter stats based on selected floors
+    filtered_stats = [stat for stat in floor_stats if stat[0] in selected_floors]
+    
+    if not filtered_stats:
+        return None
+    
+    df_stats = pd.DataFrame(filtered_stats, columns=[
+        'Floor', 'Total Work Types', 'Completed', 'In Progress', 'Not Started', 'Avg Progress %'
+    ])
+    
+    fig = go.Figure()
+    
+    fig.add_trace(go.Bar(
+        name='Completed',
+        x=df_stats['Floor'],
+        y=df_stats['Completed'],
+        marker_color='#28a745',
+        text=df_stats['Completed'],
+        textposition='auto'
+    ))
+    
+    fig.add_trace(go.Bar(
+        name='In Progress',
+        x=df_stats['Floor'],
+        y=df_stats['In Progress'],
+        marker_color='#ffc107',
+        text=df_stats['In Progress'],
+        textposition='auto'
+    ))
+    
+    fig.add_trace(go.Bar(
+        name='Not Started',
+        x=df_stats['Floor'],
+        y=df_stats['Not Started'],
+        marker_color='#dc3545',
+        text=df_stats['Not Started'],
+        textposition='auto'
+    ))
+    
+    fig.update_layout(
+        title=f'Work Type Completion Status ({len(selected_floors)} Floor(s))',
+        xaxis_title='Floor',
+        yaxis_title='Number of Work Types',
+        barmode='stack',
+        height=400,
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+    )
+    
+    return fig
+
+# ===========================
+# FLOOR-WISE DETAILED TABLE
+# ===========================
+
+PROGRESS_HIGHLIGHT_COLORS = [
+    (100, 'background-color: #d4edda'),
+    (75, 'background-color: #d1ecf1'),
+    (50, 'background-color: #fff3cd'),
+    (1, 'background-color: #f8d7da')
+]
+NOT_STARTED_HIGHLIGHT = 'background-color: #e2e3e5'
+
+def build_floor_work_type_frame(site_id):
+    """
+    Build one row per (floor, work type) with update count, average
+    progress and the latest status/progress/date, using groupby instead of
+    per-floor Python loops
+    """
+    history = pd.DataFrame(
+        get_work_type_history(site_id),
+        columns=['Floor', 'Work Type', 'Status', 'Progress', 'Date']
+    )
+    
+    # Stable sort so that 'last' within each group is the most recent entry
+    history = history.sort_values('Date', kind='stable')
+    frame = history.groupby(['Floor', 'Work Type'], sort=True).agg(**{
+        'Latest Status': ('Status', 'last'),
+        'Latest Progress': ('Progress', 'last'),
+        'Avg Progress': ('Progress', 'mean'),
+        'Updates': ('Progress', 'size'),
+        'Last Updated': ('Date', 'last')
+    }).reset_index()
+    
+    frame['Last Updated'] = frame['Last Updated'].str[:10].replace('', 'N/A')
+    
+    return frame
+
+def summarize_floor_work_types(frame):
+    """Per-floor work type count, average progress and completed count"""
+    return frame.assign(
+        Completed=frame['Latest Progress'] >= 100
+    ).groupby('Floor', sort=True).agg(**{
+        'Work Types': ('Work Type', 'size'),
+        'Avg Progress': ('Avg Progress', 'mean'),
+        'Completed': ('Completed', 'sum')
+    })
+
+def style_floor_work_table(df):
+    """Color every row by its latest progress, computed for the whole table at once"""
+    progress = df['Latest Progress'].to_numpy()
+    row_colors = np.select(
+        [progress >= threshold for threshold, _ in PROGRESS_HIGHLIGHT_COLORS],
+        [color for _, color in PROGRESS_HIGHLIGHT_COLORS],
+        default=NOT_STARTED_HIGHLIGHT
+    )
+    styles = pd.DataFrame(
+        np.repeat(row_colors[:, None], len(df.columns), axis=1),
+        index=df.index,
+        columns=df.columns
+    )
+    
+    return df.style.apply(lambda _: styles, axis=None).format({
+        'Latest Progress': '{:.0f}%',
+        'Avg Progress': '{:.1f}%'
+    })
+
 # ===========================
 # ANALYTICS TAB
 # ===========================
@@ -930,6 +1236,10 @@ def render_analytics(site_id, site_details):
         st.info("📭 No progress data available. Add updates to see analytics!")
         return
     
+    # Figures are cached per data revision, so unchanged sites and previously
+    # seen filter combinations skip the DataFrame and figure building
+    site_revision = get_site_revision(site_id)
+    
     # Floor Filter Section (Global for all analytics)
     st.markdown("### 🔍 Filter Options")
     
@@ -969,6 +1279,8 @@ def render_analytics(site_id, site_details):
         selected_floors = []
         filtered_floor_data = {}
     
+    floors_key = tuple(selected_floors)
+    
     st.markdown("---")
     
     # Metrics
@@ -993,28 +1305,12 @@ def render_analytics(site_id, site_details):
     
     # Progress Timeline
     st.subheader("📊 Progress Timeline")
-    timeline_data = get_progress_timeline(site_id)
-    
-    if timeline_data:
-        df = pd.DataFrame(timeline_data, columns=['Date', 'Progress %', 'Category'])
-        
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=df['Date'],
-            y=df['Progress %'],
-            mode='lines+markers',
-            name='Progress',
-            line=dict(color='#0066cc', width=3),
-            marker=dict(size=8)
-        ))
-        
-        fig.update_layout(
-            xaxis_title="Date",
-            yaxis_title="Progress %",
-            height=400,
-            yaxis=dict(range=[0, 100])
-        )
-        
+    fig = get_cached_figure(
+        ('timeline', site_id, site_revision),
+        lambda: build_timeline_figure(site_id)
+    )
+    
+    if fig is not None:
         st.plotly_chart(fig, use_container_width=True)
     
     # Charts row
@@ -1022,35 +1318,22 @@ def render_analytics(site_id, site_details):
     
     with col1:
         st.subheader("📂 Category Breakdown")
-        category_data = get_category_breakdown(site_id)
+        fig = get_cached_figure(
+            ('category', site_id, site_revision),
+            lambda: build_category_figure(site_id)
+        )
         
-        if category_data:
-            df = pd.DataFrame(category_data, columns=['Category', 'Count'])
-            fig = px.pie(df, values='Count', names='Category', title='Work Categories')
+        if fig is not None:
             st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.subheader("✅ Verification Status")
-        verification_data = get_verification_breakdown(site_id)
+        fig = get_cached_figure(
+            ('verification', site_id, site_revision),
+            lambda: build_verification_figure(site_id)
+        )
         
-        if verification_data:
-            df = pd.DataFrame(verification_data, columns=['Status', 'Count'])
-            
-            colors = {
-                'Verified': '#28a745',
-                'Partially Verified': '#ffc107',
-                'Not Verified': '#dc3545',
-                'Needs Review': '#6c757d'
-            }
-            color_list = [colors.get(s, '#6c757d') for s in df['Status']]
-            
-            fig = go.Figure(data=[go.Bar(
-                x=df['Status'],
-                y=df['Count'],
-                marker_color=color_list
-            )])
-            
-            fig.update_layout(title='Verification Status', height=400)
+        if fig is not None:
             st.plotly_chart(fig, use_container_width=True)
     
     # Floor-wise analysis
@@ -1069,31 +1352,16 @@ def render_analytics(site_id, site_details):
         col1, col2 = st.columns(2)
         
         with col1:
-            fig = go.Figure(data=[go.Bar(
-                x=df['Floor'],
-                y=df['Avg Progress'],
-                marker_color='#17a2b8',
-                text=df['Avg Progress'].round(1),
-                textposition='auto'
-            )])
-            fig.update_layout(
-                title='Average Progress by Floor',
-                yaxis=dict(range=[0, 100]),
-                height=400
+            fig = get_cached_figure(
+                ('floor_progress', site_id, site_revision, floors_key),
+                lambda: build_floor_progress_figure(df)
             )
             st.plotly_chart(fig, use_container_width=True)
         
         with col2:
-            fig = go.Figure(data=[go.Bar(
-                x=df['Floor'],
-                y=df['Updates'],
-                marker_color='#6f42c1',
-                text=df['Updates'],
-                textposition='auto'
-            )])
-            fig.update_layout(
-                title='Updates by Floor',
-                height=400
+            fig = get_cached_figure(
+                ('floor_updates', site_id, site_revision, floors_key),
+                lambda: build_floor_updates_figure(df)
             )
             st.plotly_chart(fig, use_container_width=True)
         
@@ -1112,21 +1380,10 @@ def render_analytics(site_id, site_details):
     if work_type_data:
         df = pd.DataFrame(work_type_data, columns=['Work Type', 'Total', 'Completed', 'In Progress', 'Avg Progress'])
         
-        fig = go.Figure()
-        
-        fig.add_trace(go.Bar(name='Completed', x=df['Work Type'], y=df['Completed'], marker_color='#28a745'))
-        fig.add_trace(go.Bar(name='In Progress', x=df['Work Type'], y=df['In Progress'], marker_color='#ffc107'))
-        
-        not_started = df['Total'] - df['Completed'] - df['In Progress']
-        fig.add_trace(go.Bar(name='Not Started', x=df['Work Type'], y=not_started, marker_color='#6c757d'))
-        
-        fig.update_layout(
-            title='Work Type Status Distribution',
-            barmode='stack',
-            height=400,
-            xaxis_tickangle=-45
+        fig = get_cached_figure(
+            ('work_type_status', site_id, site_revision),
+            lambda: build_work_type_status_figure(df)
         )
-        
         st.plotly_chart(fig, use_container_width=True)
         
         # Table
@@ -1140,66 +1397,26 @@ def render_analytics(site_id, site_details):
     st.subheader("🏗️ Floor-wise Work Type Analysis")
     
     if filtered_floor_data:
-        # Create tabs for different views
-        view_tab1, view_tab2, view_tab3 = st.tabs(["📊 Progress Heatmap", "📈 Floor Comparison", "📋 Detailed Table"])
+        # Only the selected view queries its data and builds its charts
+        floor_view = render_view_selector(FLOOR_ANALYSIS_VIEWS, "analytics_floor_view")
         
-        with view_tab1:
+        if floor_view == FLOOR_ANALYSIS_VIEWS[0]:
             st.markdown("**Work Type Progress Across All Floors**")
             
-            # Create heatmap data - use filtered floors
-            matrix_data = get_work_type_floor_matrix(site_id)
+            fig = get_cached_figure(
+                ('heatmap', site_id, site_revision, floors_key),
+                lambda: build_heatmap_figure(site_id, selected_floors)
+            )
             
-            if matrix_data:
-                # Filter matrix data based on selected floors
-                filtered_matrix = [item for item in matrix_data if item['Floor'] in selected_floors]
+            if fig is not None:
+                st.plotly_chart(fig, use_container_width=True)
                 
-                if filtered_matrix:
-                    # Convert to pivot table format
-                    df_matrix = pd.DataFrame(filtered_matrix)
-                    pivot_table = df_matrix.pivot(index='Work Type', columns='Floor', values='Progress')
-                    
-                    # Reorder columns based on selected_floors order
-                    available_cols = [col for col in selected_floors if col in pivot_table.columns]
-                    pivot_table = pivot_table[available_cols]
-                    
-                    # Create heatmap
-                    fig = go.Figure(data=go.Heatmap(
-                        z=pivot_table.values,
-                        x=pivot_table.columns,
-                        y=pivot_table.index,
-                        colorscale=[
-                            [0, '#dc3545'],      # Red for 0%
-                            [0.25, '#ffc107'],   # Yellow for 25%
-                            [0.5, '#17a2b8'],    # Cyan for 50%
-                            [0.75, '#20c997'],   # Teal for 75%
-                            [1, '#28a745']       # Green for 100%
-                        ],
-                        text=pivot_table.values,
-                        texttemplate='%{text:.0f}%',
-                        textfont={"size": 10},
-                        colorbar=dict(title="Progress %"),
-                        hoverongaps=False,
-                        hovertemplate='<b>%{y}</b><br>Floor: %{x}<br>Progress: %{z:.1f}%<extra></extra>'
-                    ))
-                    
-                    fig.update_layout(
-                        title=f'Work Type Progress Heatmap ({len(selected_floors)} Floor(s))',
-                        xaxis_title='Floor',
-                        yaxis_title='Work Type',
-                        height=max(400, len(pivot_table.index) * 30),
-                        xaxis={'side': 'top'},
-                    )
-                    
-                    st.plotly_chart(fig, use_container_width=True)
-                    
-                    # Legend
-                    st.info("🎨 **Color Legend:** 🔴 0% → 🟡 25% → 🔵 50% → 🟢 75% → ✅ 100%")
-                else:
-                    st.warning("No data available for the selected floors.")
+                # Legend
+                st.info("🎨 **Color Legend:** 🔴 0% → 🟡 25% → 🔵 50% → 🟢 75% → ✅ 100%")
             else:
-                st.info("No heatmap data available yet.")
+                st.warning("No data available for the selected floors.")
         
-        with view_tab2:
+        elif floor_view == FLOOR_ANALYSIS_VIEWS[1]:
             st.markdown("**Compare Work Type Progress Across Floors**")
             
             # Allow user to select work types to compare - use filtered data
@@ -1214,162 +1431,58 @@ def render_analytics(site_id, site_details):
             )
             
             if selected_work_types:
-                # Create grouped bar chart - use filtered floors
-                floors = [f for f in selected_floors if f in filtered_floor_data]
-                
-                fig = go.Figure()
-                
-                for work_type in selected_work_types:
-                    progress_values = []
-                    for floor in floors:
-                        if work_type in filtered_floor_data[floor]:
-                            avg_progress = filtered_floor_data[floor][work_type]['total_progress'] / filtered_floor_data[floor][work_type]['count']
-                            progress_values.append(avg_progress)
-                        else:
-                            progress_values.append(0)
-                    
-                    fig.add_trace(go.Bar(
-                        name=work_type,
-                        x=floors,
-                        y=progress_values,
-                        text=[f"{v:.0f}%" for v in progress_values],
-                        textposition='auto',
-                        hovertemplate='<b>%{fullData.name}</b><br>Floor: %{x}<br>Progress: %{y:.1f}%<extra></extra>'
-                    ))
-                
-                fig.update_layout(
-                    title=f'Work Type Progress Comparison ({len(selected_floors)} Floor(s))',
-                    xaxis_title='Floor',
-                    yaxis_title='Average Progress %',
-                    barmode='group',
-                    height=500,
-                    yaxis=dict(range=[0, 100]),
-                    legend=dict(
-                        orientation="h",
-                        yanchor="bottom",
-                        y=-0.3,
-                        xanchor="center",
-                        x=0.5
-                    )
+                fig = get_cached_figure(
+                    ('floor_comparison', site_id, site_revision, floors_key, tuple(selected_work_types)),
+                    lambda: build_floor_comparison_figure(filtered_floor_data, selected_floors, selected_work_types)
                 )
-                
                 st.plotly_chart(fig, use_container_width=True)
                 
                 # Floor completion statistics - filtered
                 st.markdown("---")
                 st.markdown("**🏢 Floor Completion Statistics**")
                 
-                floor_stats = get_floor_completion_stats(site_id)
+                fig_completion = get_cached_figure(
+                    ('floor_completion', site_id, site_revision, floors_key),
+                    lambda: build_floor_completion_figure(site_id, selected_floors)
+                )
                 
-                if floor_stats:
-                    # Filter stats based on selected floors
-                    filtered_stats = [stat for stat in floor_stats if stat[0] in selected_floors]
-                    
-                    if filtered_stats:
-                        df_stats = pd.DataFrame(filtered_stats, columns=[
-                            'Floor', 'Total Work Types', 'Completed', 'In Progress', 'Not Started', 'Avg Progress %'
-                        ])
-                        
-                        # Create stacked bar chart for completion status
-                        fig_completion = go.Figure()
-                        
-                        fig_completion.add_trace(go.Bar(
-                            name='Completed',
-                            x=df_stats['Floor'],
-                            y=df_stats['Completed'],
-                            marker_color='#28a745',
-                            text=df_stats['Completed'],
-                            textposition='auto'
-                        ))
-                        
-                        fig_completion.add_trace(go.Bar(
-                            name='In Progress',
-                            x=df_stats['Floor'],
-                            y=df_stats['In Progress'],
-                            marker_color='#ffc107',
-                            text=df_stats['In Progress'],
-                            textposition='auto'
-                        ))
-                        
-                        fig_completion.add_trace(go.Bar(
-                            name='Not Started',
-                            x=df_stats['Floor'],
-                            y=df_stats['Not Started'],
-                            marker_color='#dc3545',
-                            text=df_stats['Not Started'],
-                            textposition='auto'
-                        ))
-                        
-                        fig_completion.update_layout(
-                            title=f'Work Type Completion Status ({len(selected_floors)} Floor(s))',
-                            xaxis_title='Floor',
-                            yaxis_title='Number of Work Types',
-                            barmode='stack',
-                            height=400,
-                            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-                        )
-                        
-                        st.plotly_chart(fig_completion, use_container_width=True)
-                    else:
-                        st.info("No completion statistics available for selected floors.")
+                if fig_completion is not None:
+                    st.plotly_chart(fig_completion, use_container_width=True)
+                else:
+                    st.info("No completion statistics available for selected floors.")
             else:
                 st.warning("Please select at least one work type to compare")
         
-        with view_tab3:
+        elif floor_view == FLOOR_ANALYSIS_VIEWS[2]:
             st.markdown("**Detailed Floor-wise Work Type Data**")
             
+            floor_work_frame = get_cached_frame(
+                ('floor_work_types', site_id, site_revision),
+                lambda: build_floor_work_type_frame(site_id)
+            )
+            floor_work_frame = floor_work_frame[floor_work_frame['Floor'].isin(selected_floors)]
+            floor_summary = summarize_floor_work_types(floor_work_frame)
+            
             # Create expandable sections for each floor - use filtered data
-            for floor in sorted(filtered_floor_data.keys()):
-                with st.expander(f"**{floor}** - {len(filtered_floor_data[floor])} work type(s)", expanded=False):
-                    
-                    # Calculate floor statistics
-                    floor_work_types = filtered_floor_data[floor]
-                    total_work_types = len(floor_work_types)
-                    avg_floor_progress = sum(wt['total_progress'] / wt['count'] for wt in floor_work_types.values()) / total_work_types if total_work_types > 0 else 0
+            for floor, df_floor in floor_work_frame.groupby('Floor', sort=True):
+                summary = floor_summary.loc[floor]
+                total_work_types = int(summary['Work Types'])
+                
+                with st.expander(f"**{floor}** - {total_work_types} work type(s)", expanded=False):
                     
                     # Display metrics
                     col1, col2, col3 = st.columns(3)
                     with col1:
                         st.metric("Work Types", total_work_types)
                     with col2:
-                        st.metric("Avg Progress", f"{avg_floor_progress:.1f}%")
+                        st.metric("Avg Progress", f"{summary['Avg Progress']:.1f}%")
                     with col3:
-                        completed = sum(1 for wt in floor_work_types.values() if wt['latest_progress'] >= 100)
-                        st.metric("Completed", f"{completed}/{total_work_types}")
+                        st.metric("Completed", f"{int(summary['Completed'])}/{total_work_types}")
                     
                     st.markdown("---")
                     
-                    # Create detailed table
-                    work_type_rows = []
-                    for work_name, data in sorted(floor_work_types.items()):
-                        avg_progress = data['total_progress'] / data['count']
-                        work_type_rows.append({
-                            'Work Type': work_name,
-                            'Latest Status': data['latest_status'],
-                            'Latest Progress': f"{data['latest_progress']}%",
-                            'Avg Progress': f"{avg_progress:.1f}%",
-                            'Updates': data['count'],
-                            'Last Updated': data['latest_date'][:10] if data['latest_date'] else 'N/A'
-                        })
-                    
-                    df_floor = pd.DataFrame(work_type_rows)
-                    
-                    # Color coding for progress
-                    def highlight_progress(row):
-                        latest_prog = int(row['Latest Progress'].replace('%', ''))
-                        if latest_prog >= 100:
-                            return ['background-color: #d4edda'] * len(row)
-                        elif latest_prog >= 75:
-                            return ['background-color: #d1ecf1'] * len(row)
-                        elif latest_prog >= 50:
-                            return ['background-color: #fff3cd'] * len(row)
-                        elif latest_prog > 0:
-                            return ['background-color: #f8d7da'] * len(row)
-                        else:
-                            return ['background-color: #e2e3e5'] * len(row)
-                    
                     st.dataframe(
-                        df_floor.style.apply(highlight_progress, axis=1),
+                        style_floor_work_table(df_floor.drop(columns='Floor')),
                         use_container_width=True,
                         hide_index=True
                     )
@@ -1408,6 +1521,66 @@ def render_analytics(site_id, site_details):
         if st.button("📄 Generate Monthly Report", type="primary", use_container_width=True):
             generate_monthly_report(site_id, site_details, report_month, report_year, 
                                    progress_entries, selected_floors if 'selected_floors' in locals() else [])
+    
+    # Full data export - streamed from the database into a temporary file
+    st.markdown("---")
+    st.subheader("📦 Full Data Export")
+    
+    render_data_export(site_id, site_details)
+
+def render_data_export(site_id, site_details):
+    """Export full-site or date-range progress/work type data as CSV"""
+    
+    st.info("💡 Export raw data for the whole site or a date range. Large exports are written to disk in chunks.")
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        dataset_label = st.selectbox("Dataset", list(EXPORT_DATASET_LABELS.keys()), key="export_dataset")
+        compress = st.checkbox("Compress (gzip)", key="export_compress")
+    
+    with col2:
+        start_date = st.date_input("Start Date (optional)", value=None, key="export_start_date")
+    
+    with col3:
+        end_date = st.date_input("End Date (optional)", value=None, key="export_end_date")
+    
+    if st.button("📦 Prepare Export", use_container_width=True):
+        if start_date and end_date and start_date > end_date:
+            st.error("⚠️ Start date must be before end date")
+            return
+        
+        dataset = EXPORT_DATASET_LABELS[dataset_label]
+        remove_export_file()
+        
+        with st.spinner("📦 Exporting data..."):
+            path, rows = export_csv(site_id, dataset, start_date, end_date, compress)
+        
+        st.session_state.export_file = {
+            'path': path,
+            'rows': rows,
+            'file_name': f"Construction_{dataset}_{site_details[1].replace(' ', '_')}" + ('.csv.gz' if compress else '.csv'),
+            'mime': 'application/gzip' if compress else 'text/csv'
+        }
+    
+    export_file = st.session_state.get('export_file')
+    if export_file and os.path.exists(export_file['path']):
+        st.success(f"✅ Export ready: {export_file['rows']} row(s)")
+        with open(export_file['path'], 'rb') as f:
+            st.download_button(
+                label="📥 Download Export",
+                data=f,
+                file_name=export_file['file_name'],
+                mime=export_file['mime'],
+                use_container_width=True
+            )
+
+def remove_export_file():
+    """Delete the session's previous export file, if any"""
+    export_file = st.session_state.get('export_file')
+    if export_file and os.path.exists(export_file['path']):
+        os.remove(export_file['path'])
+    st.session_state.export_file = None
 
 def generate_monthly_report(site_id, site_details, month, year, progress_entries, selected_floors):
     """Generate comprehensive monthly PDF report"""
@@ -1623,51 +1796,24 @@ including detailed floor-wise analysis, work type breakdowns, and AI-verified as
         pdf.multi_cell(0, 5, f"AI-powered analysis conducted on {total_updates} progress updates during {month} {year}.")
         pdf.ln(3)
         
-        # Extract key insights from AI reports - IMPROVED
-        verified_insights = []
-        issues_found = []
+        # Key insights come from the structured findings stored at save time
+        verified_insights = [
+            f"- {entry[1][:10]}: {entry[3]} - {entry[7]}"
+            for entry in filtered_entries
+            if entry[7] in ("Verified", "Partially Verified", "Not Verified")
+        ]
+        
+        recommendations_by_entry = get_ai_findings([entry[0] for entry in filtered_entries], 'recommendation')
         recommendations = []
         
-        for entry in filtered_entries:  # Process ALL entries, not just top 5
-            ai_report = entry[6]
-            if ai_report and len(ai_report) > 100:
-                # Extract verification status section
-                if "VERIFIED" in ai_report:
-                    verified_insights.append(f"- {entry[1][:10]}: {entry[3]} - {entry[7]}")
-                
-                # Extract full recommendations section
-                if "RECOMMENDATIONS" in ai_report.upper():
-                    # Find the recommendations section
-                    parts = ai_report.upper().split("RECOMMENDATIONS")
-                    if len(parts) > 1:
-                        # Get the section after RECOMMENDATIONS
-                        rec_start = ai_report.upper().find("RECOMMENDATIONS")
-                        remaining = ai_report[rec_start:]
-                        
-                        # Find the next major section (or end of report)
-                        next_sections = ["PROGRESS ASSESSMENT", "DATA QUALITY", "**8.", "**9.", "\n\n**"]
-                        rec_end = len(remaining)
-                        
-                        for section in next_sections:
-                            pos = remaining.find(section)
-                            if pos > 0 and pos < rec_end:
-                                rec_end = pos
-                        
-                        rec_section = remaining[:rec_end].strip()
-                        
-                        # Clean up the section
-                        if rec_section:
-                            # Remove the header
-                            rec_lines = rec_section.split('\n')
-                            clean_lines = [line.strip() for line in rec_lines[1:] if line.strip() and not line.strip().startswith('**7.')]
-                            
-                            if clean_lines:
-                                rec_text = '\n'.join(clean_lines[:15])  # First 15 lines
-                                recommendations.append({
-                                    'date': entry[1][:10],
-                                    'category': entry[3],
-                                    'text': rec_text
-                                })
+        for entry in filtered_entries:
+            rec_items = recommendations_by_entry.get(entry[0])
+            if rec_items:
+                recommendations.append({
+                    'date': entry[1][:10],
+                    'category': entry[3],
+                    'text': '\n'.join(f"- {item}" for item in rec_items[:15])  # First 15 items
+                })
         
         pdf.set_font("Arial", 'B', 11)
         pdf.cell(0, 7, "Verification Results:", ln=True)
@@ -1904,20 +2050,20 @@ def show():
     # Get site details
     site_details = get_site_by_id(site_id)
     
-    # Tabs
-    tab1, tab2, tab3 = st.tabs(["📤 Upload Progress", "📊 Progress History", "📈 Analytics"])
+    # Views - only the active one runs its queries and chart building
+    active_view = render_view_selector(ENGINEER_VIEWS, "engineer_active_view")
     
-    with tab1:
+    if active_view == ENGINEER_VIEWS[0]:
         # Check if we have pending analysis
         if st.session_state.pending_analysis:
             render_analysis_review()
         else:
             render_upload_form(site_id, site_details)
     
-    with tab2:
+    elif active_view == ENGINEER_VIEWS[1]:
         render_progress_history(site_id, site_details)
     
-    with tab3:
+    elif active_view == ENGINEER_VIEWS[2]:
         render_analytics(site_id, site_details)
 
 if __name__ == "__main__":
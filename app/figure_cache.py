@@ -0,0 +1,81 @@
+"""
+Figure spec and DataFrame caches for the analytics views
+Stores serialized Plotly figure JSON so that previously seen filter
+combinations re-render without re-querying data or rebuilding figures,
+and analytics DataFrames that only need rebuilding per site revision
+"""
+
+import threading
+from collections import OrderedDict
+
+import plotly.io as pio
+
+# Maximum number of figure specs kept in memory (shared by all sessions)
+MAX_CACHED_FIGURES = 256
+
+# Maximum number of analytics DataFrames kept in memory
+MAX_CACHED_FRAMES = 32
+
+# Marker for builders that had no data to plot
+NO_FIGURE = ''
+
+_figure_specs = OrderedDict()
+_frames = OrderedDict()
+_lock = threading.Lock()
+
+def get_cached_figure(key, build_figure):
+    """
+    Return the figure cached under key, calling build_figure() on a miss.
+    
+    Keys should include the site revision (see database.get_site_revision)
+    and every filter the figure depends on. Returns None when the builder
+    had nothing to plot.
+    """
+    with _lock:
+        spec = _figure_specs.get(key)
+        if spec is not None:
+            _figure_specs.move_to_end(key)
+    
+    if spec is None:
+        fig = build_figure()
+        spec = fig.to_json() if fig is not None else NO_FIGURE
+        
+        with _lock:
+            _figure_specs[key] = spec
+            _figure_specs.move_to_end(key)
+            while len(_figure_specs) > MAX_CACHED_FIGURES:
+                _figure_specs.popitem(last=False)
+    
+    if spec == NO_FIGURE:
+        return None
+    
+    return pio.from_json(spec)
+
+def get_cached_frame(key, build_frame):
+    """
+    Return the DataFrame cached under key, calling build_frame() on a miss.
+    
+    The same DataFrame object is shared by all sessions, so callers must
+    filter or copy it rather than modifying it in place.
+    """
+    with _lock:
+        frame = _frames.get(key)
+        if frame is not None:
+            _frames.move_to_end(key)
+            return frame
+    
+    frame = build_frame()
+    
+    with _lock:
+        _frames[key] = frame
+        _frames.move_to_end(key)
+        while len(_frames) > MAX_CACHED_FRAMES:
+            _frames.popitem(last=False)
+    
+    return frame
+
+def clear_figure_cache():
+    """Drop all cached figure specs and DataFrames"""
+    with _lock:
+        _figure_specs.clear()
+        _frames.clear()
@@ -0,0 +1,117 @@
+"""
+Image list container format
+A compact, seekable replacement for pickled image lists in progress.image.
+
+Layout (all integers little-endian):
+    magic      4 bytes   b'CIMG'
+    version    1 byte
+    count      4 bytes   number of images
+    index      count * 16 bytes, (offset, length) of each image as uint64
+    data       image bytes, back to back
+
+The index header lets a single image be read by offset, and decoding never
+executes code, unlike unpickling database content.
+"""
+
+import io
+import pickle
+import struct
+
+CONTAINER_MAGIC = b'CIMG'
+CONTAINER_VERSION = 1
+
+_HEADER = struct.Struct('<4sBI')
+_INDEX_ENTRY = struct.Struct('<QQ')
+
+class ContainerError(ValueError):
+    """Raised when data is not a valid image container"""
+
+def pack_images(image_data_list):
+    """Pack a list of image bytes into a container"""
+    count = len(image_data_list)
+    offset = _HEADER.size + count * _INDEX_ENTRY.size
+    
+    parts = [_HEADER.pack(CONTAINER_MAGIC, CONTAINER_VERSION, count)]
+    for image_data in image_data_list:
+        parts.append(_INDEX_ENTRY.pack(offset, len(image_data)))
+        offset += len(image_data)
+    parts.extend(image_data_list)
+    
+    return b''.join(parts)
+
+def is_container(data):
+    """Check whether data starts with the container magic"""
+    return bytes(data[:len(CONTAINER_MAGIC)]) == CONTAINER_MAGIC
+
+def _read_exact(stream, size):
+    data = stream.read(size)
+    if len(data) != size:
+        raise ContainerError("Truncated image container")
+    return data
+
+def _check_header(magic, version):
+    if magic != CONTAINER_MAGIC:
+        raise ContainerError("Not an image container")
+    if version != CONTAINER_VERSION:
+        raise ContainerError(f"Unsupported image container version {version}")
+
+def read_index(stream):
+    """Read the container header from a seekable stream; returns [(offset, length)]"""
+    stream.seek(0)
+    magic, version, count = _HEADER.unpack(_read_exact(stream, _HEADER.size))
+    _check_header(magic, version)
+    
+    index_data = _read_exact(stream, count * _INDEX_ENTRY.size)
+    return list(_INDEX_ENTRY.iter_unpack(index_data))
+
+def read_image_at(stream, position):
+    """
+    Read one image from a seekable stream (file, BytesIO or sqlite3 Blob)
+    holding a container, touching only the header and that image's bytes
+    """
+    index = read_index(stream)
+    if not 0 <= position < len(index):
+        raise IndexError(f"Image {position} not in container of {len(index)}")
+    
+    offset, length = index[position]
+    stream.seek(offset)
+    return _read_exact(stream, length)
+
+def unpack_images(data):
+    """Unpack all images of a container held in memory"""
+    view = memoryview(data)
+    try:
+        magic, version, count = _HEADER.unpack_from(view)
+        _check_header(magic, version)
+        index = [_INDEX_ENTRY.unpack_from(view, _HEADER.size + i * _INDEX_ENTRY.size)
+                 for i in range(count)]
+    except struct.error:
+        raise ContainerError("Truncated image container")
+    
+    images = []
+    for offset, length in index:
+        if offset + length > len(view):
+            raise ContainerError("Truncated image container")
+        images.append(bytes(view[offset:offset + length]))
+    return images
+
+class _ImageListUnpickler(pickle.Unpickler):
+    """Unpickler for legacy image lists that refuses to load any class or function"""
+    
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from stored image data")
+
+def decode_pickled_images(data):
+    """
+    Decode a legacy pickled list of image bytes. Only plain lists of bytes
+    are accepted, so pickled objects that would run code are rejected.
+    Returns None if data is not such a pickle.
+    """
+    try:
+        image_list = _ImageListUnpickler(io.BytesIO(data)).load()
+    except Exception:
+        return None
+    
+    if isinstance(image_list, list) and all(isinstance(image, bytes) for image in image_list):
+        return image_list
+    return None
@@ -0,0 +1,128 @@
+"""
+Local image quality gate for progress photos
+Flags photos that are blurry, badly exposed or too small to be useful
+evidence, without any AI call. Each photo is decoded to a downscaled
+grayscale array and measured with NumPy: blur as the variance of the
+Laplacian, exposure from the brightness histogram, plus the original
+resolution. Photos are assessed in parallel and results are cached by
+content hash, so Streamlit reruns of the upload form do not redo the work.
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+import numpy as np
+import PIL.Image
+
+# Longest side of the grayscale copy the checks run on
+ANALYSIS_SIZE = 1024
+
+# Variance of the Laplacian (on the downscaled copy) below this means the photo is blurry
+MIN_SHARPNESS = 20.0
+
+# Mean brightness (0-255) outside this range means under- or overexposed
+MIN_BRIGHTNESS = 40
+MAX_BRIGHTNESS = 220
+
+# Fraction of pixels in the darkest or brightest 16 levels above this means clipped shadows or highlights
+MAX_CLIPPED_FRACTION = 0.5
+
+# Shorter side in pixels below this is too small to show construction detail
+MIN_RESOLUTION = 320
+
+# Parallel assessments (decoding and NumPy release the GIL)
+QUALITY_WORKERS = min(4, os.cpu_count() or 1)
+
+# Assessments kept in memory, keyed by photo hash
+MAX_CACHED_ASSESSMENTS = 256
+
+_assessments = OrderedDict()
+_assessments_lock = threading.Lock()
+_executor = None
+
+def _load_gray(image_data):
+    """Decode a photo to a float32 grayscale array of at most ANALYSIS_SIZE; returns (array, width, height)"""
+    image = PIL.Image.open(BytesIO(image_data))
+    width, height = image.size
+    # JPEG photos decode directly at a reduced scale
+    image.draft('L', (ANALYSIS_SIZE, ANALYSIS_SIZE))
+    gray = image.convert('L')
+    gray.thumbnail((ANALYSIS_SIZE, ANALYSIS_SIZE))
+    return np.asarray(gray, dtype=np.float32), width, height
+
+def laplacian_variance(gray):
+    """Variance of the 4-neighbour Laplacian; low values mean few sharp edges"""
+    if gray.shape[0] < 3 or gray.shape[1] < 3:
+        return 0.0
+    laplacian = (gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:]
+                 - 4 * gray[1:-1, 1:-1])
+    return float(laplacian.var())
+
+def exposure_stats(gray):
+    """(mean brightness, fraction of near-black pixels, fraction of near-white pixels)"""
+    histogram = np.bincount(gray.astype(np.uint8).ravel(), minlength=256)
+    pixels = histogram.sum()
+    mean = float(np.dot(histogram, np.arange(256)) / pixels)
+    return mean, float(histogram[:16].sum() / pixels), float(histogram[240:].sum() / pixels)
+
+def assess_image(image_data):
+    """
+    Check one photo; returns a dict with 'usable', 'problems' (list of
+    short descriptions) and the measured width, height, sharpness,
+    brightness and clipped fractions. Photos that cannot be decoded are
+    unusable.
+    """
+    try:
+        gray, width, height = _load_gray(image_data)
+    except Exception as e:
+        return {'usable': False, 'problems': [f"cannot be read ({e})"], 'width': 0, 'height': 0,
+                'sharpness': None, 'brightness': None, 'dark_fraction': None, 'bright_fraction': None}
+    
+    sharpness = laplacian_variance(gray)
+    brightness, dark_fraction, bright_fraction = exposure_stats(gray)
+    
+    problems = []
+    if brightness < MIN_BRIGHTNESS or dark_fraction > MAX_CLIPPED_FRACTION:
+        problems.append("too dark")
+    elif brightness > MAX_BRIGHTNESS or bright_fraction > MAX_CLIPPED_FRACTION:
+        problems.append("overexposed")
+    if sharpness < MIN_SHARPNESS:
+        problems.append("blurry")
+    if min(width, height) < MIN_RESOLUTION:
+        problems.append(f"low resolution ({width}x{height})")
+    
+    return {'usable': not problems, 'problems': problems, 'width': width, 'height': height,
+            'sharpness': sharpness, 'brightness': brightness,
+            'dark_fraction': dark_fraction, 'bright_fraction': bright_fraction}
+
+def _assess_cached(image_data):
+    image_hash = hashlib.sha256(image_data).hexdigest()
+    with _assessments_lock:
+        assessment = _assessments.get(image_hash)
+        if assessment is not None:
+            _assessments.move_to_end(image_hash)
+            return assessment
+    
+    assessment = assess_image(image_data)
+    with _assessments_lock:
+        _assessments[image_hash] = assessment
+        while len(_assessments) > MAX_CACHED_ASSESSMENTS:
+            _assessments.popitem(last=False)
+    return assessment
+
+def _get_executor():
+    global _executor
+    with _assessments_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=QUALITY_WORKERS, thread_name_prefix='image-quality')
+        return _executor
+
+def assess_images(image_data_list):
+    """assess_image for each photo, in order, run in parallel and cached by photo content"""
+    if len(image_data_list) <= 1:
+        return [_assess_cached(image_data) for image_data in image_data_list]
+    return list(_get_executor().map(_assess_cached, image_data_list))
@@ -0,0 +1,156 @@
+"""
+Content-addressed image storage
+Each uploaded photo is hashed and stored once in the images table with a
+reference count; progress entries point at their photos through the
+progress_images table, so re-uploaded photos take no extra space
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+from image_container import is_container, unpack_images, decode_pickled_images
+from photo_index import compute_dhash
+
+load_dotenv()
+
+# Per-process byte budget for image data kept in memory across all sessions
+IMAGE_CACHE_BUDGET_BYTES = int(os.environ.get('IMAGE_CACHE_BUDGET_MB', '128')) * 1024 * 1024
+
+# Image data keyed by hash in least-recently-used order, shared by all sessions
+_image_cache = OrderedDict()
+_image_cache_bytes = 0
+_image_cache_lock = threading.Lock()
+
+def hash_image(image_data):
+    """Content hash used as the image key"""
+    return hashlib.sha256(image_data).hexdigest()
+
+def store_images(c, progress_id, image_data_list):
+    """
+    Store the images of a progress entry using the caller's cursor, so they
+    are saved in the same transaction as the entry. Images already in the
+    store are not written again; only their reference count is increased.
+    Returns the list of image hashes in upload order.
+    """
+    image_hashes = [hash_image(image_data) for image_data in image_data_list]
+    
+    c.execute(f"""SELECT hash FROM images WHERE hash IN ({','.join('?' * len(image_hashes))})""",
+              image_hashes)
+    stored_hashes = {row[0] for row in c.fetchall()}
+    
+    # Perceptual hashes are only computed for photos new to the store
+    new_images = {}
+    for image_hash, image_data in zip(image_hashes, image_data_list):
+        if image_hash not in stored_hashes and image_hash not in new_images:
+            new_images[image_hash] = (image_hash, image_data, len(image_data), compute_dhash(image_data))
+    
+    c.executemany("""INSERT INTO images (hash, data, size, phash, ref_count) VALUES (?, ?, ?, ?, 0)""",
+                  list(new_images.values()))
+    c.executemany("""UPDATE images SET ref_count = ref_count + 1 WHERE hash = ?""",
+                  [(image_hash,) for image_hash in image_hashes])
+    c.executemany("""INSERT INTO progress_images (progress_id, position, image_hash) VALUES (?, ?, ?)""",
+                  [(progress_id, position, image_hash) for position, image_hash in enumerate(image_hashes)])
+    
+    return image_hashes
+
+def decode_legacy_images(image):
+    """
+    Decode a progress.image value written before the image store: an image
+    container, a legacy pickled list (decoded without running any code) or
+    a single raw image
+    """
+    if is_container(image):
+        return unpack_images(image)
+    
+    image_list = decode_pickled_images(image)
+    if image_list is not None:
+        return image_list
+    
+    return [image]
+
+def _read_blob(conn, rowid, size):
+    """Read an image's data through incremental blob I/O, without materializing a result row"""
+    if not hasattr(conn, 'blobopen'):
+        # sqlite3.Connection.blobopen needs Python 3.11+
+        c = conn.cursor()
+        c.execute("SELECT data FROM images WHERE rowid = ?", (rowid,))
+        return c.fetchone()[0]
+    
+    with conn.blobopen('images', 'data', rowid, readonly=True) as blob:
+        return blob.read(size)
+
+def read_image(image_hash, conn=None):
+    """
+    Get an image's data as a read-only memoryview. Data is served from a
+    process-wide LRU cache bounded by IMAGE_CACHE_BUDGET_BYTES, so an image
+    opened by several sessions is held in memory once. Returns None if the
+    image is not in the store.
+    """
+    global _image_cache_bytes
+    
+    with _image_cache_lock:
+        image_data = _image_cache.get(image_hash)
+        if image_data is not None:
+            _image_cache.move_to_end(image_hash)
+            return memoryview(image_data)
+    
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect('construction.db')
+    
+    try:
+        c = conn.cursor()
+        c.execute("SELECT rowid, size FROM images WHERE hash = ?", (image_hash,))
+        row = c.fetchone()
+        if row is None:
+            return None
+        image_data = _read_blob(conn, row[0], row[1])
+    finally:
+        if own_conn:
+            conn.close()
+    
+    # Images larger than the whole budget are served but never cached
+    if len(image_data) <= IMAGE_CACHE_BUDGET_BYTES:
+        with _image_cache_lock:
+            if image_hash not in _image_cache:
+                _image_cache[image_hash] = image_data
+                _image_cache_bytes += len(image_data)
+                while _image_cache_bytes > IMAGE_CACHE_BUDGET_BYTES:
+                    _, evicted = _image_cache.popitem(last=False)
+                    _image_cache_bytes -= len(evicted)
+    
+    return memoryview(image_data)
+
+def get_image_cache_stats():
+    """Get (cached images, cached bytes, budget bytes) for the image cache"""
+    with _image_cache_lock:
+        return len(_image_cache), _image_cache_bytes, IMAGE_CACHE_BUDGET_BYTES
+
+def load_progress_images(progress_id, legacy_image=None):
+    """
+    Get the images of a progress entry in upload order as read-only
+    memoryviews; memoryview.obj is the underlying bytes object. Entries saved
+    before the image store keep their images in progress.image, passed as
+    legacy_image.
+    """
+    conn = sqlite3.connect('construction.db')
+    c = conn.cursor()
+    
+    try:
+        c.execute("""SELECT image_hash FROM progress_images
+                     WHERE progress_id = ?
+                     ORDER BY position""", (progress_id,))
+        image_hashes = [row[0] for row in c.fetchall()]
+        images = [read_image(image_hash, conn) for image_hash in image_hashes]
+    finally:
+        conn.close()
+    
+    images = [image for image in images if image is not None]
+    if images or not legacy_image:
+        return images
+    
+    return [memoryview(image) for image in decode_legacy_images(legacy_image)]
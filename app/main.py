@@ -3,6 +3,7 @@ from database import get_user, init_db
 from utils import verify_password
 import admin_page
 import engineer_page_new as engineer_page
+from session_memory import track_session
 
 # Page configuration
 st.set_page_config(
@@ -143,4 +144,5 @@ def login():
 
 if __name__ == '__main__':
     init_db()
+    track_session()
     login()
@@ -0,0 +1,111 @@
+"""
+Process-wide registry of Gemini model clients
+Models are built once per configuration (model name, generation config,
+system instruction) with the configured safety settings and shared by all
+sessions, so calls reuse the same model object and API client connection.
+warmup() builds the models and opens the connection ahead of the first
+analysis request.
+"""
+
+import json
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+
+load_dotenv()
+
+# Gemini model used for progress verification
+DEFAULT_MODEL = os.environ.get('GEMINI_MODEL', 'models/gemini-2.5-flash-lite')
+
+# Block threshold applied to every harm category (for example BLOCK_ONLY_HIGH);
+# unset keeps the provider's default safety settings
+SAFETY_THRESHOLD = os.environ.get('GEMINI_SAFETY_THRESHOLD')
+
+# Warm up the model clients when the app starts (set to 0 to skip)
+MODEL_WARMUP = os.environ.get('GEMINI_WARMUP', '1') == '1'
+
+HARM_CATEGORIES = [
+    "HARM_CATEGORY_HARASSMENT",
+    "HARM_CATEGORY_HATE_SPEECH",
+    "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+    "HARM_CATEGORY_DANGEROUS_CONTENT"
+]
+
+_models = {}
+_lock = threading.Lock()
+_stats = {'built': 0, 'reused': 0, 'warmup_seconds': None, 'warmup_error': None}
+_warmup_started = False
+
+def safety_settings():
+    """Safety settings for every model, or None for the provider defaults"""
+    if not SAFETY_THRESHOLD:
+        return None
+    return {category: SAFETY_THRESHOLD for category in HARM_CATEGORIES}
+
+def get_model(model_name=None, generation_config=None, system_instruction=None):
+    """Shared GenerativeModel for this configuration, built on first use"""
+    model_name = model_name or DEFAULT_MODEL
+    key = (model_name, json.dumps(generation_config, sort_keys=True) if generation_config else None,
+           system_instruction)
+    
+    with _lock:
+        model = _models.get(key)
+        if model is not None:
+            _stats['reused'] += 1
+            return model
+        
+        model = genai.GenerativeModel(
+            model_name,
+            safety_settings=safety_settings(),
+            generation_config=generation_config,
+            system_instruction=system_instruction
+        )
+        _models[key] = model
+        _stats['built'] += 1
+        return model
+
+def get_cached_content_model(cached_content, generation_config=None):
+    """Model backed by provider cached content; callers keep it for the lifetime of the cache"""
+    return genai.GenerativeModel.from_cached_content(
+        cached_content,
+        generation_config=generation_config,
+        safety_settings=safety_settings()
+    )
+
+def warmup(model_configs=None):
+    """
+    Build the models for the given (model_name, generation_config,
+    system_instruction) tuples and open the API connection with a metadata
+    request, so the first analysis does not pay for client setup. Errors
+    (for example no network) are recorded and otherwise ignored.
+    """
+    start = time.perf_counter()
+    try:
+        for model_name, generation_config, system_instruction in model_configs or [(DEFAULT_MODEL, None, None)]:
+            get_model(model_name, generation_config, system_instruction)
+        genai_client.get_default_generative_client()
+        genai.get_model(DEFAULT_MODEL)
+        _stats['warmup_error'] = None
+    except Exception as e:
+        _stats['warmup_error'] = str(e)
+    _stats['warmup_seconds'] = time.perf_counter() - start
+
+def start_warmup(task):
+    """Run a warmup task once per process in a background thread"""
+    global _warmup_started
+    with _lock:
+        if _warmup_started or not MODEL_WARMUP:
+            return
+        _warmup_started = True
+    threading.Thread(target=task, name='model-warmup', daemon=True).start()
+
+def get_registry_stats():
+    """Models built and reused by this process, with the duration and error of the warmup"""
+    with _lock:
+        stats = dict(_stats)
+        stats['models'] = len(_models)
+    return stats
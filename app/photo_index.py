@@ -0,0 +1,168 @@
+"""
+Perceptual photo index
+Computes a difference hash (dHash) for each stored photo and keeps a
+BK-tree per site, so photos that were already submitted for the site
+(re-uploads, re-encoded or slightly cropped copies) are flagged in
+milliseconds before any AI analysis is requested
+"""
+
+import sqlite3
+import threading
+from io import BytesIO
+
+from PIL import Image
+
+# dHash grid size; produces a hash_size * hash_size bit hash
+DHASH_SIZE = 8
+
+# Hamming distance at or below which two photos are treated as the same shot
+DUPLICATE_MAX_DISTANCE = 6
+
+def compute_dhash(image_data, hash_size=DHASH_SIZE):
+    """
+    Difference hash of an image as a hex string, or None if the image
+    cannot be decoded. Each bit records whether a pixel is brighter than
+    its right neighbour on a (hash_size + 1) x hash_size grayscale thumbnail.
+    """
+    try:
+        with Image.open(BytesIO(image_data)) as img:
+            # Let the JPEG decoder downscale while decoding instead of decoding full size
+            img.draft('L', ((hash_size + 1) * 4, hash_size * 4))
+            thumbnail = img.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+            pixels = list(thumbnail.getdata())
+    except Exception:
+        return None
+    
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    
+    return f"{value:0{hash_size * hash_size // 4}x}"
+
+def hamming_distance(hash_a, hash_b):
+    """Number of differing bits between two integer hashes"""
+    return bin(hash_a ^ hash_b).count('1')
+
+class BKTree:
+    """BK-tree over integer perceptual hashes using Hamming distance"""
+    
+    def __init__(self):
+        # Node: [hash, items, {distance: child node}]
+        self.root = None
+        self.size = 0
+    
+    def add(self, phash, item):
+        """Add an item under a hash; items with identical hashes share a node"""
+        self.size += 1
+        if self.root is None:
+            self.root = [phash, [item], {}]
+            return
+        
+        node = self.root
+        while True:
+            distance = hamming_distance(phash, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [phash, [item], {}]
+                return
+            node = child
+    
+    def search(self, phash, max_distance):
+        """Get (distance, item) pairs within max_distance of a hash, closest first"""
+        if self.root is None:
+            return []
+        
+        results = []
+        stack = [self.root]
+        while stack:
+            node_hash, items, children = stack.pop()
+            distance = hamming_distance(phash, node_hash)
+            if distance <= max_distance:
+                results.extend((distance, item) for item in items)
+            # Triangle inequality: only subtrees in this band can hold matches
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        
+        results.sort(key=lambda result: result[0])
+        return results
+
+# Per-site trees keyed by site_id: (revision, BKTree)
+_site_indexes = {}
+_site_indexes_lock = threading.Lock()
+
+def _get_photo_revision(c, site_id):
+    """Revision token that changes whenever a site's photos or their hashes change"""
+    c.execute("""SELECT COUNT(*), IFNULL(MAX(pi.progress_id), 0), COUNT(i.phash)
+                 FROM progress_images pi
+                 JOIN progress p ON p.id = pi.progress_id
+                 JOIN images i ON i.hash = pi.image_hash
+                 WHERE p.site_id = ?""", (site_id,))
+    return c.fetchone()
+
+def get_site_photo_index(site_id):
+    """
+    Get the BK-tree of a site's stored photos. Items are
+    (progress_id, date, position) tuples. The tree is rebuilt only when the
+    site's photos change.
+    """
+    conn = sqlite3.connect('construction.db')
+    c = conn.cursor()
+    
+    try:
+        revision = _get_photo_revision(c, site_id)
+        with _site_indexes_lock:
+            cached = _site_indexes.get(site_id)
+            if cached and cached[0] == revision:
+                return cached[1]
+        
+        c.execute("""SELECT pi.progress_id, p.date, pi.position, i.phash
+                     FROM progress_images pi
+                     JOIN progress p ON p.id = pi.progress_id
+                     JOIN images i ON i.hash = pi.image_hash
+                     WHERE p.site_id = ? AND i.phash IS NOT NULL""", (site_id,))
+        
+        tree = BKTree()
+        for progress_id, date, position, phash in c.fetchall():
+            tree.add(int(phash, 16), (progress_id, date, position))
+    finally:
+        conn.close()
+    
+    with _site_indexes_lock:
+        _site_indexes[site_id] = (revision, tree)
+    
+    return tree
+
+def find_similar_photos(site_id, image_data_list, max_distance=DUPLICATE_MAX_DISTANCE):
+    """
+    Check new photos against a site's photo history. Returns one dict per
+    photo that matches a stored photo, with the upload index, the closest
+    match's progress_id, date and position, and the Hamming distance.
+    """
+    tree = get_site_photo_index(site_id)
+    if not tree.size:
+        return []
+    
+    matches = []
+    for image_index, image_data in enumerate(image_data_list):
+        phash = compute_dhash(image_data)
+        if phash is None:
+            continue
+        
+        results = tree.search(int(phash, 16), max_distance)
+        if results:
+            distance, (progress_id, date, position) = results[0]
+            matches.append({
+                'image_index': image_index,
+                'progress_id': progress_id,
+                'date': date,
+                'position': position,
+                'distance': distance
+            })
+    
+    return matches
@@ -0,0 +1,355 @@
+"""
+Prompt builder for the AI analysis
+Holds the analysis prompt templates, estimates their token counts and
+renders the floor-wise progress data as a compact table. The static
+verification instructions are a separate system instruction, identical for
+every call, so the provider can cache them. Consecutive
+floors with identical data share one row, and when a submission would
+exceed the prompt token budget the table is reduced to per-floor summaries
+and then truncated, so 30-floor submissions stay within a bounded size.
+"""
+
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Maximum estimated text tokens of an analysis prompt (photos are counted separately)
+PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', '6000'))
+
+# Rough characters per token for English prompt text
+CHARS_PER_TOKEN = 4
+
+# Tokens Gemini bills per attached image (one 768x768 tile)
+IMAGE_TOKENS = 258
+
+# Short codes for work type statuses in the floor table
+STATUS_CODES = {
+    "Not Started": "NS",
+    "In Progress": "IP",
+    "Completed": "C",
+    "Under Review": "UR",
+    "Rework Required": "RR"
+}
+
+_STATUS_LEGEND = "Status codes: " + ", ".join(f"{code} = {status}" for status, code in STATUS_CODES.items())
+
+# Floor table detail levels, from most to least detailed
+DETAIL_FULL = 'full'
+DETAIL_SUMMARY = 'summary'
+DETAIL_TRUNCATED = 'truncated'
+
+ANALYSIS_OUTPUT_FORMAT = """**OUTPUT FORMAT:**
+Respond with a single JSON object and nothing else, using exactly these keys:
+- "verification_status": one of "VERIFIED", "PARTIALLY VERIFIED", "NOT VERIFIED", "INSUFFICIENT DATA" (section 1)
+- "sections": array of {"title": string, "content": string} for sections 2 to 9 in order, content in Markdown
+- "recommendations": array of strings, one concrete action per item (from section 7)
+- "issues": array of strings, one defect, discrepancy or quality concern per item
+- "safety_findings": array of strings, one hazard or safety non-compliance per item
+- "overall_completion": integer 0-100 (from section 8)"""
+
+# Static part of the analysis prompt, sent as the system instruction so it can be cached
+ANALYSIS_SYSTEM_INSTRUCTION = """You are a certified construction site inspector conducting a professional analysis with deep floor-wise tracking.
+
+Each request gives the project context, the engineer's description and the floor-wise progress data as a
+pipe-separated table, followed by the progress photos. Consecutive floors with identical data share one row.
+""" + _STATUS_LEGEND + """
+
+**ANALYSIS INSTRUCTIONS:**
+Examine every submitted image and cross-reference it with the floor-wise progress data provided in the request.
+
+**CRITICAL FOCUS AREAS:**
+1. **Floor Identification**: Try to identify which floor(s) each image represents based on visual cues
+2. **Work Type Verification**: Verify if the claimed work types are visible in the images
+3. **Progress Accuracy**: Assess if the claimed progress percentages align with visual evidence
+4. **Cross-Floor Consistency**: Check if progress is consistent across floors
+5. **Phase Alignment**: Verify if work phases (Not Started/In Progress/Completed) match visual reality
+
+**REQUIRED REPORT STRUCTURE:**
+
+**1. VERIFICATION STATUS**
+Select ONE based on comprehensive visual evidence:
+- ✅ VERIFIED: Visual evidence fully confirms reported work across all floors
+- ⚠️ PARTIALLY VERIFIED: Some aspects confirmed, but discrepancies noted on specific floors
+- ❌ NOT VERIFIED: Visual evidence contradicts description or floor data
+- ℹ️ INSUFFICIENT DATA: Image quality/coverage inadequate for the floors tracked
+
+**2. VISUAL EVIDENCE ANALYSIS**
+- Document what is clearly visible in each image
+- Identify which floor(s) each image likely represents (if determinable)
+- List materials, equipment, and completed work visible
+- Note image quality and coverage adequacy for the floors tracked
+- Compare visual findings with engineer's floor-wise breakdown
+
+**3. TECHNICAL QUALITY ASSESSMENT**
+- **Workmanship Rating:** [Excellent/Good/Adequate/Poor/Cannot Assess]
+- **Justification:** Specific observations from images
+- **Materials & Specifications:** Visible materials and their condition
+- **Defects/Issues:** Any visible problems or quality concerns
+- **Industry Standards Compliance:** Compliance with standards for the work category
+- **Floor-wise Quality Variations:** Note any quality differences between floors
+
+**4. SAFETY & COMPLIANCE**
+- **PPE Status:** Visible safety gear and compliance
+- **Site Safety Measures:** Barriers, signage, fall protection systems
+- **Hazard Identification:** List all visible hazards
+- **Housekeeping:** Site cleanliness and organization by floor
+- **Access Safety:** Scaffolding, ladders, and floor access safety
+
+**5. DETAILED FLOOR-WISE VERIFICATION**
+For EACH floor mentioned in the data, provide:
+- **Visual Evidence Match**: Does any image show this floor? (Yes/No/Uncertain)
+- **Progress Verification**: Does the claimed floor progress seem accurate?
+- **Work Type Confirmation**: Which claimed work types are actually visible?
+- **Phase Accuracy**: Is the claimed work phase correct based on images?
+- **Discrepancies**: Any differences between claimed and observed status?
+- **Recommendations**: Specific actions needed for this floor
+
+**6. WORK TYPE ANALYSIS**
+For each work type category:
+- Verify presence and progress across floors
+- Identify any work types not visible in images but claimed
+- Note quality and completion status where visible
+- Highlight any concerning work types
+
+**7. RECOMMENDATIONS**
+- **Immediate Actions Required**: By floor and work type
+- **Quality Improvements**: Specific recommendations
+- **Additional Documentation Needed**: Missing photos or data
+- **Follow-up Inspections**: Which floors/work types need re-inspection
+- **Priority Items**: Most critical issues to address
+
+**8. PROGRESS ASSESSMENT**
+- **Overall Site Completion:** [0-100]%
+- **Floor-by-Floor Assessment**: Brief status of each floor
+- **Most Advanced Floor**: Which floor is furthest along?
+- **Most Delayed Floor**: Which floor needs attention?
+- **Work Remaining**: Detailed breakdown of pending work
+- **Timeline Assessment**: Is overall progress on track?
+- **Critical Path Items**: Work types blocking other progress
+
+**9. DATA QUALITY & COMPLETENESS**
+- **Image Coverage**: Are the submitted images sufficient for the floors tracked?
+- **Missing Documentation**: What additional photos are needed?
+- **Data Consistency**: Is the floor-wise data internally consistent?
+- **Confidence Level**: High/Medium/Low confidence in this assessment
+
+Provide objective, evidence-based analysis using precise construction terminology. Be specific about which floors and work types you can/cannot verify from the images.
+
+""" + ANALYSIS_OUTPUT_FORMAT
+
+ANALYSIS_REQUEST_TEMPLATE = """**PROJECT CONTEXT:**
+- Work Category: {category}
+- Number of Images Submitted: {num_images}
+- Total Floors Tracked: {total_floors}
+- Total Work Types: {total_work_types}
+- Engineer's Overall Description: {description}
+
+**FLOOR-WISE PROGRESS DETAILS:**
+{floor_table}
+
+**SUMMARY STATISTICS:**
+- Total Floors: {total_floors}
+- Total Work Types Tracked: {total_work_types}
+- Average Floor Progress: {avg_floor_progress:.1f}%
+
+Examine all {num_images} image(s) and report following the required report structure and output format."""
+
+IMAGE_NOTES_PROMPT = """You are a certified construction site inspector. Describe this single progress photo as inspection notes.
+
+**PROJECT CONTEXT:**
+- Work Category: {category}
+- Floors reported in this update: {floor_names}
+- Work types reported in this update: {work_names}
+
+Respond with a single JSON object and nothing else, using exactly these keys:
+- "floor_guess": string, the floor this photo most likely shows, or "Unknown"
+- "visible_work": string, what work, materials and equipment are clearly visible
+- "work_types_observed": array of strings, reported work types that are visible in the photo
+- "estimated_progress": integer 0-100 or null, completion of the visible work
+- "quality_notes": string, workmanship and defects visible
+- "issues": array of strings, defects, discrepancies or quality concerns
+- "safety_findings": array of strings, hazards or safety non-compliance
+- "image_quality": one of "Good", "Adequate", "Poor"
+Use null or an empty array where something cannot be determined from the photo."""
+
+TRIAGE_PROMPT = """You are a construction site inspector doing a quick pre-screen of a progress update. Decide whether
+the photos clearly support the reported progress, or whether a detailed inspection is needed.
+
+**REPORTED PROGRESS:**
+- Work Category: {category}
+- Engineer's Description: {description}
+{floor_table}
+
+Respond with a single JSON object and nothing else, using exactly these keys:
+- "decision": "CONSISTENT" only if the photos clearly show the reported work at the reported stage, with no
+  visible defects, discrepancies or safety hazards; otherwise "NEEDS_REVIEW"
+- "confidence": number 0-1, your confidence in the decision
+- "summary": string, one or two sentences on what the photos show
+- "overall_completion": integer 0-100"""
+
+# Characters of the engineer's description included in the triage prompt
+TRIAGE_DESCRIPTION_CHARS = 500
+
+AGGREGATION_PREAMBLE = """The photos of this submission were inspected one at a time. The photos themselves are not attached;
+treat the per-photo inspection notes below as the visual evidence for your analysis.{missing_note}
+
+**PER-PHOTO INSPECTION NOTES:**
+{notes}
+
+"""
+
+def estimate_tokens(text):
+    """Approximate token count of prompt text"""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def estimate_image_tokens(num_images):
+    return num_images * IMAGE_TOKENS
+
+# Token estimates of the fixed template text, computed once at import
+SYSTEM_INSTRUCTION_TOKENS = estimate_tokens(ANALYSIS_SYSTEM_INSTRUCTION)
+_REQUEST_TOKENS = estimate_tokens(ANALYSIS_REQUEST_TEMPLATE)
+
+def _status_code(status):
+    return STATUS_CODES.get(status, status)
+
+def _group_floors(floor_data):
+    """Merge consecutive floors with identical phase, progress and work types into (names, floor) groups"""
+    groups = []
+    for floor_info in floor_data:
+        key = (floor_info['work_phase'], floor_info['floor_progress'],
+               tuple((name, details['status'], details['progress'])
+                     for name, details in floor_info['work_types'].items()))
+        if groups and groups[-1][0] == key:
+            groups[-1][1].append(floor_info['floor_name'])
+        else:
+            groups.append((key, [floor_info['floor_name']], floor_info))
+    return [(names, floor_info) for _, names, floor_info in groups]
+
+def _floor_label(names):
+    if len(names) == 1:
+        return names[0]
+    return f"{names[0]} to {names[-1]} ({len(names)} floors)"
+
+def _full_row(names, floor_info):
+    work = "; ".join(f"{name} {_status_code(details['status'])} {details['progress']}"
+                     for name, details in floor_info['work_types'].items())
+    return f"{_floor_label(names)} | {floor_info['work_phase']} | {floor_info['floor_progress']} | {work or '-'}"
+
+def _summary_row(names, floor_info):
+    work_types = floor_info['work_types'].values()
+    counts = {}
+    for details in work_types:
+        code = _status_code(details['status'])
+        counts[code] = counts.get(code, 0) + 1
+    average = sum(details['progress'] for details in work_types) / len(work_types) if work_types else 0
+    breakdown = " ".join(f"{code}:{count}" for code, count in counts.items())
+    return (f"{_floor_label(names)} | {floor_info['work_phase']} | {floor_info['floor_progress']} | "
+            f"{len(work_types)} types, {breakdown or '-'}, avg {average:.0f}")
+
+def build_floor_table(floor_data, detail=DETAIL_FULL, max_tokens=None):
+    """
+    Render the floor-wise progress as a compact pipe-separated table.
+    
+    DETAIL_FULL lists every work type with its status code and progress;
+    DETAIL_SUMMARY gives per-floor counts per status and the average
+    progress. With DETAIL_TRUNCATED summary rows are added until max_tokens
+    is reached and the remaining floors are summarized in one line.
+    """
+    groups = _group_floors(floor_data)
+    if detail == DETAIL_FULL:
+        header = "Floor | Phase | Floor % | Work types (name status %)"
+        rows = [_full_row(names, floor_info) for names, floor_info in groups]
+    else:
+        header = "Floor | Phase | Floor % | Work types by status, average %"
+        rows = [_summary_row(names, floor_info) for names, floor_info in groups]
+    
+    lines = [header]
+    if detail != DETAIL_TRUNCATED or max_tokens is None:
+        return "\n".join(lines + rows)
+    
+    used = estimate_tokens("\n".join(lines))
+    for position, row in enumerate(rows):
+        row_tokens = estimate_tokens(row) + 1
+        if used + row_tokens > max_tokens:
+            floors_left = sum(len(names) for names, _ in groups[position:])
+            average = sum(floor_info['floor_progress'] * len(names)
+                          for names, floor_info in groups[position:]) / floors_left
+            lines.append(f"... {floors_left} more floor(s) not listed, average floor progress {average:.0f}%")
+            break
+        lines.append(row)
+        used += row_tokens
+    return "\n".join(lines)
+
+def build_analysis_prompt(description, category, floor_data, num_images, token_budget=None, stats=None):
+    """
+    Build the verification request for a submission with num_images photos,
+    to be sent with ANALYSIS_SYSTEM_INSTRUCTION as the system instruction.
+    
+    The floor table is reduced (full, then summary, then truncated) until
+    the estimated text tokens of request and system instruction fit
+    token_budget (default PROMPT_TOKEN_BUDGET); an overlong description is
+    cut as a last resort. If a stats dict is given, the estimated prompt
+    tokens (including system instruction and photos) and the floor table
+    detail level used are stored in it.
+    """
+    if token_budget is None:
+        token_budget = PROMPT_TOKEN_BUDGET
+    
+    total_floors = len(floor_data)
+    total_work_types = sum(len(floor_info['work_types']) for floor_info in floor_data)
+    avg_floor_progress = sum(f['floor_progress'] for f in floor_data) / total_floors if total_floors > 0 else 0
+    
+    fixed_tokens = SYSTEM_INSTRUCTION_TOKENS + _REQUEST_TOKENS + estimate_tokens(category) + 16
+    table_budget = token_budget - fixed_tokens - estimate_tokens(description)
+    
+    detail = DETAIL_FULL
+    floor_table = build_floor_table(floor_data, DETAIL_FULL)
+    if estimate_tokens(floor_table) > table_budget:
+        detail = DETAIL_SUMMARY
+        floor_table = build_floor_table(floor_data, DETAIL_SUMMARY)
+    if estimate_tokens(floor_table) > table_budget:
+        detail = DETAIL_TRUNCATED
+        # Keep at least a quarter of the budget for the table, trimming the description instead
+        table_budget = max(table_budget, token_budget // 4)
+        floor_table = build_floor_table(floor_data, DETAIL_TRUNCATED, table_budget)
+    
+    description_budget = token_budget - fixed_tokens - estimate_tokens(floor_table)
+    if estimate_tokens(description) > description_budget:
+        description = description[:max(description_budget, 0) * CHARS_PER_TOKEN] + " [...]"
+    
+    values = {
+        'category': category,
+        'num_images': num_images,
+        'total_floors': total_floors,
+        'total_work_types': total_work_types,
+        'description': description,
+        'floor_table': floor_table,
+        'avg_floor_progress': avg_floor_progress
+    }
+    prompt = ANALYSIS_REQUEST_TEMPLATE.format(**values)
+    
+    if stats is not None:
+        stats['estimated_prompt_tokens'] = (SYSTEM_INSTRUCTION_TOKENS + estimate_tokens(prompt)
+                                            + estimate_image_tokens(num_images))
+        stats['floor_detail'] = detail
+    return prompt
+
+def build_image_notes_prompt(category, floor_data):
+    """Prompt for the per-photo step of the map-reduce analysis"""
+    work_names = sorted({name for floor in floor_data for name in floor['work_types']})
+    return IMAGE_NOTES_PROMPT.format(
+        category=category,
+        floor_names=', '.join(floor['floor_name'] for floor in floor_data) or 'None',
+        work_names=', '.join(work_names) or 'None'
+    )
+
+def build_triage_prompt(description, category, floor_data):
+    """Short prompt for the triage tier, with per-floor summary rows instead of every work type"""
+    if len(description) > TRIAGE_DESCRIPTION_CHARS:
+        description = description[:TRIAGE_DESCRIPTION_CHARS] + " [...]"
+    return TRIAGE_PROMPT.format(
+        category=category,
+        description=description,
+        floor_table=_STATUS_LEGEND + "\n" + build_floor_table(floor_data, DETAIL_SUMMARY)
+    )
@@ -0,0 +1,166 @@
+"""
+Session state memory accounting
+Every browser session keeps its own session state in the server process.
+Each script run records the approximate size of the session's state, so the
+admin dashboard can show what all sessions hold. Pending AI reviews left
+idle are moved to disk next to their staged photos and restored when that
+session runs again, so idle sessions do not accumulate reports in memory.
+"""
+
+import os
+import sys
+import threading
+import time
+from dotenv import load_dotenv
+
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from upload_staging import save_staged_state, load_staged_state
+
+load_dotenv()
+
+# Pending reviews not touched for this long are moved to disk
+PENDING_EVICT_SECONDS = int(os.environ.get('PENDING_EVICT_MINUTES', '15')) * 60
+
+# Idle sessions are checked for evictable reviews at most this often
+SESSION_SWEEP_INTERVAL_SECONDS = 60
+
+PENDING_KEY = 'pending_analysis'
+
+# Session id -> its state and the latest measurements
+_sessions = {}
+_lock = threading.Lock()
+_stats = {'evicted': 0, 'restored': 0}
+_last_sweep = 0.0
+
+def estimate_size(obj, _seen=None):
+    """Approximate deep size in bytes of a value, following dicts, lists, tuples and sets"""
+    seen = set() if _seen is None else _seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    
+    size = sys.getsizeof(obj, 0)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(key, seen) + estimate_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, seen) for item in obj)
+    return size
+
+def _session_state(ctx):
+    # The SessionState behind the per-run wrapper lives as long as the browser session
+    return getattr(ctx.session_state, '_state', ctx.session_state)
+
+def _is_closed(session_id):
+    # Without a server runtime (bare mode, tests) sessions cannot be checked and are kept
+    return runtime.exists() and not runtime.get_instance().is_active_session(session_id)
+
+def _is_evicted(pending):
+    return isinstance(pending, dict) and pending.get('evicted', False)
+
+def _measure(entry, state):
+    """Record the size of each session state value; objects shared between keys count once"""
+    values = state.filtered_state
+    seen = set()
+    key_sizes = {key: estimate_size(value, seen) for key, value in values.items()}
+    pending = values.get(PENDING_KEY)
+    
+    entry['user'] = values.get('username') or '(not logged in)'
+    entry['bytes'] = sum(key_sizes.values())
+    entry['largest_key'] = max(key_sizes, key=key_sizes.get) if key_sizes else None
+    entry['pending'] = 'disk' if _is_evicted(pending) else ('memory' if pending else None)
+
+def _evict_pending(state):
+    """Move a pending review to its staging directory, leaving a small placeholder"""
+    pending = state[PENDING_KEY]
+    if not pending or _is_evicted(pending) or not pending.get('staging'):
+        return False
+    try:
+        save_staged_state(pending['staging'], PENDING_KEY, pending)
+    except (OSError, TypeError, ValueError):
+        return False
+    
+    # Deleting first also drops the copy Streamlit keeps from the session's last run
+    del state[PENDING_KEY]
+    state[PENDING_KEY] = {'evicted': True, 'staging': pending['staging']}
+    _stats['evicted'] += 1
+    return True
+
+def _restore_pending(state):
+    """Bring an evicted pending review back into session state; cleared if its staging has expired"""
+    pending = state[PENDING_KEY] if PENDING_KEY in state else None
+    if not _is_evicted(pending):
+        return
+    
+    try:
+        restored = load_staged_state(pending['staging'], PENDING_KEY)
+    except (OSError, ValueError):
+        restored = None
+    state[PENDING_KEY] = restored
+    if restored is not None:
+        _stats['restored'] += 1
+
+def _sweep(now):
+    """Forget closed sessions and evict pending reviews idle longer than PENDING_EVICT_SECONDS"""
+    global _last_sweep
+    if now - _last_sweep < SESSION_SWEEP_INTERVAL_SECONDS:
+        return
+    _last_sweep = now
+    
+    for session_id, entry in list(_sessions.items()):
+        if _is_closed(session_id):
+            # Dropping the entry releases the closed session's state
+            del _sessions[session_id]
+        elif entry['pending'] == 'memory' and now - entry['last_active'] > PENDING_EVICT_SECONDS:
+            if _evict_pending(entry['state']):
+                _measure(entry, entry['state'])
+
+def track_session():
+    """
+    Call at the start of every script run: restores this session's evicted
+    review, records the session's state size and, at most once per
+    SESSION_SWEEP_INTERVAL_SECONDS, evicts idle reviews of other sessions
+    """
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return
+    
+    state = _session_state(ctx)
+    now = time.time()
+    # One lock for restoring, measuring and sweeping, so a session that has
+    # just become active is never evicted halfway through its run
+    with _lock:
+        entry = _sessions.setdefault(ctx.session_id, {})
+        entry['state'] = state
+        entry['last_active'] = now
+        
+        _restore_pending(state)
+        _measure(entry, state)
+        _sweep(now)
+
+def get_session_memory_stats():
+    """
+    Totals over live sessions (sessions, bytes, pending reviews in memory and
+    on disk, evictions, restores) and a list of per-session measurements,
+    largest first
+    """
+    now = time.time()
+    with _lock:
+        sessions = [
+            {'user': entry['user'], 'bytes': entry['bytes'], 'largest_key': entry['largest_key'],
+             'pending': entry['pending'], 'idle_seconds': now - entry['last_active']}
+            for session_id, entry in _sessions.items()
+            if not _is_closed(session_id)
+        ]
+        stats = dict(_stats)
+    
+    sessions.sort(key=lambda session: session['bytes'], reverse=True)
+    stats.update({
+        'sessions': len(sessions),
+        'bytes': sum(session['bytes'] for session in sessions),
+        'pending_in_memory': sum(1 for session in sessions if session['pending'] == 'memory'),
+        'pending_on_disk': sum(1 for session in sessions if session['pending'] == 'disk'),
+        'session_list': sessions
+    })
+    return stats
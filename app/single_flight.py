@@ -0,0 +1,67 @@
+"""
+Single-flight execution of identical AI requests
+Streamlit serves every session from threads of one process, so when two
+sessions (or two tabs of one engineer) request the same analysis at the
+same time, the later callers wait for the call already in flight and share
+its result instead of issuing a duplicate model call
+"""
+
+import threading
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+class SingleFlight:
+    """Runs at most one call per key at a time; concurrent callers with the same key share its result"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {'calls': 0, 'coalesced': 0, 'max_waiters': 0}
+    
+    def do(self, key, fn):
+        """
+        Return (result, shared) of fn(), where shared is True when the result
+        came from an identical call already in flight. Exceptions raised by
+        fn() are re-raised in every caller sharing the call.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._stats['calls'] += 1
+            else:
+                call.waiters += 1
+                self._stats['coalesced'] += 1
+                self._stats['max_waiters'] = max(self._stats['max_waiters'], call.waiters)
+        
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # Later callers start a new call; waiters already hold a reference to this one
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+    
+    def stats(self):
+        """Counts of executed calls, coalesced callers, the most callers that waited on one call and calls in flight"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
@@ -0,0 +1,148 @@
+"""
+Disk staging area for uploaded progress photos
+Between the AI analysis and the engineer confirming the entry, the photos
+are kept in a per-submission directory on disk and session state only holds
+a small handle, so a pending review does not keep every photo in server
+memory. A review left idle can be moved into its staging as well. Stagings
+are removed when the entry is saved or cancelled; those abandoned by closed
+browser sessions are removed after a timeout.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Directory holding one subdirectory per staged submission
+STAGING_DIR = os.environ.get('UPLOAD_STAGING_DIR',
+                             os.path.join(tempfile.gettempdir(), 'construction_uploads'))
+
+# Stagings not used for this long are treated as abandoned and removed
+STAGING_MAX_AGE_SECONDS = int(os.environ.get('UPLOAD_STAGING_MAX_AGE_HOURS', '24')) * 3600
+
+# Abandoned stagings are looked for at most this often
+STAGING_CLEANUP_INTERVAL_SECONDS = 600
+
+# Bytes copied per write when streaming an upload to disk
+STAGING_CHUNK_SIZE = 1024 * 1024
+
+_cleanup_lock = threading.Lock()
+_last_cleanup = 0.0
+
+def _staging_path(handle):
+    return os.path.join(STAGING_DIR, handle['id'])
+
+def stage_uploads(uploaded_files):
+    """
+    Stream uploaded files to a new staging directory, in chunks, and return
+    its handle: a small dict with the staging id and the size of each photo
+    """
+    cleanup_abandoned_stagings()
+    
+    handle = {'id': uuid.uuid4().hex, 'sizes': []}
+    path = _staging_path(handle)
+    os.makedirs(path)
+    
+    try:
+        for idx, file in enumerate(uploaded_files):
+            file.seek(0)
+            with open(os.path.join(path, str(idx)), 'wb') as output:
+                shutil.copyfileobj(file, output, STAGING_CHUNK_SIZE)
+                handle['sizes'].append(output.tell())
+    except Exception:
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+    
+    return handle
+
+def staging_exists(handle):
+    """True if the staged photos are still on disk"""
+    return os.path.isdir(_staging_path(handle))
+
+def load_staged_images(handle, exclude=()):
+    """
+    Read the staged photos, in upload order, skipping the positions in
+    exclude. Reading marks the staging as in use.
+    """
+    path = _staging_path(handle)
+    os.utime(path)
+    
+    images = []
+    for idx in range(len(handle['sizes'])):
+        if idx in exclude:
+            continue
+        with open(os.path.join(path, str(idx)), 'rb') as f:
+            images.append(f.read())
+    return images
+
+def save_staged_state(handle, name, data):
+    """
+    Write JSON-serializable session data that belongs to a staging (such as
+    its pending review) next to its photos, so it shares their lifetime
+    """
+    serialized = json.dumps(data)
+    with open(os.path.join(_staging_path(handle), f"{name}.json"), 'w', encoding='utf-8') as f:
+        f.write(serialized)
+
+def load_staged_state(handle, name):
+    """Read and remove data written by save_staged_state; None if the staging has expired"""
+    path = os.path.join(_staging_path(handle), f"{name}.json")
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    os.remove(path)
+    return data
+
+def remove_staging(handle):
+    """Delete a staging once its photos are saved or the submission is cancelled"""
+    if handle:
+        shutil.rmtree(_staging_path(handle), ignore_errors=True)
+
+def cleanup_abandoned_stagings(max_age_seconds=STAGING_MAX_AGE_SECONDS, force=False):
+    """
+    Remove stagings not used within max_age_seconds. Runs at most once per
+    STAGING_CLEANUP_INTERVAL_SECONDS unless forced; returns the number removed.
+    """
+    global _last_cleanup
+    now = time.time()
+    with _cleanup_lock:
+        if not force and now - _last_cleanup < STAGING_CLEANUP_INTERVAL_SECONDS:
+            return 0
+        _last_cleanup = now
+    
+    if not os.path.isdir(STAGING_DIR):
+        return 0
+    
+    removed = 0
+    for entry in os.scandir(STAGING_DIR):
+        try:
+            if entry.is_dir() and now - entry.stat().st_mtime > max_age_seconds:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        except FileNotFoundError:
+            # Removed by another session's cleanup
+            continue
+    return removed
+
+def get_staging_stats():
+    """Number of stagings on disk and their total size in bytes"""
+    stagings = 0
+    total_bytes = 0
+    if os.path.isdir(STAGING_DIR):
+        for entry in os.scandir(STAGING_DIR):
+            if not entry.is_dir():
+                continue
+            stagings += 1
+            try:
+                total_bytes += sum(f.stat().st_size for f in os.scandir(entry.path))
+            except FileNotFoundError:
+                continue
+    return {'stagings': stagings, 'bytes': total_bytes}
@@ -3,3 +3,41 @@ import bcrypt
 def verify_password(plain_password, hashed_password):
     """Verifies a plain password against a hashed one."""
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password)
+
+
+def downsample_lttb(points, threshold):
+    """
+    Downsample (x, y, ...) tuples to at most threshold points using
+    Largest-Triangle-Three-Buckets, which keeps peaks and dips visible.
+    Points must be sorted by x; extra tuple fields are carried along.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+    
+    sampled = [points[0]]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        next_bucket = points[next_start:next_end]
+        avg_x = sum(p[0] for p in next_bucket) / len(next_bucket)
+        avg_y = sum(p[1] for p in next_bucket) / len(next_bucket)
+        
+        # Keep the point in this bucket forming the largest triangle
+        ax, ay = points[a][0], points[a][1]
+        start = int(i * bucket_size) + 1
+        best, best_area = start, -1
+        for j in range(start, next_start):
+            area = abs((ax - avg_x) * (points[j][1] - ay) - (ax - points[j][0]) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        
+        sampled.append(points[best])
+        a = best
+    
+    sampled.append(points[-1])
+    return sampled
@@ -0,0 +1,134 @@
+"""
+Backfill script to convert legacy floor-wise descriptions into work_types rows
+Older progress entries stored their floor data only as text after a
+"--- FLOOR-WISE DETAILS ---" marker in the description. This script parses
+those descriptions once and inserts the equivalent work_types rows, so
+floor-wise analytics are served from structured data only.
+
+The script is idempotent and resumable: progress entries that already have
+work_types rows are skipped, and work is committed in batches.
+
+Usage:
+    python backfill_work_types.py --dry-run   # report what would be created
+    python backfill_work_types.py             # perform the backfill
+"""
+
+import argparse
+import sqlite3
+
+LEGACY_MARKER = "--- FLOOR-WISE DETAILS ---"
+
+# Work type name used when a legacy floor section lists no work types
+GENERAL_WORK_NAME = "General Work"
+
+# Status used when a legacy work type line has no status text
+LEGACY_STATUS = "Legacy Entry"
+
+BATCH_SIZE = 500
+
+def parse_legacy_floor_details(description):
+    """
+    Parse a legacy description into (floor_name, floor_progress, [(work_name, status), ...]).
+    Returns None if the description has no floor-wise section.
+    """
+    if LEGACY_MARKER not in description:
+        return None
+    
+    floor_section = description.split(LEGACY_MARKER, 1)[1]
+    lines = floor_section.split('\n')
+    
+    # Extract floor
+    floor_name = "Unknown"
+    floor_line = [line for line in lines if "Floor: " in line]
+    if floor_line:
+        floor_name = floor_line[0].replace("Floor: ", "").strip()
+    
+    # Extract floor progress
+    floor_progress = 0
+    prog_line = [line for line in lines if "Floor Progress: " in line]
+    if prog_line:
+        prog_str = prog_line[0].replace("Floor Progress: ", "").strip().replace("%", "")
+        try:
+            floor_progress = int(prog_str)
+        except ValueError:
+            floor_progress = 0
+    
+    # Extract work types
+    work_types = []
+    if "Work Types Being Carried Out:" in floor_section:
+        work_section = floor_section.split("Work Types Being Carried Out:", 1)[1]
+        work_lines = [line.strip() for line in work_section.split('\n') if line.strip().startswith('-')]
+        for line in work_lines:
+            name_part, _, status_part = line.lstrip('-').partition(':')
+            work_name = name_part.strip()
+            if work_name and work_name not in [name for name, _ in work_types]:
+                work_types.append((work_name, status_part.strip() or LEGACY_STATUS))
+    
+    if not work_types:
+        work_types.append((GENERAL_WORK_NAME, LEGACY_STATUS))
+    
+    return floor_name, floor_progress, work_types
+
+def backfill_work_types(dry_run=False, batch_size=BATCH_SIZE):
+    conn = sqlite3.connect('construction.db')
+    c = conn.cursor()
+    
+    print("Finding legacy progress entries without work_types rows...")
+    c.execute("""SELECT p.id, p.site_id, p.date, p.description 
+                 FROM progress p 
+                 WHERE p.description LIKE ? 
+                   AND NOT EXISTS (SELECT 1 FROM work_types w WHERE w.progress_id = p.id)
+                 ORDER BY p.id""", (f"%{LEGACY_MARKER}%",))
+    entries = c.fetchall()
+    print(f"  {len(entries)} legacy progress entries to backfill")
+    
+    site_stats = {}
+    pending_rows = []
+    total_rows = 0
+    
+    for idx, (progress_id, site_id, date, description) in enumerate(entries, 1):
+        parsed = parse_legacy_floor_details(description)
+        if parsed:
+            floor_name, floor_progress, work_types = parsed
+            rows = [(progress_id, site_id, floor_name, work_name, status, floor_progress, date)
+                    for work_name, status in work_types]
+            pending_rows.extend(rows)
+            total_rows += len(rows)
+            
+            stats = site_stats.setdefault(site_id, {'entries': 0, 'rows': 0, 'floors': set()})
+            stats['entries'] += 1
+            stats['rows'] += len(rows)
+            stats['floors'].add(floor_name)
+        
+        # Commit in batches so an interrupted run resumes from the next entry
+        if not dry_run and (idx % batch_size == 0 or idx == len(entries)) and pending_rows:
+            c.executemany("""INSERT INTO work_types (progress_id, site_id, floor_name, work_name, 
+                             status, progress_percentage, date)
+                             VALUES (?, ?, ?, ?, ?, ?, ?)""", pending_rows)
+            conn.commit()
+            print(f"  ✓ Committed {idx}/{len(entries)} entries")
+            pending_rows = []
+    
+    conn.close()
+    
+    print()
+    print("BACKFILL REPORT" + (" (DRY RUN - nothing written)" if dry_run else ""))
+    print("-" * 60)
+    print(f"{'Site':<8} {'Entries':<10} {'Rows':<10} {'Floors':<10}")
+    for site_id, stats in sorted(site_stats.items()):
+        print(f"{site_id:<8} {stats['entries']:<10} {stats['rows']:<10} {len(stats['floors']):<10}")
+    print("-" * 60)
+    print(f"Total work_types rows {'to create' if dry_run else 'created'}: {total_rows}")
+    
+    if dry_run:
+        print("\nRun without --dry-run to apply the backfill.")
+    else:
+        print("\n✅ Backfill completed successfully!")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert legacy floor-wise descriptions into work_types rows")
+    parser.add_argument('--dry-run', action='store_true', help="Report what would be created without writing")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Entries per committed batch")
+    args = parser.parse_args()
+    
+    backfill_work_types(dry_run=args.dry_run, batch_size=args.batch_size)
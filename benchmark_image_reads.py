@@ -0,0 +1,101 @@
+"""
+Benchmark for first-image read latency of stored progress photos
+Compares reading the first photo of an entry when the photos are stored as
+a pickled list, as an image container (whole value vs. seeking through
+sqlite3 incremental blob I/O) and as per-image rows in the image store.
+Runs against a temporary database, so the application database is not touched.
+
+Usage:
+    python benchmark_image_reads.py
+    python benchmark_image_reads.py --images 12 --image-kb 800 --entries 50
+"""
+
+import argparse
+import os
+import pickle
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+from image_container import pack_images, unpack_images, read_image_at, decode_pickled_images
+
+def build_database(path, entries, images_per_entry, image_size):
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.execute("CREATE TABLE pickled (id INTEGER PRIMARY KEY, image BLOB NOT NULL)")
+    c.execute("CREATE TABLE containers (id INTEGER PRIMARY KEY, image BLOB NOT NULL)")
+    c.execute("CREATE TABLE per_image (progress_id INTEGER, position INTEGER, data BLOB NOT NULL, "
+              "PRIMARY KEY (progress_id, position))")
+    
+    for entry_id in range(1, entries + 1):
+        images = [os.urandom(image_size) for _ in range(images_per_entry)]
+        c.execute("INSERT INTO pickled VALUES (?, ?)", (entry_id, pickle.dumps(images)))
+        c.execute("INSERT INTO containers VALUES (?, ?)", (entry_id, pack_images(images)))
+        c.executemany("INSERT INTO per_image VALUES (?, ?, ?)",
+                      [(entry_id, position, image) for position, image in enumerate(images)])
+    
+    conn.commit()
+    return conn
+
+def read_first_pickled(conn, entry_id):
+    image = conn.execute("SELECT image FROM pickled WHERE id = ?", (entry_id,)).fetchone()[0]
+    return pickle.loads(image)[0]
+
+def read_first_pickled_safe(conn, entry_id):
+    image = conn.execute("SELECT image FROM pickled WHERE id = ?", (entry_id,)).fetchone()[0]
+    return decode_pickled_images(image)[0]
+
+def read_first_container(conn, entry_id):
+    image = conn.execute("SELECT image FROM containers WHERE id = ?", (entry_id,)).fetchone()[0]
+    return unpack_images(image)[0]
+
+def read_first_container_blob(conn, entry_id):
+    with conn.blobopen('containers', 'image', entry_id, readonly=True) as blob:
+        return read_image_at(blob, 0)
+
+def read_first_per_image(conn, entry_id):
+    return conn.execute("SELECT data FROM per_image WHERE progress_id = ? AND position = 0",
+                        (entry_id,)).fetchone()[0]
+
+def run_benchmark(entries, images_per_entry, image_kb, rounds):
+    image_size = image_kb * 1024
+    
+    methods = [
+        ("pickle.loads (whole list)", read_first_pickled),
+        ("restricted unpickler (whole list)", read_first_pickled_safe),
+        ("container (whole value)", read_first_container),
+        ("per-image rows", read_first_per_image),
+    ]
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        conn = build_database(os.path.join(tmp_dir, 'benchmark.db'), entries, images_per_entry, image_size)
+        if hasattr(conn, 'blobopen'):
+            methods.insert(3, ("container via blobopen (seek)", read_first_container_blob))
+        
+        print(f"{entries} entries x {images_per_entry} images of {image_kb} KB, {rounds} rounds")
+        print("-" * 60)
+        print(f"{'Method':<36} {'Mean ms':>10} {'Best ms':>10}")
+        
+        for name, read_first in methods:
+            timings = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                for entry_id in range(1, entries + 1):
+                    assert len(read_first(conn, entry_id)) == image_size
+                timings.append((time.perf_counter() - start) * 1000 / entries)
+            print(f"{name:<36} {sum(timings) / len(timings):>10.3f} {min(timings):>10.3f}")
+        
+        conn.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark first-image read latency per storage format")
+    parser.add_argument('--entries', type=int, default=30, help="Progress entries to create")
+    parser.add_argument('--images', type=int, default=8, help="Images per entry")
+    parser.add_argument('--image-kb', type=int, default=500, help="Size of each image in KB")
+    parser.add_argument('--rounds', type=int, default=5, help="Timed passes over all entries")
+    args = parser.parse_args()
+    
+    run_benchmark(args.entries, args.images, args.image_kb, args.rounds)
@@ -0,0 +1,98 @@
+"""
+Micro-benchmark for per-call model client overhead
+Compares building a GenerativeModel for every analysis call (with the
+verification system instruction) against fetching the shared model from
+the model registry, and measures the one-off API client setup that
+warmup moves out of the first request. With --network, also times a cold
+and a warm metadata request to the API (needs GOOGLE_API_KEY; no tokens
+are used).
+
+Usage:
+    python benchmark_model_clients.py
+    python benchmark_model_clients.py --calls 5000 --network
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+import google.generativeai as genai
+from google.generativeai import client as genai_client
+from dotenv import load_dotenv
+
+from ai_analysis import ANALYSIS_MODEL, ANALYSIS_GENERATION_CONFIG
+from model_registry import get_model, safety_settings
+from prompt_builder import ANALYSIS_SYSTEM_INSTRUCTION
+
+def time_per_call(build, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        build()
+    return (time.perf_counter() - start) / calls
+
+def build_per_call():
+    return genai.GenerativeModel(
+        ANALYSIS_MODEL,
+        safety_settings=safety_settings(),
+        generation_config=ANALYSIS_GENERATION_CONFIG,
+        system_instruction=ANALYSIS_SYSTEM_INSTRUCTION
+    )
+
+def build_from_registry():
+    return get_model(ANALYSIS_MODEL, ANALYSIS_GENERATION_CONFIG, ANALYSIS_SYSTEM_INSTRUCTION)
+
+def time_client_setup():
+    """(cold, warm) seconds to get the API client; cold creates the client and its channel"""
+    genai_client._client_manager.clients.pop('generative', None)
+    start = time.perf_counter()
+    genai_client.get_default_generative_client()
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    genai_client.get_default_generative_client()
+    return cold, time.perf_counter() - start
+
+def time_metadata_requests():
+    """(cold, warm) seconds of a model metadata request on a new and on an open connection"""
+    genai_client._client_manager.clients.pop('model', None)
+    start = time.perf_counter()
+    genai.get_model(ANALYSIS_MODEL)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    genai.get_model(ANALYSIS_MODEL)
+    return cold, time.perf_counter() - start
+
+def run_benchmark(calls, network):
+    load_dotenv()
+    genai.configure(api_key=os.environ.get("GOOGLE_API_KEY", "benchmark"))
+    
+    per_call = time_per_call(build_per_call, calls)
+    build_from_registry()
+    registry = time_per_call(build_from_registry, calls)
+    
+    print(f"{ANALYSIS_MODEL}, {calls} calls")
+    print("-" * 60)
+    print(f"{'Step':<40} {'Time':>16}")
+    print(f"{'GenerativeModel per call':<40} {per_call * 1e6:>13.1f} us")
+    print(f"{'Registry lookup per call':<40} {registry * 1e6:>13.1f} us")
+    print(f"{'Overhead removed per call':<40} {(per_call - registry) * 1e6:>13.1f} us")
+    
+    cold, warm = time_client_setup()
+    print(f"{'API client setup (first call)':<40} {cold * 1e3:>13.2f} ms")
+    print(f"{'API client lookup (after warmup)':<40} {warm * 1e3:>13.2f} ms")
+    
+    if network:
+        cold, warm = time_metadata_requests()
+        print(f"{'Metadata request, new connection':<40} {cold * 1e3:>13.1f} ms")
+        print(f"{'Metadata request, open connection':<40} {warm * 1e3:>13.1f} ms")
+    print("-" * 60)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark per-call model client overhead")
+    parser.add_argument('--calls', type=int, default=2000, help="Timed calls per method")
+    parser.add_argument('--network', action='store_true', help="Also time cold and warm API requests")
+    args = parser.parse_args()
+    
+    run_benchmark(args.calls, args.network)
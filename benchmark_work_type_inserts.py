@@ -0,0 +1,85 @@
+"""
+Benchmark for work type ingestion of multi-floor submissions
+Compares inserting a submission's work types with one INSERT per
+floor/work type pair against the batched insert_work_types API, each
+submission in its own transaction. Runs against a temporary database, so
+the application database is not touched.
+
+Usage:
+    python benchmark_work_type_inserts.py
+    python benchmark_work_type_inserts.py --floors 40 --work-types 12 --submissions 200
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+from database import init_db, insert_work_types
+
+DATE = "2025-01-01 10:00:00"
+
+def build_rows(num_floors, num_work_types):
+    return [(f"Floor {floor}", f"Work Type {work}", "In Progress", 50)
+            for floor in range(1, num_floors + 1)
+            for work in range(1, num_work_types + 1)]
+
+def new_progress_id(c):
+    c.execute("""INSERT INTO progress (site_id, user_id, date, category, description, image,
+                 ai_report, ai_verification_status, progress_percentage)
+                 VALUES (1, 1, ?, 'Benchmark', '', x'', '', 'Verified', 50)""", (DATE,))
+    return c.lastrowid
+
+def insert_per_row(conn, rows):
+    c = conn.cursor()
+    progress_id = new_progress_id(c)
+    for floor_name, work_name, status, progress in rows:
+        c.execute("""INSERT INTO work_types (progress_id, site_id, floor_name, work_name,
+                     status, progress_percentage, date)
+                     VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                  (progress_id, 1, floor_name, work_name, status, progress, DATE))
+    conn.commit()
+
+def insert_batched(conn, rows):
+    c = conn.cursor()
+    progress_id = new_progress_id(c)
+    ids = insert_work_types(c, progress_id, 1, DATE, rows)
+    conn.commit()
+    assert len(ids) == len(rows)
+
+def run_benchmark(num_floors, num_work_types, submissions):
+    rows = build_rows(num_floors, num_work_types)
+    print(f"{submissions} submissions of {num_floors} floors x {num_work_types} work types "
+          f"({len(rows)} rows each)")
+    print("-" * 60)
+    print(f"{'Method':<28} {'ms/submission':>14} {'rows/sec':>12}")
+    
+    for name, insert in (("per-row execute", insert_per_row), ("insert_work_types", insert_batched)):
+        # Fresh database per method so both start from the same state
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.chdir(tmp_dir)
+            init_db()
+            conn = sqlite3.connect('construction.db')
+            
+            start = time.perf_counter()
+            for _ in range(submissions):
+                insert(conn, rows)
+            elapsed = time.perf_counter() - start
+            
+            conn.close()
+            os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        
+        print(f"{name:<28} {elapsed * 1000 / submissions:>14.2f} {len(rows) * submissions / elapsed:>12.0f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark work type ingestion for multi-floor submissions")
+    parser.add_argument('--floors', type=int, default=20, help="Floors per submission")
+    parser.add_argument('--work-types', type=int, default=12, help="Work types per floor")
+    parser.add_argument('--submissions', type=int, default=100, help="Submissions to insert")
+    args = parser.parse_args()
+    
+    run_benchmark(args.floors, args.work_types, args.submissions)
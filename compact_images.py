@@ -0,0 +1,155 @@
+"""
+Compaction script for stored progress photos
+Moves photos still kept as pickled blobs in progress.image into the
+deduplicated image store, recomputes image reference counts, removes images
+no longer referenced by any progress entry, fills in missing perceptual
+hashes used for reused-photo detection and finally vacuums the database
+file so the freed pages are returned to the filesystem.
+
+The script is idempotent and resumable: entries whose photos are already in
+the image store are skipped, and work is committed in batches.
+
+Usage:
+    python compact_images.py --dry-run   # report what would be reclaimed
+    python compact_images.py             # compact the image storage
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+from database import init_db
+from image_store import hash_image, decode_legacy_images, store_images
+from photo_index import compute_dhash
+
+DB_PATH = 'construction.db'
+
+BATCH_SIZE = 200
+
+def format_bytes(num_bytes):
+    """Human readable byte count"""
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if abs(num_bytes) < 1024 or unit == 'GB':
+            return f"{num_bytes:.1f} {unit}" if unit != 'B' else f"{num_bytes} {unit}"
+        num_bytes /= 1024
+
+def compact_images(dry_run=False, batch_size=BATCH_SIZE, vacuum=True):
+    # Creates the image store tables on older databases
+    init_db()
+    
+    size_before = os.path.getsize(DB_PATH)
+    
+    conn = sqlite3.connect(DB_PATH)
+    c = conn.cursor()
+    
+    print("Finding progress entries with photos outside the image store...")
+    c.execute("""SELECT p.id FROM progress p
+                 WHERE length(p.image) > 0
+                   AND NOT EXISTS (SELECT 1 FROM progress_images pi WHERE pi.progress_id = p.id)
+                 ORDER BY p.id""")
+    entry_ids = [row[0] for row in c.fetchall()]
+    print(f"  {len(entry_ids)} progress entries to migrate")
+    
+    c.execute("SELECT hash FROM images")
+    known_hashes = {row[0] for row in c.fetchall()}
+    
+    legacy_bytes = 0
+    total_images = 0
+    duplicate_images = 0
+    duplicate_bytes = 0
+    
+    for idx, progress_id in enumerate(entry_ids, 1):
+        # Fetch blobs one at a time; legacy rows can hold many photos each
+        c.execute("SELECT image FROM progress WHERE id = ?", (progress_id,))
+        image = c.fetchone()[0]
+        legacy_bytes += len(image)
+        
+        image_list = decode_legacy_images(image)
+        for image_data in image_list:
+            image_hash = hash_image(image_data)
+            total_images += 1
+            if image_hash in known_hashes:
+                duplicate_images += 1
+                duplicate_bytes += len(image_data)
+            known_hashes.add(image_hash)
+        
+        if not dry_run:
+            store_images(c, progress_id, image_list)
+            c.execute("UPDATE progress SET image = ? WHERE id = ?", (b'', progress_id))
+            
+            if idx % batch_size == 0 or idx == len(entry_ids):
+                conn.commit()
+                print(f"  ✓ Committed {idx}/{len(entry_ids)} entries")
+    
+    # Reference counts follow progress_images, the source of truth
+    c.execute("""SELECT COUNT(*), COALESCE(SUM(i.size), 0) FROM images i
+                 WHERE NOT EXISTS (SELECT 1 FROM progress_images pi WHERE pi.image_hash = i.hash)""")
+    orphan_images, orphan_bytes = c.fetchone()
+    
+    if not dry_run:
+        c.execute("""UPDATE images SET ref_count = (
+                         SELECT COUNT(*) FROM progress_images pi WHERE pi.image_hash = images.hash
+                     )""")
+        c.execute("DELETE FROM images WHERE ref_count = 0")
+        conn.commit()
+    
+    # Images stored before perceptual hashing was added
+    c.execute("SELECT hash FROM images WHERE phash IS NULL")
+    unhashed = [row[0] for row in c.fetchall()]
+    hashed_images = 0
+    if not dry_run:
+        for idx, image_hash in enumerate(unhashed, 1):
+            c.execute("SELECT data FROM images WHERE hash = ?", (image_hash,))
+            phash = compute_dhash(c.fetchone()[0])
+            if phash is not None:
+                c.execute("UPDATE images SET phash = ? WHERE hash = ?", (phash, image_hash))
+                hashed_images += 1
+            if idx % batch_size == 0 or idx == len(unhashed):
+                conn.commit()
+    
+    c.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM images")
+    stored_images, stored_bytes = c.fetchone()
+    conn.close()
+    
+    if vacuum and not dry_run:
+        print("Vacuuming database file...")
+        conn = sqlite3.connect(DB_PATH)
+        conn.execute("VACUUM")
+        conn.close()
+    
+    size_after = os.path.getsize(DB_PATH)
+    
+    print()
+    print("COMPACTION REPORT" + (" (DRY RUN - nothing written)" if dry_run else ""))
+    print("-" * 60)
+    print(f"Legacy entries migrated:      {len(entry_ids)}")
+    print(f"Legacy photos found:          {total_images} ({format_bytes(legacy_bytes)})")
+    print(f"Duplicate photos:             {duplicate_images} ({format_bytes(duplicate_bytes)})")
+    print(f"Unreferenced photos removed:  {orphan_images} ({format_bytes(orphan_bytes)})")
+    print(f"Distinct photos stored:       {stored_images} ({format_bytes(stored_bytes)})")
+    if dry_run:
+        print(f"Photos missing a perceptual hash: {len(unhashed)}")
+    else:
+        print(f"Perceptual hashes computed:   {hashed_images}/{len(unhashed)}")
+    print("-" * 60)
+    
+    if dry_run:
+        print(f"Estimated bytes reclaimable: {format_bytes(duplicate_bytes + orphan_bytes)} "
+              f"(plus pickle overhead, once vacuumed)")
+        print("\nRun without --dry-run to compact the image storage.")
+    else:
+        print(f"Database file: {format_bytes(size_before)} -> {format_bytes(size_after)}")
+        print(f"Bytes reclaimed: {format_bytes(size_before - size_after)}")
+        print("\n✅ Compaction completed successfully!")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Deduplicate stored progress photos and reclaim space")
+    parser.add_argument('--dry-run', action='store_true', help="Report what would be reclaimed without writing")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Entries per committed batch")
+    parser.add_argument('--no-vacuum', action='store_true', help="Skip VACUUM after compaction")
+    args = parser.parse_args()
+    
+    compact_images(dry_run=args.dry_run, batch_size=args.batch_size, vacuum=not args.no_vacuum)
@@ -0,0 +1,97 @@
+"""
+Conversion script for legacy pickled image lists
+Rewrites progress.image values stored as pickle.dumps(list_of_bytes) into
+the seekable image container format, so a single image can be read by
+offset and stored data is never unpickled again. Pickles containing
+anything other than a plain list of bytes are reported and left untouched.
+
+The script is idempotent and resumable: values already in container format
+(and empty values of entries kept in the image store) are skipped, and work
+is committed in batches.
+
+Usage:
+    python convert_image_containers.py --dry-run   # report what would be converted
+    python convert_image_containers.py             # convert the stored values
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+from image_container import CONTAINER_MAGIC, pack_images, decode_pickled_images
+
+BATCH_SIZE = 200
+
+def convert_image_containers(dry_run=False, batch_size=BATCH_SIZE):
+    conn = sqlite3.connect('construction.db')
+    c = conn.cursor()
+    
+    print("Finding progress entries with pickled image lists...")
+    c.execute("""SELECT id FROM progress
+                 WHERE length(image) > 0 AND substr(image, 1, ?) != ?
+                 ORDER BY id""", (len(CONTAINER_MAGIC), CONTAINER_MAGIC))
+    entry_ids = [row[0] for row in c.fetchall()]
+    print(f"  {len(entry_ids)} progress entries to check")
+    
+    converted = 0
+    single_images = 0
+    rejected = []
+    bytes_before = 0
+    bytes_after = 0
+    
+    for idx, progress_id in enumerate(entry_ids, 1):
+        # Fetch values one at a time; legacy rows can hold many photos each
+        c.execute("SELECT image FROM progress WHERE id = ?", (progress_id,))
+        image = c.fetchone()[0]
+        
+        image_list = decode_pickled_images(image)
+        if image_list is None:
+            if image[:1] == b'\x80':
+                # Pickle protocol marker, but not a plain list of bytes
+                rejected.append(progress_id)
+            else:
+                single_images += 1
+            continue
+        
+        container = pack_images(image_list)
+        bytes_before += len(image)
+        bytes_after += len(container)
+        converted += 1
+        
+        if not dry_run:
+            c.execute("UPDATE progress SET image = ? WHERE id = ?", (container, progress_id))
+            if converted % batch_size == 0:
+                conn.commit()
+                print(f"  ✓ Committed {converted} conversions ({idx}/{len(entry_ids)} entries checked)")
+    
+    if not dry_run:
+        conn.commit()
+    conn.close()
+    
+    print()
+    print("CONVERSION REPORT" + (" (DRY RUN - nothing written)" if dry_run else ""))
+    print("-" * 60)
+    print(f"Pickled image lists {'to convert' if dry_run else 'converted'}: {converted}")
+    print(f"Single raw images (left as is):   {single_images}")
+    print(f"Unsafe or invalid pickles:        {len(rejected)}")
+    print(f"Stored bytes: {bytes_before} -> {bytes_after}")
+    print("-" * 60)
+    
+    if rejected:
+        print(f"⚠️ Entries left untouched for manual review: {', '.join(map(str, rejected))}")
+    
+    if dry_run:
+        print("\nRun without --dry-run to apply the conversion.")
+    else:
+        print("\n✅ Conversion completed successfully!")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert pickled image lists to the image container format")
+    parser.add_argument('--dry-run', action='store_true', help="Report what would be converted without writing")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Conversions per committed batch")
+    args = parser.parse_args()
+    
+    convert_image_containers(dry_run=args.dry_run, batch_size=args.batch_size)
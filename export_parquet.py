@@ -0,0 +1,58 @@
+"""
+Incremental Parquet export of progress metadata and work types
+Writes datasets partitioned by site and month for offline analytics.
+Each run only appends rows added since the previous export.
+
+Usage:
+    python export_parquet.py                    # append new rows to exports/parquet
+    python export_parquet.py --output-dir DIR   # export to another directory
+    python export_parquet.py --full             # discard previous export and rebuild
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+from database import init_db
+from data_export import PARQUET_DATASETS, export_parquet, reset_parquet_export
+
+def main():
+    parser = argparse.ArgumentParser(description="Export progress and work types to partitioned Parquet")
+    parser.add_argument('--output-dir', default=os.path.join('exports', 'parquet'),
+                        help="Root directory for the Parquet datasets (default: exports/parquet)")
+    parser.add_argument('--dataset', choices=sorted(PARQUET_DATASETS), action='append',
+                        help="Dataset to export (repeatable, default: all)")
+    parser.add_argument('--full', action='store_true',
+                        help="Delete the existing export and watermark, then export everything")
+    args = parser.parse_args()
+    
+    # Make sure the watermark table exists on older databases
+    init_db()
+    
+    datasets = args.dataset or sorted(PARQUET_DATASETS)
+    
+    print("=" * 60)
+    print("PARQUET EXPORT")
+    print("=" * 60)
+    
+    for dataset in datasets:
+        if args.full:
+            print(f"Resetting {dataset} export...")
+            reset_parquet_export(args.output_dir, dataset)
+        
+        start = time.perf_counter()
+        rows = export_parquet(args.output_dir, dataset)
+        elapsed = time.perf_counter() - start
+        
+        if rows:
+            print(f"✓ {dataset}: {rows} new row(s) in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/sec)")
+        else:
+            print(f"✓ {dataset}: already up to date")
+    
+    print(f"\n✅ Export written to {os.path.abspath(args.output_dir)}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+"""
+Bulk importer for historical progress data
+Loads a site's spreadsheet history (CSV or Excel) with one row per
+(date, floor, work type, status, progress) into progress and work_types,
+creating one progress entry per day. Photos can be attached from a folder
+containing either one sub-folder per day (2024-03-15/IMG_001.jpg) or files
+whose names start with the day (2024-03-15_north.jpg).
+
+Rows are streamed into large transactions, and secondary indexes on the
+written tables are dropped during the import and rebuilt once at the end,
+which is much faster than maintaining them row by row. Run it while the app
+is idle. Invalid rows are skipped and reported.
+
+Usage:
+    python import_history.py --site-id 3 --file history.csv --photos photos/ --dry-run
+    python import_history.py --site-id 3 --file history.xlsx --user engineer
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+from datetime import datetime
+from functools import lru_cache
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+from database import (init_db, get_site_by_id, get_user, get_write_connection,
+                      validate_work_type_row, insert_work_types)
+from image_store import store_images
+
+# Work type rows per committed transaction
+BATCH_SIZE = 20000
+
+# Accepted column headers (lower case, spaces as underscores) per field
+COLUMN_ALIASES = {
+    'date': ['date', 'day'],
+    'floor': ['floor', 'floor_name'],
+    'work_type': ['work_type', 'work', 'work_name'],
+    'status': ['status'],
+    'progress': ['progress', 'progress_%', 'progress_percentage', 'percent']
+}
+
+DATE_FORMATS = ['%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%d/%m/%Y', '%d-%m-%Y', '%m/%d/%Y']
+
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+IMPORT_CATEGORY = "Historical Import"
+IMPORT_STATUS = "Needs Review"
+
+def normalize_header(header):
+    return str(header).strip().lower().replace(' ', '_').replace('-', '_')
+
+def map_columns(headers):
+    """Map each field to its column header; raises ValueError if a field is missing"""
+    normalized = {normalize_header(header): header for header in headers}
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        match = next((normalized[alias] for alias in aliases if alias in normalized), None)
+        if match is None:
+            raise ValueError(f"No column for '{field}' (accepted headers: {', '.join(aliases)})")
+        columns[field] = match
+    return columns
+
+def read_rows(path):
+    """Yield (line number, row dict) from a CSV file (streamed) or an Excel sheet"""
+    if path.lower().endswith(('.xlsx', '.xls')):
+        # Excel needs pandas with openpyxl; the sheet is read as a whole
+        import pandas as pd
+        df = pd.read_excel(path, dtype=str).fillna('')
+        for index, row in enumerate(df.to_dict('records'), start=2):
+            yield index, row
+        return
+    
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for index, row in enumerate(csv.DictReader(f), start=2):
+            yield index, row
+
+@lru_cache(maxsize=4096)
+def parse_date(value):
+    """Parse a spreadsheet date into the stored 'YYYY-MM-DD HH:MM:SS' format"""
+    value = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognized date {value!r}")
+
+def index_photos(photo_dir):
+    """Map each day (YYYY-MM-DD) to its photo paths, from day folders or day-prefixed file names"""
+    photos = {}
+    if not photo_dir:
+        return photos
+    
+    for root, _, files in os.walk(photo_dir):
+        folder_day = os.path.basename(root)
+        for name in sorted(files):
+            if not name.lower().endswith(PHOTO_EXTENSIONS):
+                continue
+            for candidate in (name[:10], folder_day):
+                try:
+                    day = datetime.strptime(candidate, '%Y-%m-%d').strftime('%Y-%m-%d')
+                except ValueError:
+                    continue
+                photos.setdefault(day, []).append(os.path.join(root, name))
+                break
+    return photos
+
+def drop_indexes(c, tables):
+    """Drop the secondary indexes of tables; returns (name, sql) pairs for recreation"""
+    placeholders = ','.join('?' * len(tables))
+    c.execute(f"""SELECT name, sql FROM sqlite_master
+                  WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({placeholders})""", tables)
+    indexes = c.fetchall()
+    for name, _ in indexes:
+        c.execute(f'DROP INDEX "{name}"')
+    return indexes
+
+def restore_indexes(c, indexes):
+    """Recreate dropped indexes; ones restored by a rollback already exist and are skipped"""
+    for name, sql in indexes:
+        c.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,))
+        if not c.fetchone():
+            c.execute(sql)
+
+def import_history(site_id, path, photo_dir=None, username='admin', batch_size=BATCH_SIZE,
+                   dry_run=False, defer_indexes=True):
+    init_db()
+    
+    site = get_site_by_id(site_id)
+    if not site:
+        print(f"❌ Site {site_id} not found")
+        return False
+    user = get_user(username)
+    if not user:
+        print(f"❌ User '{username}' not found")
+        return False
+    user_id = user[0]
+    
+    photos = index_photos(photo_dir)
+    source_name = os.path.basename(path)
+    print(f"Importing {source_name} into site '{site[1]}'"
+          + (f" with photos for {len(photos)} day(s)" if photo_dir else ""))
+    
+    conn = get_write_connection()
+    c = conn.cursor()
+    # Larger page cache for the bulk load
+    c.execute("PRAGMA cache_size = -65536")
+    
+    entries = {}
+    progress_totals = {}
+    pending = {}
+    dry_run_days = set()
+    rejected = []
+    rows_read = 0
+    work_types_inserted = 0
+    photos_attached = 0
+    dropped_indexes = []
+    
+    def flush():
+        """Write the pending rows, creating each day's progress entry on first use"""
+        nonlocal work_types_inserted, photos_attached
+        for day, day_rows in pending.items():
+            date = f"{day} 00:00:00"
+            progress_id = entries.get(day)
+            if progress_id is None:
+                c.execute("""INSERT INTO progress (site_id, user_id, date, category, description, image,
+                             ai_report, ai_verification_status, progress_percentage)
+                             VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)""",
+                          (site_id, user_id, date, IMPORT_CATEGORY,
+                           f"Historical progress imported from {source_name}", b'',
+                           f"Imported from {source_name}; no AI analysis was run.", IMPORT_STATUS))
+                progress_id = c.lastrowid
+                entries[day] = progress_id
+                
+                day_photos = photos.get(day, [])
+                if day_photos:
+                    image_data_list = []
+                    for photo_path in day_photos:
+                        with open(photo_path, 'rb') as f:
+                            image_data_list.append(f.read())
+                    store_images(c, progress_id, image_data_list)
+                    photos_attached += len(image_data_list)
+            
+            insert_work_types(c, progress_id, site_id, date, day_rows)
+            work_types_inserted += len(day_rows)
+            
+            total, count = progress_totals.get(day, (0, 0))
+            progress_totals[day] = (total + sum(row[3] for row in day_rows), count + len(day_rows))
+        pending.clear()
+    
+    start = time.perf_counter()
+    try:
+        if not dry_run:
+            c.execute("BEGIN IMMEDIATE")
+            if defer_indexes:
+                dropped_indexes = drop_indexes(c, ['progress', 'work_types', 'progress_images'])
+        
+        columns = None
+        pending_count = 0
+        for line, row in read_rows(path):
+            if columns is None:
+                columns = map_columns(row.keys())
+            rows_read += 1
+            
+            try:
+                date = parse_date(str(row[columns['date']]))
+                work_type_row = validate_work_type_row(
+                    row[columns['floor']], row[columns['work_type']],
+                    row[columns['status']], str(row[columns['progress']]).strip().rstrip('%')
+                )
+            except ValueError as e:
+                rejected.append((line, str(e)))
+                continue
+            
+            if dry_run:
+                dry_run_days.add(date[:10])
+                work_types_inserted += 1
+                continue
+            
+            pending.setdefault(date[:10], []).append(work_type_row)
+            pending_count += 1
+            
+            if pending_count >= batch_size:
+                flush()
+                c.execute("COMMIT")
+                c.execute("BEGIN IMMEDIATE")
+                pending_count = 0
+                print(f"  ✓ Committed {rows_read} rows ({work_types_inserted} work types, {len(entries)} days)")
+        
+        if dry_run:
+            # Report what would be created without writing
+            photos_attached = sum(len(photos.get(day, [])) for day in dry_run_days)
+            entries = dict.fromkeys(dry_run_days)
+        else:
+            flush()
+            
+            # Overall progress of each imported day is the mean of its work types
+            c.executemany("UPDATE progress SET progress_percentage = ? WHERE id = ?",
+                          [(round(total / count), entries[day])
+                           for day, (total, count) in progress_totals.items()])
+            c.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            c.execute("ROLLBACK")
+        raise
+    finally:
+        if dropped_indexes:
+            print(f"Rebuilding {len(dropped_indexes)} index(es)...")
+            restore_indexes(c, dropped_indexes)
+        conn.close()
+    
+    elapsed = time.perf_counter() - start
+    
+    print()
+    print("IMPORT REPORT" + (" (DRY RUN - nothing written)" if dry_run else ""))
+    print("-" * 60)
+    print(f"Rows read:             {rows_read}")
+    print(f"Rows rejected:         {len(rejected)}")
+    print(f"Progress entries:      {len(entries)}")
+    print(f"Work types inserted:   {work_types_inserted}")
+    print(f"Photos attached:       {photos_attached}")
+    print(f"Elapsed:               {elapsed:.2f}s")
+    print(f"Rows/sec:              {rows_read / elapsed:.0f}")
+    print("-" * 60)
+    
+    for line, reason in rejected[:20]:
+        print(f"  Line {line}: {reason}")
+    if len(rejected) > 20:
+        print(f"  ... and {len(rejected) - 20} more")
+    
+    if dry_run:
+        print("\nRun without --dry-run to import.")
+    else:
+        print("\n✅ Import completed successfully!")
+    return True
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bulk import historical progress from CSV or Excel")
+    parser.add_argument('--site-id', type=int, required=True, help="Site to import into")
+    parser.add_argument('--file', required=True, help="CSV or Excel file with date, floor, work type, status, progress")
+    parser.add_argument('--photos', help="Folder of photos by day (day folders or day-prefixed names)")
+    parser.add_argument('--user', default='admin', help="Username recorded as the author of imported entries")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Work type rows per transaction")
+    parser.add_argument('--keep-indexes', action='store_true', help="Maintain indexes during the import")
+    parser.add_argument('--dry-run', action='store_true', help="Validate and report without writing")
+    args = parser.parse_args()
+    
+    imported = import_history(args.site_id, args.file, photo_dir=args.photos, username=args.user,
+                              batch_size=args.batch_size, dry_run=args.dry_run,
+                              defer_indexes=not args.keep_indexes)
+    sys.exit(0 if imported else 1)
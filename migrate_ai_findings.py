@@ -0,0 +1,53 @@
+"""
+Migration script to backfill structured AI findings for existing progress entries
+Parses the recommendations section of each free-text AI report once and
+stores it in the ai_findings table, so monthly reports query findings
+instead of parsing report text. Entries that already have findings are
+skipped, so the script can be run repeatedly.
+"""
+
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+from database import init_db, add_ai_findings
+from ai_analysis import extract_legacy_recommendations
+
+def migrate_ai_findings():
+    # Creates the ai_findings table on older databases
+    init_db()
+    
+    conn = sqlite3.connect('construction.db')
+    c = conn.cursor()
+    
+    print("Finding progress entries without structured AI findings...")
+    c.execute("""SELECT p.id, p.site_id, p.ai_report 
+                 FROM progress p 
+                 WHERE NOT EXISTS (SELECT 1 FROM ai_findings f WHERE f.progress_id = p.id)
+                 ORDER BY p.id""")
+    entries = c.fetchall()
+    print(f"  {len(entries)} progress entries to process")
+    
+    migrated = 0
+    total_recommendations = 0
+    
+    for progress_id, site_id, ai_report in entries:
+        recommendations = extract_legacy_recommendations(ai_report or '')
+        if not recommendations:
+            continue
+        
+        add_ai_findings(c, progress_id, site_id, {'recommendations': recommendations})
+        migrated += 1
+        total_recommendations += len(recommendations)
+    
+    conn.commit()
+    conn.close()
+    
+    print(f"\n✅ Migration completed: {total_recommendations} recommendation(s) stored for {migrated} progress entries")
+    if len(entries) > migrated:
+        print(f"   {len(entries) - migrated} progress entries had no recommendations section")
+
+if __name__ == '__main__':
+    migrate_ai_findings()
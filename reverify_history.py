@@ -0,0 +1,191 @@
+"""
+Batch re-verification of historical progress updates
+Re-runs the AI verification of past progress entries (for example after
+the analysis model is upgraded) and stores each result as a new
+verification version alongside the original analysis, which is left
+unchanged.
+
+Entries are analyzed by a bounded pool of worker threads. Each result is
+saved as soon as it arrives, so the saved versions double as the
+checkpoint: re-running with the same --run-name resumes where an
+interrupted run stopped. Failed analyses are not saved and are retried on
+the next run. The report covers throughput, status changes and token cost.
+
+Usage:
+    python reverify_history.py --site-id 3 --start-date 2024-01-01 --dry-run
+    python reverify_history.py --model models/gemini-2.5-flash --run-name flash-2.5 --workers 4
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+import google.generativeai as genai
+from dotenv import load_dotenv
+
+from database import (init_db, get_reverification_candidates, get_progress_floor_entries,
+                      add_verification_version)
+from image_store import load_progress_images
+from ai_analysis import ANALYSIS_MODEL, get_gemini_analysis
+
+DEFAULT_WORKERS = 4
+
+# USD per million tokens, used for the cost estimate (override with --input-price/--output-price)
+DEFAULT_INPUT_PRICE = 0.10
+DEFAULT_OUTPUT_PRICE = 0.40
+
+# Prompt tokens served from a context cache are billed at this fraction of the input price
+CACHED_INPUT_PRICE_RATIO = 0.25
+
+def load_legacy_image(progress_id):
+    """progress.image of an entry, for entries whose photos predate the image store"""
+    conn = sqlite3.connect('construction.db')
+    c = conn.cursor()
+    c.execute("SELECT image FROM progress WHERE id = ?", (progress_id,))
+    row = c.fetchone()
+    conn.close()
+    return row[0] if row else None
+
+def analyze_entry(entry, model_name):
+    """Worker task: re-run the analysis of one progress entry"""
+    progress_id, site_id, date, category, description, original_status = entry
+    
+    images = [bytes(image) for image in load_progress_images(progress_id, load_legacy_image(progress_id))]
+    floor_entries = get_progress_floor_entries(progress_id)
+    usage = {}
+    
+    started = time.perf_counter()
+    ai_report, status, findings = get_gemini_analysis(description, images, category, floor_entries,
+                                                      model_name=model_name, usage=usage)
+    return ai_report, status, findings, usage, time.perf_counter() - started
+
+def reverify_history(model_name=ANALYSIS_MODEL, run_name=None, site_id=None, start_date=None,
+                     end_date=None, limit=None, workers=DEFAULT_WORKERS, dry_run=False,
+                     input_price=DEFAULT_INPUT_PRICE, output_price=DEFAULT_OUTPUT_PRICE):
+    init_db()
+    run_name = run_name or model_name
+    
+    entries = get_reverification_candidates(run_name, site_id, start_date, end_date, limit)
+    print(f"Run '{run_name}' with {model_name}: {len(entries)} progress entries to re-verify")
+    
+    if dry_run:
+        by_site = Counter(entry[1] for entry in entries)
+        for entry_site_id, count in sorted(by_site.items()):
+            print(f"  Site {entry_site_id}: {count} entries")
+        print("\nRun without --dry-run to re-verify.")
+        return
+    
+    load_dotenv()
+    genai.configure(api_key=os.environ.get("GOOGLE_API_KEY", ""))
+    
+    completed = 0
+    failed = 0
+    prompt_tokens = 0
+    output_tokens = 0
+    cached_tokens = 0
+    call_seconds = 0.0
+    transitions = Counter()
+    failures = []
+    
+    start = time.perf_counter()
+    pending = {}
+    remaining = iter(entries)
+    
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='reverify') as executor:
+        # Keep at most two tasks per worker in flight, so photos of queued entries are not loaded early
+        while True:
+            while len(pending) < workers * 2:
+                entry = next(remaining, None)
+                if entry is None:
+                    break
+                pending[executor.submit(analyze_entry, entry, model_name)] = entry
+            if not pending:
+                break
+            
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                entry = pending.pop(future)
+                progress_id, original_status = entry[0], entry[5]
+                
+                try:
+                    ai_report, status, findings, usage, seconds = future.result()
+                except Exception as e:
+                    ai_report, status, findings, usage, seconds = str(e), "Error", None, {}, 0.0
+                
+                if status == "Error":
+                    failed += 1
+                    failures.append((progress_id, ai_report))
+                    continue
+                
+                add_verification_version(progress_id, run_name, model_name, ai_report, status, findings,
+                                         usage.get('prompt_tokens'), usage.get('output_tokens'))
+                completed += 1
+                prompt_tokens += usage.get('prompt_tokens', 0)
+                output_tokens += usage.get('output_tokens', 0)
+                cached_tokens += usage.get('cached_tokens', 0)
+                call_seconds += seconds
+                transitions[(original_status, status)] += 1
+                
+                if completed % 10 == 0:
+                    elapsed = time.perf_counter() - start
+                    print(f"  ✓ {completed}/{len(entries)} re-verified ({completed / elapsed * 60:.1f}/min)")
+    
+    elapsed = time.perf_counter() - start
+    billed_prompt_tokens = prompt_tokens - cached_tokens + cached_tokens * CACHED_INPUT_PRICE_RATIO
+    cost = billed_prompt_tokens / 1_000_000 * input_price + output_tokens / 1_000_000 * output_price
+    
+    print()
+    print("RE-VERIFICATION REPORT")
+    print("-" * 60)
+    print(f"Re-verified:           {completed}")
+    print(f"Failed (retry later):  {failed}")
+    print(f"Elapsed:               {elapsed:.1f}s with {workers} worker(s)")
+    if completed:
+        print(f"Throughput:            {completed / elapsed * 60:.1f} entries/min")
+        print(f"Mean call latency:     {call_seconds / completed:.1f}s")
+    print(f"Prompt tokens:         {prompt_tokens}")
+    print(f"Output tokens:         {output_tokens}")
+    print(f"Cached prompt tokens:  {cached_tokens}"
+          + (f" ({cached_tokens / prompt_tokens:.0%} of prompt tokens)" if prompt_tokens else ""))
+    print(f"Estimated cost:        ${cost:.4f}"
+          + (f" (${cost / completed:.5f} per entry)" if completed else ""))
+    print("-" * 60)
+    
+    if transitions:
+        print("Status changes (original -> re-verified):")
+        for (original_status, status), count in transitions.most_common():
+            marker = "" if original_status == status else "  ← changed"
+            print(f"  {original_status} -> {status}: {count}{marker}")
+    
+    for progress_id, error in failures[:10]:
+        print(f"  ⚠️ Entry {progress_id}: {error}")
+    
+    print("\n✅ Re-verification run finished." if not failed
+          else f"\n⚠️ {failed} entries failed; run again with --run-name '{run_name}' to retry them.")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Re-run AI verification on historical progress entries")
+    parser.add_argument('--model', default=ANALYSIS_MODEL, help="Gemini model to verify with")
+    parser.add_argument('--run-name', help="Name of this run, used to resume it (default: the model name)")
+    parser.add_argument('--site-id', type=int, help="Only entries of this site")
+    parser.add_argument('--start-date', help="Only entries on or after this date (YYYY-MM-DD)")
+    parser.add_argument('--end-date', help="Only entries on or before this date (YYYY-MM-DD)")
+    parser.add_argument('--limit', type=int, help="Re-verify at most this many entries")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Concurrent analysis calls")
+    parser.add_argument('--input-price', type=float, default=DEFAULT_INPUT_PRICE,
+                        help="USD per million prompt tokens")
+    parser.add_argument('--output-price', type=float, default=DEFAULT_OUTPUT_PRICE,
+                        help="USD per million output tokens")
+    parser.add_argument('--dry-run', action='store_true', help="List what would be re-verified")
+    args = parser.parse_args()
+    
+    reverify_history(model_name=args.model, run_name=args.run_name, site_id=args.site_id,
+                     start_date=args.start_date, end_date=args.end_date, limit=args.limit,
+                     workers=args.workers, dry_run=args.dry_run,
+                     input_price=args.input_price, output_price=args.output_price)
@@ -0,0 +1,122 @@
+"""
+Stress test for concurrent progress submissions
+Simulates many engineers saving multi-floor progress updates at the same
+time through add_progress_multi_floor, checks that no submission was lost
+or partially written, and reports commits per second. Runs against a
+temporary database, so the application database is not touched.
+
+Usage:
+    python stress_test_writes.py
+    python stress_test_writes.py --submitters 50 --submissions 10 --floors 10 --single-writer
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app'))
+
+from database import init_db, add_progress_multi_floor
+
+WORK_NAMES = ["Excavation", "Foundation", "Columns", "Beams", "Slab", "Brickwork",
+              "Plastering", "Electrical", "Plumbing", "Flooring", "Painting", "Finishing"]
+
+def build_floor_entries(num_floors, num_work_types):
+    return [{
+        'floor_name': f"Floor {floor}",
+        'work_types': {work_name: {'status': 'In Progress', 'progress': 50}
+                       for work_name in WORK_NAMES[:num_work_types]}
+    } for floor in range(1, num_floors + 1)]
+
+def run_stress_test(submitters, submissions, num_floors, num_work_types, single_writer):
+    init_db()
+    conn = sqlite3.connect('construction.db')
+    conn.execute("INSERT INTO users (username, password, role) VALUES ('stress', x'00', 'engineer')")
+    conn.execute("INSERT INTO sites (name, location, status) VALUES ('Stress Site', 'Test', 'Active')")
+    conn.commit()
+    conn.close()
+    
+    floor_entries = build_floor_entries(num_floors, num_work_types)
+    errors = []
+    barrier = threading.Barrier(submitters)
+    
+    def submitter(submitter_id):
+        barrier.wait()
+        for submission in range(submissions):
+            # Distinct photo per submission, plus one photo shared by everyone
+            images = [f"photo-{submitter_id}-{submission}".encode(), b"shared-site-photo"]
+            try:
+                add_progress_multi_floor(
+                    site_id=1, user_id=1, date=time.strftime("%Y-%m-%d %H:%M:%S"),
+                    category="Structural Work", description=f"Submitter {submitter_id} #{submission}",
+                    images=images, ai_report="Stress test", ai_verification_status="Verified",
+                    progress_percentage=50, floor_entries=floor_entries,
+                    single_writer=single_writer
+                )
+            except Exception as e:
+                errors.append(f"submitter {submitter_id}: {e}")
+    
+    threads = [threading.Thread(target=submitter, args=(i,)) for i in range(submitters)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    
+    expected_entries = submitters * submissions
+    conn = sqlite3.connect('construction.db')
+    c = conn.cursor()
+    c.execute("SELECT COUNT(*) FROM progress")
+    entries = c.fetchone()[0]
+    c.execute("SELECT COUNT(*) FROM work_types")
+    work_types = c.fetchone()[0]
+    c.execute("SELECT COUNT(*) FROM progress_images")
+    image_refs = c.fetchone()[0]
+    c.execute("SELECT ref_count FROM images WHERE data = ?", (b"shared-site-photo",))
+    shared_refs = c.fetchone()[0]
+    conn.close()
+    
+    mode = "single writer queue" if single_writer else "direct writers"
+    print(f"{submitters} submitters x {submissions} submissions, "
+          f"{num_floors} floors x {num_work_types} work types each ({mode})")
+    print("-" * 60)
+    print(f"Errors:               {len(errors)}")
+    print(f"Progress entries:     {entries}/{expected_entries}")
+    print(f"Work type rows:       {work_types}/{expected_entries * num_floors * num_work_types}")
+    print(f"Image references:     {image_refs}/{expected_entries * 2}")
+    print(f"Shared photo refs:    {shared_refs}/{expected_entries}")
+    print(f"Elapsed:              {elapsed:.2f}s")
+    print(f"Commits/sec:          {entries / elapsed:.1f}")
+    print("-" * 60)
+    
+    for error in errors[:10]:
+        print(f"  {error}")
+    
+    passed = (not errors and entries == expected_entries
+              and work_types == expected_entries * num_floors * num_work_types
+              and image_refs == expected_entries * 2 and shared_refs == expected_entries)
+    print("✅ No lost writes" if passed else "❌ Lost or failed writes")
+    return passed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stress test concurrent progress submissions")
+    parser.add_argument('--submitters', type=int, default=50, help="Concurrent submitters")
+    parser.add_argument('--submissions', type=int, default=5, help="Submissions per submitter")
+    parser.add_argument('--floors', type=int, default=10, help="Floors per submission")
+    parser.add_argument('--work-types', type=int, default=12, help="Work types per floor")
+    parser.add_argument('--single-writer', action='store_true', help="Use the single writer queue")
+    args = parser.parse_args()
+    
+    # The app uses construction.db in the working directory
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        passed = run_stress_test(args.submitters, args.submissions, args.floors,
+                                 args.work_types, args.single_writer)
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    
+    sys.exit(0 if passed else 1)
@@ -125,7 +125,7 @@ def verify_work_types_table():
     if count == 0 and progress_count > 0:
         print()
         print("  ⚠️  NOTE: Old progress entries exist but no work_types data.")
-        print("     These will use fallback parsing from descriptions.")
+        print("     Run: python backfill_work_types.py to convert them.")
         print("     New entries will populate work_types table.")
     
     conn.close()